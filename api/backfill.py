@@ -89,36 +89,33 @@ class handler(BaseHTTPRequestHandler):
             import sys
             sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
             from backend.scripts.backfill_missing_dates import backfill_single_date
-            from backend.ga4_extraction.extraction import extract_for_date, extract_sessions_channels_delayed, extract_sessions_campaigns_delayed
+            from backend.ga4_extraction.extraction import extract_for_date_range, extract_sessions_channels_delayed, extract_sessions_campaigns_delayed
             
             db = None
             try:
                 # Modalità dry_run: estrai e restituisci i dati senza scrivere su DB
                 if dry_run:
                     results = []
-                    current_date = start_date
-                    while current_date <= end_date:
-                        date_str = current_date.strftime('%Y-%m-%d')
-                        try:
-                            ga4_result, _dates = extract_for_date(date_str)
-                            results.append({
-                                'date': date_str,
-                                'success': True,
-                                'error': None,
-                                'ga4_preview': {
-                                    'sessioni': ga4_result.get('sessioni'),
-                                    'sessioni_lucegas': ga4_result.get('sessioni_lucegas'),
-                                    'swi': ga4_result.get('swi')
-                                }
-                            })
-                        except Exception as e:
-                            logger.error(f"Dry-run error for {date_str}: {e}", exc_info=True)
+                    extracted = extract_for_date_range(start_date_str, end_date_str)
+                    for date_str, outcome in extracted.items():
+                        if isinstance(outcome, Exception):
                             results.append({
                                 'date': date_str,
                                 'success': False,
-                                'error': str(e)
+                                'error': str(outcome)
                             })
-                        current_date += timedelta(days=1)
+                            continue
+                        ga4_result, _dates = outcome
+                        results.append({
+                            'date': date_str,
+                            'success': True,
+                            'error': None,
+                            'ga4_preview': {
+                                'sessioni': ga4_result.get('sessioni'),
+                                'sessioni_lucegas': ga4_result.get('sessioni_lucegas'),
+                                'swi': ga4_result.get('swi')
+                            }
+                        })
 
                     success_count = sum(1 for r in results if r['success'])
                     response = json_response({
@@ -294,9 +294,15 @@ def get_weekend_report(reference_date: Optional[str] = None) -> str:
             total_sess_lucegas = 0
             total_swi = 0
 
+            #Comparisons (day - 7) for all the weekend days in one query
+            comparisons = db.calculate_comparisons_bulk(
+                [day.strftime('%Y-%m-%d') for day in days], days_ago = 7
+            )
+
             for day in days:
                 days_str = day.strftime('%Y-%m-%d')
-                metrics = db.get_metrics(days_str)
+                comp = comparisons[days_str]
+                metrics = comp['current'] if comp else None
 
                 # Translate day name
                 giorno_nome = day.strftime('%A')
@@ -313,9 +319,7 @@ def get_weekend_report(reference_date: Optional[str] = None) -> str:
                 if not metrics:
                     report += "❌ Dati mancanti\n\n"
                     continue
-                
-                #Calculate comparison (day - 7)
-                comp = db.calculate_comparison(days_str, days_ago = 7)
+
 
                 #Extract key metrics variations
                 swi_change = comp['comparison'].get('swi_conversioni_change',0)
@@ -11,6 +11,7 @@ Provides REST endpoints for:
 Uses app factory pattern for testability.
 """
 
+import atexit
 import os
 from dotenv import load_dotenv
 
@@ -138,9 +139,12 @@ def create_app(config: Optional[dict] = None) -> Flask:
     # Applica Basic Auth per staging (se configurato)
     apply_basic_auth_to_app(app)
     
-    # Inizializza database pool
+    # Inizializza database pool ed esegue le migrations una sola volta:
+    # le connessioni per-request (get_db) non le rieseguono
     db_path = ConfigLoader.get_database_path(config)
-    get_pool(db_path, pool_size=10)
+    pool = get_pool(db_path, pool_size=10)
+    with pool.get_connection() as conn:
+        GA4Database(conn=conn, owns_connection=False)
     
     # Ritorna connessione al pool dopo ogni request
     @app.teardown_request
@@ -153,25 +157,20 @@ def create_app(config: Optional[dict] = None) -> Flask:
         """
         from flask import g
         
-        if hasattr(g, 'pool_conn_context') and hasattr(g, 'raw_conn'):
+        if hasattr(g, 'pool_db_context'):
             try:
                 # Chiama __exit__ del context manager
-                g.pool_conn_context.__exit__(None, None, None)
+                g.pool_db_context.__exit__(None, None, None)
             except Exception as e:
                 logger.error(f"Error returning connection to pool: {e}")
             finally:
                 # Cleanup g object
-                g.pop('pool_conn_context', None)
-                g.pop('raw_conn', None)
+                g.pop('pool_db_context', None)
                 g.pop('db', None)
     
-    # Cleanup pool on shutdown
-    @app.teardown_appcontext
-    def shutdown_pool(exception=None):
-        """Chiude connection pool quando app viene terminata."""
-        if exception:
-            logger.warning(f"App teardown with exception: {exception}")
-        close_pool()
+    # Cleanup pool on shutdown (teardown_appcontext scatta a ogni request:
+    # chiudere lì il pool lo ricreerebbe a ogni richiesta)
+    atexit.register(close_pool)
     
     return app
 
@@ -212,13 +211,10 @@ def get_db():
         # Ottieni pool (singleton thread-safe)
         pool = get_pool(db_path, pool_size=10)
         
-        # Ottieni connessione dal pool usando context manager
-        g.pool_conn_context = pool.get_connection()
-        g.raw_conn = g.pool_conn_context.__enter__()
-        
-        # Crea GA4Database con connessione dal pool
-        # owns_connection=False perché il pool gestisce il ciclo di vita
-        g.db = GA4Database(conn=g.raw_conn, owns_connection=False)
+        # GA4Database su connessione del pool (owns_connection=False,
+        # migrations già eseguite all'avvio); ritorna al pool nel teardown
+        g.pool_db_context = pool.get_database()
+        g.db = g.pool_db_context.__enter__()
     
     return g.db
 
@@ -17,7 +17,8 @@ class DatabasePool:
     """
     Connection pool per database.
     
-    Supporta sia SQLite (thread-safe) che PostgreSQL (con psycopg2.pool).
+    Supporta sia SQLite (connessioni riutilizzate, al più pool_size inattive)
+    che PostgreSQL (con psycopg2.pool.ThreadedConnectionPool).
     """
     
     def __init__(self, db_path: str = None, pool_size: int = 10):
@@ -26,12 +27,16 @@ class DatabasePool:
         
         Args:
             db_path: Path database SQLite o DATABASE_URL per PostgreSQL
-            pool_size: Dimensione pool (solo per PostgreSQL)
+            pool_size: Dimensione pool (PostgreSQL: connessioni massime;
+                SQLite: connessioni inattive tenute aperte)
         """
         self.db_path = db_path or os.getenv('DATABASE_URL') or 'data/ga4_data.db'
         self.pool_size = pool_size
         self.pool = None
         self._lock = Lock()
+
+        # SQLite: connessioni inattive da riusare (riusa la cache statement di sqlite3)
+        self._sqlite_idle = []
         
         # Determina tipo database
         if self.db_path.startswith(('postgres://', 'postgresql://')):
@@ -47,6 +52,7 @@ class DatabasePool:
         """Inizializza pool PostgreSQL con psycopg2."""
         try:
             import psycopg2.pool
+            from psycopg2.extras import RealDictCursor
             
             # Fix URL per psycopg2 (postgres:// → postgresql://)
             url = self.db_path
@@ -58,11 +64,12 @@ class DatabasePool:
                 separator = '&' if '?' in url else '?'
                 url = f"{url}{separator}sslmode=require"
             
-            # Crea connection pool
-            self.pool = psycopg2.pool.SimpleConnectionPool(
+            # Crea connection pool (thread-safe, righe dict come get_database_connection)
+            self.pool = psycopg2.pool.ThreadedConnectionPool(
                 minconn=1,
                 maxconn=self.pool_size,
-                dsn=url
+                dsn=url,
+                cursor_factory=RealDictCursor
             )
             
             logger.info("PostgreSQL connection pool created successfully")
@@ -74,7 +81,9 @@ class DatabasePool:
         """
         Inizializza pool SQLite (semplificato).
         
-        SQLite non ha vero pooling (file-based), ma usa connessioni thread-safe.
+        SQLite non ha vero pooling (file-based): le connessioni restituite
+        vengono tenute aperte fino a pool_size e riassegnate alla richiesta
+        successiva, qualunque sia il thread; le eccedenti vengono chiuse.
         """
         import sqlite3
         from pathlib import Path
@@ -114,14 +123,12 @@ class DatabasePool:
                     conn = self.pool.getconn()
                 yield conn
             else:
-                # SQLite: crea nuova connessione (thread-safe)
-                import sqlite3
-                conn = sqlite3.connect(self.db_path, check_same_thread=False)
-                conn.row_factory = sqlite3.Row
+                # SQLite: connessione inattiva del pool (o nuova)
+                conn = self._acquire_sqlite_connection()
                 yield conn
         except Exception as e:
             logger.error(f"Database connection error: {e}")
-            if conn and self.db_type == 'postgresql':
+            if conn:
                 # Rollback in caso di errore
                 try:
                     conn.rollback()
@@ -129,20 +136,69 @@ class DatabasePool:
                     pass
             raise
         finally:
-            if conn:
-                if self.db_type == 'postgresql':
-                    # Ritorna connessione al pool
-                    with self._lock:
-                        self.pool.putconn(conn)
-                else:
-                    # Chiudi connessione SQLite
-                    conn.close()
+            if conn and self.db_type == 'postgresql':
+                # Ritorna connessione al pool
+                with self._lock:
+                    self.pool.putconn(conn)
+            elif conn:
+                self._release_sqlite_connection(conn)
+
+    @contextmanager
+    def get_database(self):
+        """
+        Context manager per ottenere un GA4Database su una connessione del pool.
+
+        La connessione torna al pool all'uscita; le migrations non vengono
+        rieseguite per ogni richiesta.
+
+        Usage:
+            with pool.get_database() as db:
+                db.get_latest_date()
+
+        Yields:
+            GA4Database con owns_connection=False
+        """
+        from backend.ga4_extraction.database import GA4Database
+
+        with self.get_connection() as conn:
+            yield GA4Database(conn=conn, owns_connection=False, run_migrations=False)
+
+    def _acquire_sqlite_connection(self):
+        """Restituisce una connessione SQLite inattiva, creandola se non ce ne sono."""
+        with self._lock:
+            if self._sqlite_idle:
+                return self._sqlite_idle.pop()
+
+        import sqlite3
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _release_sqlite_connection(self, conn):
+        """Rimette la connessione tra le inattive, o la chiude se il pool è pieno."""
+        try:
+            # Non lasciare transazioni aperte alla richiesta successiva
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception as e:
+            logger.warning(f"Connessione SQLite scartata: {e}")
+            return
+        with self._lock:
+            if len(self._sqlite_idle) < self.pool_size:
+                self._sqlite_idle.append(conn)
+                return
+        conn.close()
     
     def close(self):
         """Chiude pool e rilascia risorse."""
         if self.pool and self.db_type == 'postgresql':
             self.pool.closeall()
             logger.info("PostgreSQL connection pool closed")
+        elif self.db_type == 'sqlite':
+            with self._lock:
+                for conn in self._sqlite_idle:
+                    conn.close()
+                self._sqlite_idle.clear()
 
 
 # =============================================================================
@@ -9,13 +9,16 @@ La scelta del database è automatica basata sulla variabile DATABASE_URL.
 import os
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple, Iterator
 from pathlib import Path
 from urllib.parse import urlparse
 from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
+# Statement preparati tenuti in cache per connessione SQLite (default sqlite3: 128)
+SQLITE_CACHED_STATEMENTS = 256
+
 
 # =============================================================================
 # DATABASE FACTORY
@@ -59,14 +62,80 @@ def get_database_connection(db_url: Optional[str] = None):
         db_dir = Path(db_path).parent
         db_dir.mkdir(parents=True, exist_ok=True)
         
-        conn = sqlite3.connect(db_path, check_same_thread=False)
+        # Cache statement più ampia del default (128): le query di lettura e
+        # gli insert ripetuti da sync/backfill restano preparati
+        conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=SQLITE_CACHED_STATEMENTS)
         conn.row_factory = sqlite3.Row
         return conn, 'sqlite'
 
 
+def _col_by_key(row, key: str, idx: int):
+    """Accesso a colonna per nome (sqlite3.Row, RealDictRow)."""
+    return row[key]
+
+
+def _col_by_index(row, key: str, idx: int):
+    """Accesso a colonna per posizione (tuple)."""
+    return row[idx]
+
+
+def _iso_date(value) -> Optional[str]:
+    """Converte date del driver (datetime.date) in stringa YYYY-MM-DD."""
+    return value.isoformat() if value is not None else None
+
+
+def _text_date(value) -> Optional[str]:
+    """Date già memorizzate come testo YYYY-MM-DD (SQLite)."""
+    return value
+
+
+def _rows_are_mappings(conn, db_type: str) -> bool:
+    """
+    Determina se le righe restituite dalla connessione supportano accesso per nome.
+
+    Args:
+        conn: Connessione database
+        db_type: 'sqlite' o 'postgresql'
+
+    Returns:
+        True se row factory/cursor factory producono righe indicizzabili per nome
+    """
+    if db_type == 'postgresql':
+        from psycopg2.extras import DictCursorBase
+        cursor_factory = getattr(conn, 'cursor_factory', None)
+        return cursor_factory is not None and issubclass(cursor_factory, DictCursorBase)
+    return getattr(conn, 'row_factory', None) is not None
+
+
 class GA4Database:
     """Manager per database delle metriche GA4 (SQLite/PostgreSQL)."""
 
+    # Metriche confrontate in calculate_comparison / calculate_comparisons_bulk
+    COMPARISON_METRICS = (
+        'sessioni_commodity', 'sessioni_lucegas', 'swi_conversioni',
+        'cr_commodity', 'cr_lucegas'
+    )
+
+    # Riepilogo daily_metrics_stats (riga unica id = 1) ricostruito da daily_metrics
+    _SQL_SEED_STATS = """
+        INSERT INTO daily_metrics_stats
+            (id, min_date, max_date, record_count, sum_sessioni_commodity, sum_swi_conversioni)
+        SELECT 1, s.min_date, s.max_date, s.record_count, s.sum_sessioni_commodity, s.sum_swi_conversioni
+        FROM (
+            SELECT MIN(date) AS min_date, MAX(date) AS max_date, COUNT(*) AS record_count,
+                   COALESCE(SUM(sessioni_commodity), 0) AS sum_sessioni_commodity,
+                   COALESCE(SUM(swi_conversioni), 0) AS sum_swi_conversioni
+            FROM daily_metrics
+        ) s
+        WHERE NOT EXISTS (SELECT 1 FROM daily_metrics_stats WHERE id = 1)
+    """
+
+    # Tabelle monitorate per l'allineamento (daily_metrics è il riferimento)
+    ALIGNMENT_TABLES = (
+        'daily_metrics', 'products_performance', 'swi_by_commodity',
+        'sessions_by_channel', 'sessions_by_campaign'
+    )
+
     def __init__(self, db_path: Optional[str] = None, conn=None, owns_connection: bool = True, run_migrations: bool = True):
         """
         Inizializza connessione al database.
@@ -113,6 +182,38 @@ class GA4Database:
 
         self._placeholder = '%s' if self.db_type == 'postgresql' else '?'
 
+        # Tipo di riga deciso una volta dal driver: evita isinstance per ogni riga
+        self._row_kind = 'mapping' if _rows_are_mappings(self.conn, self.db_type) else 'tuple'
+        self._col = _col_by_key if self._row_kind == 'mapping' else _col_by_index
+
+        # PostgreSQL restituisce datetime.date per colonne DATE, SQLite stringhe ISO
+        self._date_to_str = _iso_date if self.db_type == 'postgresql' else _text_date
+
+        # Query di esistenza preparate una volta (dipendono dal placeholder)
+        ph = self._placeholder
+        self._sql_data_exists = f"""
+            SELECT EXISTS(
+                SELECT 1 FROM daily_metrics
+                WHERE date = {ph}
+                  AND sessioni_commodity IS NOT NULL AND sessioni_commodity <> 0
+                  AND swi_conversioni IS NOT NULL AND swi_conversioni <> 0
+            ) AS found
+        """
+        self._sql_products_exist = f"SELECT 1 FROM products_performance WHERE date = {ph} LIMIT 1"
+
+        self._sql_update_stats = f"""
+            UPDATE daily_metrics_stats SET
+                record_count = record_count + {ph},
+                sum_sessioni_commodity = sum_sessioni_commodity + {ph},
+                sum_swi_conversioni = sum_swi_conversioni + {ph},
+                min_date = CASE WHEN min_date IS NULL OR min_date > {ph} THEN {ph} ELSE min_date END,
+                max_date = CASE WHEN max_date IS NULL OR max_date < {ph} THEN {ph} ELSE max_date END
+            WHERE id = 1
+        """
+
+        # Presenza di daily_metrics_stats (None = non ancora verificata)
+        self._stats_table_exists: Optional[bool] = None
+
         # Esegui migrations pendenti all'avvio
         if run_migrations:
             self._run_migrations()
@@ -163,6 +264,29 @@ class GA4Database:
             return dict(row)
         return dict(row)
     
+    def _scalar_cursor(self):
+        """Cursor che restituisce tuple semplici (per letture scalari)."""
+        if self.db_type == 'postgresql':
+            import psycopg2.extensions
+            return self.conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        return cursor
+
+    def _iter_dicts(self, cursor, chunk_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Itera le righe di un cursor come dict, leggendo a blocchi con fetchmany."""
+        columns = None
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                return
+            if self._row_kind == 'mapping':
+                yield from (dict(row) for row in chunk)
+            else:
+                if columns is None:
+                    columns = [col[0] for col in cursor.description]
+                yield from (dict(zip(columns, row)) for row in chunk)
+
     def _execute(self, query: str, params: tuple = ()) -> Any:
         """Esegue query con gestione cursor cross-database."""
         cursor = self.conn.cursor()
@@ -170,9 +294,28 @@ class GA4Database:
         return cursor
     
     def create_schema(self):
-        """Crea schema database con tabelle e indici."""
+        """
+        Crea schema database con tabelle e indici.
+
+        Tutto il DDL gira in una sola transazione (un solo commit/fsync).
+        Il modulo sqlite3 non apre transazioni implicite per CREATE: su SQLite
+        la transazione è aperta esplicitamente.
+        """
         cursor = self.conn.cursor()
-        
+        if self.db_type == 'sqlite' and not self.conn.in_transaction:
+            cursor.execute("BEGIN")
+
+        try:
+            self._create_schema_statements(cursor)
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        self.conn.commit()
+        logger.info(f"Schema database creato con successo ({self.db_type})")
+
+    def _create_schema_statements(self, cursor):
+        """Esegue il DDL di create_schema sul cursor dato (senza commit)."""
         if self.db_type == 'postgresql':
             # PostgreSQL schema
             cursor.execute("""
@@ -391,9 +534,101 @@ class GA4Database:
                 ON swi_by_commodity(commodity_type)
             """)
 
-        self.conn.commit()
-        logger.info(f"Schema database creato con successo ({self.db_type})")
+        # Riepilogo statistiche (sintassi comune ai due database)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_metrics_stats (
+                id INTEGER PRIMARY KEY,
+                min_date DATE,
+                max_date DATE,
+                record_count INTEGER NOT NULL DEFAULT 0,
+                sum_sessioni_commodity BIGINT NOT NULL DEFAULT 0,
+                sum_swi_conversioni BIGINT NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute(self._SQL_SEED_STATS)
+        self._stats_table_exists = True
     
+    def _daily_metrics_insert_sql(self, replace: bool) -> str:
+        """SQL di inserimento daily_metrics (upsert se replace=True) per il dialetto corrente."""
+        ph = self._ph(9)
+        columns = """(date, extraction_timestamp, sessioni_commodity, sessioni_lucegas,
+                 swi_conversioni, cr_commodity, cr_lucegas, cr_canalizzazione, start_funnel)"""
+
+        if not replace:
+            return f"INSERT INTO daily_metrics {columns} VALUES ({ph})"
+        if self.db_type == 'postgresql':
+            return f"""
+                INSERT INTO daily_metrics {columns}
+                VALUES ({ph})
+                ON CONFLICT (date) DO UPDATE SET
+                    extraction_timestamp = EXCLUDED.extraction_timestamp,
+                    sessioni_commodity = EXCLUDED.sessioni_commodity,
+                    sessioni_lucegas = EXCLUDED.sessioni_lucegas,
+                    swi_conversioni = EXCLUDED.swi_conversioni,
+                    cr_commodity = EXCLUDED.cr_commodity,
+                    cr_lucegas = EXCLUDED.cr_lucegas,
+                    cr_canalizzazione = EXCLUDED.cr_canalizzazione,
+                    start_funnel = EXCLUDED.start_funnel
+            """
+        return f"INSERT OR REPLACE INTO daily_metrics {columns} VALUES ({ph})"
+
+    def _has_stats_table(self) -> bool:
+        """
+        Verifica (una volta per istanza) se daily_metrics_stats esiste.
+
+        Returns:
+            False per database senza migrations: gli inserimenti procedono
+            senza aggiornare il riepilogo
+        """
+        if self._stats_table_exists is None:
+            check = self._scalar_cursor()
+            if self.db_type == 'postgresql':
+                check.execute("SELECT to_regclass('daily_metrics_stats') IS NOT NULL")
+                self._stats_table_exists = bool(check.fetchone()[0])
+            else:
+                check.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_metrics_stats'"
+                )
+                self._stats_table_exists = check.fetchone() is not None
+        return self._stats_table_exists
+
+    def _previous_metrics(self, dates: List[str]) -> Dict[str, Tuple[float, float]]:
+        """
+        Valori correnti (sessioni_commodity, swi_conversioni) delle date da sovrascrivere.
+
+        Su PostgreSQL le righe lette sono bloccate (FOR UPDATE) fino al commit:
+        solo le scritture sulle stesse date si serializzano.
+        """
+        lock = " FOR UPDATE" if self.db_type == 'postgresql' else ""
+        cursor = self._scalar_cursor()
+        cursor.execute(
+            f"SELECT date, sessioni_commodity, swi_conversioni FROM daily_metrics "
+            f"WHERE date IN ({self._ph(len(dates))}){lock}",
+            tuple(dates)
+        )
+        return {
+            self._date_to_str(date): (commodity, swi)
+            for date, commodity, swi in cursor.fetchall()
+        }
+
+    def refresh_statistics(self) -> None:
+        """
+        Ricostruisce daily_metrics_stats con una scansione completa di daily_metrics.
+
+        Gli inserimenti aggiornano il riepilogo per differenza; dopo una
+        cancellazione da daily_metrics (min/max possono ridursi) va chiamato
+        questo metodo.
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM daily_metrics_stats")
+            cursor.execute(self._SQL_SEED_STATS)
+            self.conn.commit()
+        except Exception as e:
+            logger.error(f"Errore ricostruzione riepilogo statistiche: {e}")
+            self.conn.rollback()
+            raise
+
     def insert_daily_metrics(
         self, 
         date: str, 
@@ -426,46 +661,20 @@ class GA4Database:
                 metrics['start_funnel']
             )
             
-            if self.db_type == 'postgresql':
-                if replace:
-                    cursor.execute("""
-                        INSERT INTO daily_metrics 
-                        (date, extraction_timestamp, sessioni_commodity, sessioni_lucegas,
-                         swi_conversioni, cr_commodity, cr_lucegas, cr_canalizzazione, start_funnel)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (date) DO UPDATE SET
-                            extraction_timestamp = EXCLUDED.extraction_timestamp,
-                            sessioni_commodity = EXCLUDED.sessioni_commodity,
-                            sessioni_lucegas = EXCLUDED.sessioni_lucegas,
-                            swi_conversioni = EXCLUDED.swi_conversioni,
-                            cr_commodity = EXCLUDED.cr_commodity,
-                            cr_lucegas = EXCLUDED.cr_lucegas,
-                            cr_canalizzazione = EXCLUDED.cr_canalizzazione,
-                            start_funnel = EXCLUDED.start_funnel
-                    """, values)
-                else:
-                    cursor.execute("""
-                        INSERT INTO daily_metrics 
-                        (date, extraction_timestamp, sessioni_commodity, sessioni_lucegas,
-                         swi_conversioni, cr_commodity, cr_lucegas, cr_canalizzazione, start_funnel)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, values)
-            else:
-                # SQLite
-                if replace:
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO daily_metrics 
-                        (date, extraction_timestamp, sessioni_commodity, sessioni_lucegas,
-                         swi_conversioni, cr_commodity, cr_lucegas, cr_canalizzazione, start_funnel)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, values)
-                else:
-                    cursor.execute("""
-                        INSERT INTO daily_metrics 
-                        (date, extraction_timestamp, sessioni_commodity, sessioni_lucegas,
-                         swi_conversioni, cr_commodity, cr_lucegas, cr_canalizzazione, start_funnel)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, values)
+            has_stats = self._has_stats_table()
+            previous = self._previous_metrics([date]).get(date) if has_stats else None
+
+            cursor.execute(self._daily_metrics_insert_sql(replace), values)
+
+            # Aggiorna riepilogo statistiche per differenza nella stessa transazione
+            if has_stats:
+                old_commodity, old_swi = previous if previous else (0, 0)
+                cursor.execute(self._sql_update_stats, (
+                    0 if previous else 1,
+                    metrics['sessioni_commodity'] - old_commodity,
+                    metrics['swi_conversioni'] - old_swi,
+                    date, date, date, date
+                ))
             
             self.conn.commit()
             logger.info(f"Metriche salvate per data: {date}")
@@ -477,6 +686,76 @@ class GA4Database:
             self.conn.rollback()
             # Propaga per rendere visibile l'errore a livello API
             raise
+
+    def insert_daily_metrics_bulk(
+        self,
+        rows: List[Tuple[str, Dict[str, Any]]],
+        replace: bool = True
+    ) -> int:
+        """
+        Inserisce o aggiorna metriche giornaliere per più date in una sola transazione.
+
+        Usa un'unica executemany e aggiorna il riepilogo statistiche una volta
+        sola: pensato per backfill su molte date.
+
+        Args:
+            rows: Lista di tuple (data YYYY-MM-DD, dict metriche raw).
+                  Per date ripetute vale l'ultima occorrenza.
+            replace: Se True, sostituisce record esistenti (default: True)
+
+        Returns:
+            Numero di date salvate
+        """
+        if not rows:
+            return 0
+
+        by_date = dict(rows)
+        dates = list(by_date)
+        timestamp = datetime.now().isoformat()
+
+        try:
+            cursor = self.conn.cursor()
+            has_stats = self._has_stats_table()
+            previous = self._previous_metrics(dates) if has_stats else {}
+
+            cursor.executemany(self._daily_metrics_insert_sql(replace), [
+                (
+                    date,
+                    timestamp,
+                    metrics['sessioni_commodity'],
+                    metrics['sessioni_lucegas'],
+                    metrics['swi_conversioni'],
+                    metrics['cr_commodity'],
+                    metrics['cr_lucegas'],
+                    metrics['cr_canalizzazione'],
+                    metrics['start_funnel']
+                )
+                for date, metrics in by_date.items()
+            ])
+
+            # Aggiorna riepilogo statistiche per differenza nella stessa transazione
+            min_date, max_date = min(dates), max(dates)
+            if has_stats:
+                delta_commodity = delta_swi = 0
+                for date, metrics in by_date.items():
+                    old_commodity, old_swi = previous.get(date, (0, 0))
+                    delta_commodity += metrics['sessioni_commodity'] - old_commodity
+                    delta_swi += metrics['swi_conversioni'] - old_swi
+                cursor.execute(self._sql_update_stats, (
+                    len(dates) - len(previous),
+                    delta_commodity,
+                    delta_swi,
+                    min_date, min_date, max_date, max_date
+                ))
+
+            self.conn.commit()
+            logger.info(f"Metriche salvate per {len(dates)} date ({min_date} → {max_date})")
+            return len(dates)
+
+        except Exception as e:
+            logger.error(f"Errore inserimento bulk metriche: {e}", exc_info=True)
+            self.conn.rollback()
+            raise
     
     def insert_products(
         self, 
@@ -506,30 +785,15 @@ class GA4Database:
                     (date,)
                 )
             
-            # Inserisci nuovi prodotti
-            for product in products:
-                if self.db_type == 'postgresql':
-                    cursor.execute("""
-                        INSERT INTO products_performance 
-                        (date, product_name, total_conversions, percentage)
-                        VALUES (%s, %s, %s, %s)
-                    """, (
-                        date,
-                        product['product_name'],
-                        product['total_conversions'],
-                        product['percentage']
-                    ))
-                else:
-                    cursor.execute("""
-                        INSERT INTO products_performance 
-                        (date, product_name, total_conversions, percentage)
-                        VALUES (?, ?, ?, ?)
-                    """, (
-                        date,
-                        product['product_name'],
-                        product['total_conversions'],
-                        product['percentage']
-                    ))
+            # Inserisci nuovi prodotti (un solo statement preparato)
+            cursor.executemany(f"""
+                INSERT INTO products_performance 
+                (date, product_name, total_conversions, percentage)
+                VALUES ({self._ph(4)})
+            """, [
+                (date, product['product_name'], product['total_conversions'], product['percentage'])
+                for product in products
+            ])
             
             self.conn.commit()
             logger.info(f"Prodotti salvati per data {date}: {len(products)} prodotti")
@@ -540,6 +804,28 @@ class GA4Database:
             self.conn.rollback()
             raise
     
+    def insert_products_bulk(
+        self,
+        rows: List[Tuple[str, List[Dict[str, Any]]]],
+        replace: bool = True
+    ) -> int:
+        """
+        Inserisce performance prodotti di più date in una sola transazione.
+
+        Args:
+            rows: Lista di tuple (data YYYY-MM-DD, prodotti come insert_products)
+            replace: Se True, elimina prodotti esistenti per quelle date
+
+        Returns:
+            Numero di date salvate (0 se errore)
+        """
+        return self._insert_rows_bulk(
+            'products_performance',
+            ('product_name', 'total_conversions', 'percentage'),
+            rows,
+            replace
+        )
+    
     def insert_sessions_by_channel(
         self, 
         date: str, 
@@ -568,30 +854,15 @@ class GA4Database:
                     (date,)
                 )
             
-            # Inserisci nuovi canali
-            for channel in channels:
-                if self.db_type == 'postgresql':
-                    cursor.execute("""
-                        INSERT INTO sessions_by_channel 
-                        (date, channel, commodity_sessions, lucegas_sessions)
-                        VALUES (%s, %s, %s, %s)
-                    """, (
-                        date,
-                        channel['channel'],
-                        channel['commodity_sessions'],
-                        channel['lucegas_sessions']
-                    ))
-                else:
-                    cursor.execute("""
-                        INSERT INTO sessions_by_channel 
-                        (date, channel, commodity_sessions, lucegas_sessions)
-                        VALUES (?, ?, ?, ?)
-                    """, (
-                        date,
-                        channel['channel'],
-                        channel['commodity_sessions'],
-                        channel['lucegas_sessions']
-                    ))
+            # Inserisci nuovi canali (un solo statement preparato)
+            cursor.executemany(f"""
+                INSERT INTO sessions_by_channel 
+                (date, channel, commodity_sessions, lucegas_sessions)
+                VALUES ({self._ph(4)})
+            """, [
+                (date, channel['channel'], channel['commodity_sessions'], channel['lucegas_sessions'])
+                for channel in channels
+            ])
             
             self.conn.commit()
             logger.info(f"Sessioni per canale salvate per data {date}: {len(channels)} canali")
@@ -651,30 +922,15 @@ class GA4Database:
                     (date,)
                 )
             
-            # Inserisci nuove campagne
-            for campaign in campaigns:
-                if self.db_type == 'postgresql':
-                    cursor.execute("""
-                        INSERT INTO sessions_by_campaign 
-                        (date, campaign, commodity_sessions, lucegas_sessions)
-                        VALUES (%s, %s, %s, %s)
-                    """, (
-                        date,
-                        campaign['campaign'],
-                        campaign['commodity_sessions'],
-                        campaign['lucegas_sessions']
-                    ))
-                else:
-                    cursor.execute("""
-                        INSERT INTO sessions_by_campaign 
-                        (date, campaign, commodity_sessions, lucegas_sessions)
-                        VALUES (?, ?, ?, ?)
-                    """, (
-                        date,
-                        campaign['campaign'],
-                        campaign['commodity_sessions'],
-                        campaign['lucegas_sessions']
-                    ))
+            # Inserisci nuove campagne (un solo statement preparato)
+            cursor.executemany(f"""
+                INSERT INTO sessions_by_campaign 
+                (date, campaign, commodity_sessions, lucegas_sessions)
+                VALUES ({self._ph(4)})
+            """, [
+                (date, campaign['campaign'], campaign['commodity_sessions'], campaign['lucegas_sessions'])
+                for campaign in campaigns
+            ])
             
             self.conn.commit()
             logger.info(f"Sessioni per campagna salvate per data {date}: {len(campaigns)} campagne")
@@ -684,6 +940,116 @@ class GA4Database:
             logger.error(f"Errore inserimento sessioni per campagna per {date}: {e}")
             self.conn.rollback()
             return False
+
+    def _insert_rows_bulk(
+        self,
+        table: str,
+        columns: Tuple[str, ...],
+        rows: List[Tuple[str, List[Dict[str, Any]]]],
+        replace: bool
+    ) -> int:
+        """
+        Inserisce i record di più date in una tabella satellite in una transazione.
+
+        Args:
+            table: Tabella con colonna date (es. sessions_by_channel)
+            columns: Colonne (oltre a date) lette da ogni dict record
+            rows: Lista di tuple (data YYYY-MM-DD, lista di dict record)
+            replace: Se True, elimina prima i record esistenti di quelle date
+
+        Returns:
+            Numero di date salvate (0 se errore, nessuna data salvata)
+        """
+        if not rows:
+            return 0
+
+        by_date = dict(rows)
+        dates = list(by_date)
+
+        try:
+            cursor = self.conn.cursor()
+
+            if replace:
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE date IN ({self._ph(len(dates))})",
+                    tuple(dates)
+                )
+
+            cursor.executemany(
+                f"INSERT INTO {table} (date, {', '.join(columns)}) "
+                f"VALUES ({self._ph(len(columns) + 1)})",
+                [
+                    (date, *(item[column] for column in columns))
+                    for date, items in by_date.items()
+                    for item in items
+                ]
+            )
+
+            self.conn.commit()
+            logger.info(f"Record {table} salvati per {len(dates)} date")
+            return len(dates)
+
+        except Exception as e:
+            logger.error(f"Errore inserimento bulk {table}: {e}")
+            self.conn.rollback()
+            return 0
+
+    def _insert_sessions_bulk(
+        self,
+        table: str,
+        key: str,
+        rows: List[Tuple[str, List[Dict[str, Any]]]],
+        replace: bool
+    ) -> int:
+        """
+        Inserisce sessioni per dimensione (canale/campagna) di più date in una transazione.
+
+        Args:
+            table: sessions_by_channel o sessions_by_campaign
+            key: Colonna dimensione (channel o campaign)
+            rows: Lista di tuple (data YYYY-MM-DD, lista di dict come insert_sessions_by_*)
+            replace: Se True, elimina prima le sessioni esistenti di quelle date
+
+        Returns:
+            Numero di date salvate (0 se errore, nessuna data salvata)
+        """
+        return self._insert_rows_bulk(
+            table, (key, 'commodity_sessions', 'lucegas_sessions'), rows, replace
+        )
+
+    def insert_sessions_by_channel_bulk(
+        self,
+        rows: List[Tuple[str, List[Dict[str, Any]]]],
+        replace: bool = True
+    ) -> int:
+        """
+        Inserisce sessioni per canale di più date in una sola transazione.
+
+        Args:
+            rows: Lista di tuple (data YYYY-MM-DD, canali come insert_sessions_by_channel)
+            replace: Se True, elimina sessioni esistenti per quelle date
+
+        Returns:
+            Numero di date salvate (0 se errore)
+        """
+        return self._insert_sessions_bulk('sessions_by_channel', 'channel', rows, replace)
+
+    def insert_sessions_by_campaign_bulk(
+        self,
+        rows: List[Tuple[str, List[Dict[str, Any]]]],
+        replace: bool = True
+    ) -> int:
+        """
+        Inserisce sessioni per campagna di più date in una sola transazione.
+
+        Args:
+            rows: Lista di tuple (data YYYY-MM-DD, campagne come insert_sessions_by_campaign)
+            replace: Se True, elimina sessioni esistenti per quelle date
+
+        Returns:
+            Numero di date salvate (0 se errore)
+        """
+        return self._insert_sessions_bulk('sessions_by_campaign', 'campaign', rows, replace)
     
     def get_sessions_by_campaign(self, date: str) -> List[Dict[str, Any]]:
         """
@@ -733,27 +1099,14 @@ class GA4Database:
                     (date,)
                 )
 
-            for commodity in commodities:
-                if self.db_type == 'postgresql':
-                    cursor.execute("""
-                        INSERT INTO swi_by_commodity
-                        (date, commodity_type, conversions)
-                        VALUES (%s, %s, %s)
-                    """, (
-                        date,
-                        commodity['commodity_type'],
-                        commodity['conversions']
-                    ))
-                else:
-                    cursor.execute("""
-                        INSERT INTO swi_by_commodity
-                        (date, commodity_type, conversions)
-                        VALUES (?, ?, ?)
-                    """, (
-                        date,
-                        commodity['commodity_type'],
-                        commodity['conversions']
-                    ))
+            cursor.executemany(f"""
+                INSERT INTO swi_by_commodity
+                (date, commodity_type, conversions)
+                VALUES ({self._ph(3)})
+            """, [
+                (date, commodity['commodity_type'], commodity['conversions'])
+                for commodity in commodities
+            ])
 
             self.conn.commit()
             logger.info(f"SWI per commodity salvati per data {date}: {len(commodities)} tipi")
@@ -764,6 +1117,25 @@ class GA4Database:
             self.conn.rollback()
             return False
 
+    def insert_swi_by_commodity_bulk(
+        self,
+        rows: List[Tuple[str, List[Dict[str, Any]]]],
+        replace: bool = True
+    ) -> int:
+        """
+        Inserisce conversioni SWI per tipo commodity di più date in una sola transazione.
+
+        Args:
+            rows: Lista di tuple (data YYYY-MM-DD, commodity come insert_swi_by_commodity)
+            replace: Se True, elimina record esistenti per quelle date
+
+        Returns:
+            Numero di date salvate (0 se errore)
+        """
+        return self._insert_rows_bulk(
+            'swi_by_commodity', ('commodity_type', 'conversions'), rows, replace
+        )
+
     def get_swi_by_commodity(self, date: str) -> List[Dict[str, Any]]:
         """
         Recupera conversioni SWI per tipo commodity per una data.
@@ -806,8 +1178,7 @@ class GA4Database:
         if row:
             result = dict(row)
             # Normalizza il campo date come stringa
-            if 'date' in result and hasattr(result['date'], 'isoformat'):
-                result['date'] = result['date'].isoformat()
+            result['date'] = self._date_to_str(result['date'])
             return result
         return None
     
@@ -821,15 +1192,25 @@ class GA4Database:
         Returns:
             Lista di dict con prodotti
         """
+        return list(self.iter_products(date))
+
+    def iter_products(self, date: str) -> Iterator[Dict[str, Any]]:
+        """
+        Come get_products, ma restituisce i prodotti in streaming (fetchmany).
+
+        Args:
+            date: Data in formato YYYY-MM-DD
+
+        Yields:
+            Dict prodotto, ordinati per conversioni decrescenti
+        """
         cursor = self.conn.cursor()
         ph = self._placeholder
         cursor.execute(
             f"SELECT * FROM products_performance WHERE date = {ph} ORDER BY total_conversions DESC",
             (date,)
         )
-        rows = cursor.fetchall()
-        
-        return [dict(row) for row in rows]
+        yield from self._iter_dicts(cursor)
     
     def get_date_range(
         self, 
@@ -846,6 +1227,19 @@ class GA4Database:
         Returns:
             Lista di dict con metriche ordinate per data
         """
+        return list(self.iter_date_range(start_date, end_date))
+
+    def iter_date_range(self, start_date: str, end_date: str) -> Iterator[Dict[str, Any]]:
+        """
+        Come get_date_range, ma restituisce le metriche in streaming (fetchmany).
+
+        Args:
+            start_date: Data inizio (YYYY-MM-DD)
+            end_date: Data fine (YYYY-MM-DD)
+
+        Yields:
+            Dict metriche, ordinati per data
+        """
         cursor = self.conn.cursor()
         ph = self._placeholder
         cursor.execute(f"""
@@ -853,16 +1247,11 @@ class GA4Database:
             WHERE date BETWEEN {ph} AND {ph}
             ORDER BY date ASC
         """, (start_date, end_date))
-        
-        rows = cursor.fetchall()
-        result = []
-        for row in rows:
-            r = dict(row)
+
+        for r in self._iter_dicts(cursor):
             # Normalizza il campo date come stringa
-            if 'date' in r and hasattr(r['date'], 'isoformat'):
-                r['date'] = r['date'].isoformat()
-            result.append(r)
-        return result
+            r['date'] = self._date_to_str(r['date'])
+            yield r
     
     def calculate_comparison(
         self, 
@@ -900,44 +1289,95 @@ class GA4Database:
                 'comparison': None
             }
         
-        # Calcola change% per ogni metrica
-        def calc_change(current_val, previous_val):
-            if previous_val == 0:
-                return 0.0
-            return ((current_val - previous_val) / previous_val) * 100
-        
-        comparison = {
-            'sessioni_commodity_change': calc_change(
-                current['sessioni_commodity'], 
-                previous['sessioni_commodity']
-            ),
-            'sessioni_lucegas_change': calc_change(
-                current['sessioni_lucegas'], 
-                previous['sessioni_lucegas']
-            ),
-            'swi_conversioni_change': calc_change(
-                current['swi_conversioni'], 
-                previous['swi_conversioni']
-            ),
-            'cr_commodity_change': calc_change(
-                current['cr_commodity'], 
-                previous['cr_commodity']
-            ),
-            'cr_lucegas_change': calc_change(
-                current['cr_lucegas'], 
-                previous['cr_lucegas']
-            ),
-        }
-        
         return {
             'current': current,
             'previous': previous,
-            'comparison': comparison,
+            'comparison': self._comparison_changes(current, previous),
             'current_date': current_date,
             'previous_date': previous_date,
             'days_offset': days_ago
         }
     
+    @classmethod
+    def _comparison_changes(cls, current: Dict[str, Any], previous: Dict[str, Any]) -> Dict[str, float]:
+        """Change% di ogni metrica di COMPARISON_METRICS (0.0 se il valore precedente è 0)."""
+        def calc_change(current_val, previous_val):
+            if previous_val == 0:
+                return 0.0
+            return ((current_val - previous_val) / previous_val) * 100
+
+        return {
+            f'{metric}_change': calc_change(current[metric], previous[metric])
+            for metric in cls.COMPARISON_METRICS
+        }
+
+    def calculate_comparisons_bulk(
+        self,
+        dates: List[str],
+        days_ago: int = 7
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Calcola i confronti per più date con un'unica query.
+
+        Stesso risultato di calculate_comparison per ogni data (stesso calcolo
+        dei change%, _comparison_changes), ma metriche correnti e precedenti
+        sono recuperate con una sola query IN.
+
+        Args:
+            dates: Lista di date correnti (YYYY-MM-DD)
+            days_ago: Giorni indietro per confronto (default: 7)
+
+        Returns:
+            Dict data -> risultato nello stesso formato di calculate_comparison
+            (None se mancano le metriche correnti)
+        """
+        if not dates:
+            return {}
+
+        previous_of = {
+            d: (datetime.strptime(d, '%Y-%m-%d') - timedelta(days=days_ago)).strftime('%Y-%m-%d')
+            for d in dates
+        }
+        lookup = sorted(set(dates) | set(previous_of.values()))
+
+        cursor = self.conn.cursor()
+        cursor.execute(
+            f"SELECT * FROM daily_metrics WHERE date IN ({self._ph(len(lookup))})",
+            tuple(lookup)
+        )
+        metrics_by_date = {}
+        for row in cursor.fetchall():
+            metrics = self._dict_row(row)
+            metrics['date'] = self._date_to_str(metrics['date'])
+            metrics_by_date[metrics['date']] = metrics
+
+        results = {}
+        for current_date in dates:
+            current = metrics_by_date.get(current_date)
+            previous_date = previous_of[current_date]
+            previous = metrics_by_date.get(previous_date)
+            if not current:
+                logger.warning(f"Metriche non trovate per data: {current_date}")
+                results[current_date] = None
+            elif not previous:
+                logger.warning(f"Metriche non trovate per data confronto: {previous_date}")
+                results[current_date] = {
+                    'current': current,
+                    'previous': None,
+                    'comparison': None
+                }
+            else:
+                results[current_date] = {
+                    'current': current,
+                    'previous': previous,
+                    'comparison': self._comparison_changes(current, previous),
+                    'current_date': current_date,
+                    'previous_date': previous_date,
+                    'days_offset': days_ago
+                }
+
+        return results
+
     def get_latest_date(self) -> Optional[str]:
         """
         Recupera la data più recente disponibile nel database.
@@ -945,18 +1385,15 @@ class GA4Database:
         Returns:
             Data in formato YYYY-MM-DD o None se DB vuoto
         """
-        cursor = self.conn.cursor()
+        cursor = self._scalar_cursor()
         cursor.execute(
             "SELECT date FROM daily_metrics ORDER BY date DESC LIMIT 1"
         )
         row = cursor.fetchone()
         
         if row:
-            date_val = row['date'] if isinstance(row, dict) else row[0]
             # Normalizza come stringa
-            if hasattr(date_val, 'isoformat'):
-                return date_val.isoformat()
-            return str(date_val)
+            return self._date_to_str(row[0])
         return None
     
     def get_record_count(self) -> int:
@@ -966,11 +1403,11 @@ class GA4Database:
         Returns:
             Numero di giorni di dati disponibili
         """
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT COUNT(*) as count FROM daily_metrics")
+        cursor = self._scalar_cursor()
+        cursor.execute("SELECT COUNT(*) FROM daily_metrics")
         row = cursor.fetchone()
         if row:
-            return row['count'] if isinstance(row, dict) else row[0]
+            return row[0]
         return 0
     
     def get_date_exists(self, date: str) -> bool:
@@ -988,6 +1425,51 @@ class GA4Database:
     def get_statistics(self) -> Dict[str, Any]:
         """
         Recupera statistiche generali sul database.
+
+        Legge il riepilogo daily_metrics_stats (tempo costante); se assente usa
+        la scansione completa di daily_metrics, senza scrivere.
+
+        Returns:
+            Dict con statistiche (min_date, max_date, record_count, etc.)
+        """
+        query = """
+            SELECT min_date, max_date, record_count, sum_sessioni_commodity, sum_swi_conversioni
+            FROM daily_metrics_stats WHERE id = 1
+        """
+        try:
+            cursor = self._scalar_cursor()
+            cursor.execute(query)
+            row = cursor.fetchone()
+        except Exception as e:
+            logger.warning(f"Riepilogo statistiche non disponibile ({e}), uso scansione completa")
+            self.conn.rollback()
+            return self._scan_statistics()
+
+        if row is None:
+            # Riepilogo mancante (es. dati caricati esternamente): vedi refresh_statistics
+            return self._scan_statistics()
+
+        min_date, max_date, record_count, sum_commodity, sum_swi = row
+        if record_count > 0:
+            return {
+                'min_date': self._date_to_str(min_date),
+                'max_date': self._date_to_str(max_date),
+                'record_count': record_count,
+                'avg_sessioni_commodity': sum_commodity / record_count,
+                'avg_swi_conversioni': sum_swi / record_count
+            }
+
+        return {
+            'min_date': None,
+            'max_date': None,
+            'record_count': 0,
+            'avg_sessioni_commodity': 0,
+            'avg_swi_conversioni': 0
+        }
+
+    def _scan_statistics(self) -> Dict[str, Any]:
+        """
+        Calcola statistiche generali con scansione completa di daily_metrics.
         
         Returns:
             Dict con statistiche (min_date, max_date, record_count, etc.)
@@ -1007,7 +1489,7 @@ class GA4Database:
         row = cursor.fetchone()
         
         if row:
-            result = dict(row) if isinstance(row, dict) else {
+            result = dict(row) if self._row_kind == 'mapping' else {
                 'min_date': row[0],
                 'max_date': row[1],
                 'record_count': row[2],
@@ -1017,8 +1499,7 @@ class GA4Database:
             if result.get('record_count', 0) > 0:
                 # Normalizza date come stringhe
                 for key in ['min_date', 'max_date']:
-                    if key in result and result[key] and hasattr(result[key], 'isoformat'):
-                        result[key] = result[key].isoformat()
+                    result[key] = self._date_to_str(result[key])
                 return result
         
         return {
@@ -1041,22 +1522,19 @@ class GA4Database:
             True se dati esistono e sono completi, False altrimenti
         """
         try:
-            # Check metriche principali
-            metrics = self.get_metrics(date)
-            if not metrics:
+            # Check metriche principali: riga presente con campi essenziali non nulli/zero
+            cursor = self.conn.cursor()
+            cursor.execute(self._sql_data_exists, (date,))
+            row = cursor.fetchone()
+            found = self._col(row, 'found', 0)
+            if not found:
+                logger.debug(f"Metriche mancanti o incomplete per {date}")
                 return False
             
-            # Verifica che i campi essenziali non siano nulli/zero
-            essential_fields = ['sessioni_commodity', 'swi_conversioni']
-            for field in essential_fields:
-                if metrics.get(field) is None or metrics.get(field) == 0:
-                    logger.debug(f"Campo {field} mancante o zero per {date}")
-                    return False
-            
             # Check prodotti se richiesto
             if check_products:
-                products = self.get_products(date)
-                if not products or len(products) == 0:
+                cursor.execute(self._sql_products_exist, (date,))
+                if cursor.fetchone() is None:
                     logger.debug(f"Prodotti mancanti per {date}")
                     return False
             
@@ -1076,12 +1554,7 @@ class GA4Database:
         Returns:
             Set di date in formato stringa YYYY-MM-DD
         """
-        valid_tables = [
-            'daily_metrics', 'products_performance', 'swi_by_commodity',
-            'sessions_by_channel', 'sessions_by_campaign'
-        ]
-
-        if table_name not in valid_tables:
+        if table_name not in self.ALIGNMENT_TABLES:
             logger.warning(f"Tabella non valida: {table_name}")
             return set()
 
@@ -1090,20 +1563,67 @@ class GA4Database:
             cursor.execute(f"SELECT DISTINCT date FROM {table_name} ORDER BY date")
             rows = cursor.fetchall()
 
-            dates = set()
-            for row in rows:
-                date_val = row['date'] if isinstance(row, dict) else row[0]
-                if hasattr(date_val, 'isoformat'):
-                    dates.add(date_val.isoformat())
-                else:
-                    dates.add(str(date_val))
-
-            return dates
+            return {self._date_to_str(self._col(row, 'date', 0)) for row in rows}
 
         except Exception as e:
             logger.error(f"Errore recupero date da {table_name}: {e}")
             return set()
 
+    def _missing_dates(self, satellite_table: str, cutoff: str) -> Dict[str, Any]:
+        """
+        Calcola in SQL le date di daily_metrics assenti in una tabella satellite.
+
+        Args:
+            satellite_table: Nome della tabella satellite
+            cutoff: Data massima attesa (YYYY-MM-DD), inclusa
+
+        Returns:
+            Dict con missing_dates (ordinate), expected_count e actual_count.
+            Se la tabella satellite non è leggibile viene trattata come vuota
+            (tutte le date attese mancanti), come per le altre tabelle.
+        """
+        ph = self._placeholder
+
+        try:
+            cursor = self.conn.cursor()
+
+            # Anti-join: solo le date mancanti (spesso nessuna) tornano a Python
+            cursor.execute(f"""
+                SELECT d.date
+                FROM daily_metrics d
+                LEFT JOIN (SELECT DISTINCT date FROM {satellite_table}) s ON s.date = d.date
+                WHERE d.date <= {ph} AND s.date IS NULL
+                ORDER BY d.date
+            """, (cutoff,))
+            missing_dates = [self._date_to_str(self._col(row, 'date', 0)) for row in cursor.fetchall()]
+
+            cursor.execute(f"""
+                SELECT
+                    (SELECT COUNT(*) FROM daily_metrics WHERE date <= {ph}) AS expected_count,
+                    (SELECT COUNT(DISTINCT date) FROM {satellite_table}) AS actual_count
+            """, (cutoff,))
+            row = cursor.fetchone()
+
+            return {
+                'missing_dates': missing_dates,
+                'expected_count': self._col(row, 'expected_count', 0),
+                'actual_count': self._col(row, 'actual_count', 1)
+            }
+
+        except Exception as e:
+            logger.error(f"Errore verifica allineamento {satellite_table}: {e}")
+            self.conn.rollback()
+
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT date FROM daily_metrics WHERE date <= {ph} ORDER BY date", (cutoff,))
+        missing_dates = [self._date_to_str(self._col(row, 'date', 0)) for row in cursor.fetchall()]
+
+        return {
+            'missing_dates': missing_dates,
+            'expected_count': len(missing_dates),
+            'actual_count': 0
+        }
+
     def check_alignment_status(self) -> dict:
         """
         Verifica lo stato di allineamento di tutte le tabelle rispetto a daily_metrics.
@@ -1117,8 +1637,6 @@ class GA4Database:
         Returns:
             Dict con status di allineamento per ogni tabella
         """
-        from datetime import datetime, timedelta
-
         # Configurazione tabelle satellite
         table_config = {
             'products_performance': {'delay_days': 0},
@@ -1127,10 +1645,15 @@ class GA4Database:
             'sessions_by_campaign': {'delay_days': 2},
         }
 
-        # Recupera date di riferimento da daily_metrics
-        reference_dates = self.get_table_dates('daily_metrics')
+        # Statistiche di riferimento da daily_metrics
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*) AS count, MIN(date) AS min_date, MAX(date) AS max_date FROM daily_metrics")
+        row = cursor.fetchone()
+        count = self._col(row, 'count', 0)
+        min_date = self._col(row, 'min_date', 1)
+        max_date = self._col(row, 'max_date', 2)
 
-        if not reference_dates:
+        if not count:
             return {
                 'reference': {
                     'table': 'daily_metrics',
@@ -1145,18 +1668,15 @@ class GA4Database:
                 }
             }
 
-        sorted_dates = sorted(reference_dates)
-        min_date = sorted_dates[0]
-        max_date = sorted_dates[-1]
+        min_date, max_date = self._date_to_str(min_date), self._date_to_str(max_date)
         max_date_obj = datetime.strptime(max_date, '%Y-%m-%d')
 
         result = {
             'reference': {
                 'table': 'daily_metrics',
-                'count': len(reference_dates),
+                'count': count,
                 'min_date': min_date,
-                'max_date': max_date,
-                'dates': reference_dates
+                'max_date': max_date
             },
             'tables': {},
             'summary': {
@@ -1168,26 +1688,17 @@ class GA4Database:
         # Verifica ogni tabella satellite
         for table_name, config in table_config.items():
             delay_days = config['delay_days']
+            cutoff_date = (max_date_obj - timedelta(days=delay_days)).strftime('%Y-%m-%d')
 
-            # Calcola date attese
-            if delay_days > 0:
-                cutoff_date = (max_date_obj - timedelta(days=delay_days)).strftime('%Y-%m-%d')
-                expected_dates = {d for d in reference_dates if d <= cutoff_date}
-            else:
-                expected_dates = reference_dates.copy()
-
-            # Recupera date esistenti
-            actual_dates = self.get_table_dates(table_name)
-
-            # Calcola date mancanti
-            missing_dates = sorted(expected_dates - actual_dates)
+            stats = self._missing_dates(table_name, cutoff_date)
 
+            missing_dates = stats['missing_dates']
             is_aligned = len(missing_dates) == 0
 
             result['tables'][table_name] = {
                 'delay_days': delay_days,
-                'expected_count': len(expected_dates),
-                'actual_count': len(actual_dates),
+                'expected_count': stats['expected_count'],
+                'actual_count': stats['actual_count'],
                 'missing_count': len(missing_dates),
                 'missing_dates': missing_dates,
                 'aligned': is_aligned
@@ -9,15 +9,25 @@ Features:
 - Logging strutturato
 """
 
+import atexit
 import os
 import sys
 import logging
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from threading import BoundedSemaphore, Lock
 from typing import Dict, List, Tuple, Optional
+import numpy as np
 import pandas as pd
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
+from google.api_core.exceptions import ResourceExhausted
 from google.analytics.data_v1beta.types import (
-    DateRange, Dimension, Metric, RunReportRequest,
+    DateRange, Dimension, Metric, RunReportRequest, BatchRunReportsRequest,
     FilterExpression, Filter, FilterExpressionList
 )
 from google.oauth2.credentials import Credentials
@@ -26,7 +36,7 @@ from google.auth.transport.requests import Request
 from .filters import session_commodity_filter, session_lucegas_filter, funnel_weborder_step1_filter, commodity_type_filter
 from .config import get_credentials
 from .rate_limiter import get_rate_limiter
-from .retry import ga4_retry
+from .retry import ga4_retry, QUOTA_EXCEPTIONS
 
 # ============================================================================
 # CONFIGURAZIONE
@@ -55,35 +65,176 @@ logger = logging.getLogger(__name__)
 # ============================================================================
 
 _ga_client = None
+_ga_client_lock = Lock()
 
 
 def get_ga_client() -> BetaAnalyticsDataClient:
     """
     Restituisce un client GA4 con inizializzazione lazy.
     Evita eccezioni a import time in ambienti serverless.
+
+    Il client è unico per processo (credenziali caricate una sola volta) ed è
+    thread-safe: può essere condiviso dalle richieste concorrenti.
     """
     global _ga_client
     if _ga_client is None:
-        creds = get_credentials()
-        if not creds:
-            raise Exception("GA4 credentials not configured (GOOGLE_CREDENTIALS_JSON missing or invalid)")
-        _ga_client = BetaAnalyticsDataClient(credentials=creds)
+        with _ga_client_lock:
+            if _ga_client is None:  # Double-check locking
+                creds = get_credentials()
+                if not creds:
+                    raise Exception("GA4 credentials not configured (GOOGLE_CREDENTIALS_JSON missing or invalid)")
+                _ga_client = BetaAnalyticsDataClient(credentials=creds)
+                # Canale gRPC chiuso in modo ordinato all'uscita del processo
+                atexit.register(close_ga_client)
     return _ga_client
 
 
+def close_ga_client() -> None:
+    """Chiude il canale del client GA4 condiviso (ricreato al prossimo get_ga_client)."""
+    global _ga_client
+    with _ga_client_lock:
+        client, _ga_client = _ga_client, None
+    if client is not None:
+        try:
+            client.transport.close()
+        except Exception as e:
+            logger.debug(f"Chiusura client GA4: {e}")
+
+
+# Limite GA4 di richieste concorrenti per property, condiviso da tutti i pool
+GA4_MAX_CONCURRENT_REQUESTS = 10
+_ga4_concurrency = BoundedSemaphore(GA4_MAX_CONCURRENT_REQUESTS)
+
+
+# Cache in memoria delle response GA4 per richieste su date consolidate.
+# Dopo il ritardo D-2 i dati GA4 non cambiano: ri-esecuzioni (dry-run poi
+# run reale, extractor che condividono le date) evitano il round-trip.
+GA4_CACHE_TTL_SECONDS = 3600
+GA4_CACHE_MAXSIZE = 1024
+GA4_CACHE_MIN_DELAY_DAYS = 2
+_ga4_cache: "weakref.WeakKeyDictionary[BetaAnalyticsDataClient, OrderedDict]" = weakref.WeakKeyDictionary()
+_ga4_cache_lock = Lock()
+
+
+# Dopo un errore di quota sopravvissuto ai retry, le richieste GA4 sono
+# rifiutate localmente per GA4_QUOTA_BACKOFF_SECONDS (quota per property,
+# condivisa da tutti gli extractor)
+GA4_QUOTA_BACKOFF_SECONDS = 600
+_quota_exhausted_until = 0.0
+
+
+def clear_ga4_cache() -> None:
+    """Svuota la cache delle response GA4 (tutti i client)."""
+    with _ga4_cache_lock:
+        _ga4_cache.clear()
+
+
+def _request_end_dates(request) -> List[str]:
+    """End date di tutti i date range di una RunReportRequest o BatchRunReportsRequest."""
+    requests = request.requests if isinstance(request, BatchRunReportsRequest) else [request]
+    return [dr.end_date for r in requests for dr in r.date_ranges]
+
+
+def _is_cacheable(request) -> bool:
+    """
+    True se la richiesta copre solo date consolidate (<= oggi - D-2).
+
+    Date relative GA4 ('today', 'yesterday', 'NdaysAgo') non vengono mai
+    messe in cache: il loro significato cambia nel tempo.
+    """
+    end_dates = _request_end_dates(request)
+    if not end_dates:
+        return False
+    cutoff = (datetime.now().date() - timedelta(days=GA4_CACHE_MIN_DELAY_DAYS)).isoformat()
+    # Confronto tra stringhe ISO: equivale al confronto tra date
+    return all(len(d) == 10 and d[4] == '-' and d <= cutoff for d in end_dates)
+
+
+def _execute_ga4_request(client: BetaAnalyticsDataClient, request):
+    """
+    Esegue una richiesta GA4 passando dalla cache in memoria.
+
+    La chiave è il payload serializzato della richiesta (property, dimensioni,
+    metriche, date range e filtri), per client. Solo le richieste su date
+    consolidate (vedi _is_cacheable) vengono messe in cache, con TTL di
+    GA4_CACHE_TTL_SECONDS ed eviction LRU oltre GA4_CACHE_MAXSIZE voci.
+
+    Args:
+        client: Client GA4 BetaAnalyticsDataClient
+        request: RunReportRequest o BatchRunReportsRequest da eseguire
+
+    Returns:
+        Response dalla GA4 API
+    """
+    if not _is_cacheable(request):
+        return _run_ga4_request_guarded(client, request)
+
+    key = type(request).serialize(request)
+    now = time.monotonic()
+    with _ga4_cache_lock:
+        cache = _ga4_cache.get(client)
+        entry = cache.get(key) if cache is not None else None
+        if entry is not None and entry[0] > now:
+            cache.move_to_end(key)
+            return entry[1]
+
+    response = _run_ga4_request_guarded(client, request)
+
+    with _ga4_cache_lock:
+        cache = _ga4_cache.setdefault(client, OrderedDict())
+        cache[key] = (now + GA4_CACHE_TTL_SECONDS, response)
+        cache.move_to_end(key)
+        while len(cache) > GA4_CACHE_MAXSIZE:
+            cache.popitem(last=False)
+    return response
+
+
+def _run_ga4_request_guarded(client: BetaAnalyticsDataClient, request):
+    """
+    Esegue una richiesta GA4 rispettando il blocco per quota esaurita.
+
+    Se la quota risulta esaurita (errore di quota anche dopo i retry con
+    backoff esponenziale di @ga4_retry) le richieste successive falliscono
+    subito, senza chiamare GA4, fino a GA4_QUOTA_BACKOFF_SECONDS dopo.
+
+    Raises:
+        google.api_core.exceptions.ResourceExhausted: se la quota è esaurita
+    """
+    global _quota_exhausted_until
+
+    remaining = _quota_exhausted_until - time.monotonic()
+    if remaining > 0:
+        raise ResourceExhausted(f"Quota GA4 esaurita: richieste sospese per altri {remaining:.0f}s")
+
+    try:
+        return _run_ga4_request(client, request)
+    except QUOTA_EXCEPTIONS:
+        _quota_exhausted_until = time.monotonic() + GA4_QUOTA_BACKOFF_SECONDS
+        logger.error(f"Quota GA4 esaurita: richieste sospese per {GA4_QUOTA_BACKOFF_SECONDS}s")
+        raise
+
+
+def reset_ga4_quota_backoff() -> None:
+    """Rimuove il blocco per quota esaurita (es. dopo reset della quota)."""
+    global _quota_exhausted_until
+    _quota_exhausted_until = 0.0
+
+
 @ga4_retry()
-def _execute_ga4_request(client: BetaAnalyticsDataClient, request: RunReportRequest):
+def _run_ga4_request(client: BetaAnalyticsDataClient, request):
     """
     Esegue una richiesta GA4 con rate limiting e retry automatico.
 
-    Questa funzione wrappa tutte le chiamate a client.run_report() per:
+    Questa funzione wrappa tutte le chiamate a client.run_report() e
+    client.batch_run_reports() per:
     - Rispettare il rate limit GA4 (10 rps)
+    - Non superare GA4_MAX_CONCURRENT_REQUESTS richieste in volo
     - Retry automatico su errori transitori (503, 429, timeout)
     - Logging delle performance
 
     Args:
         client: Client GA4 BetaAnalyticsDataClient
-        request: RunReportRequest da eseguire
+        request: RunReportRequest o BatchRunReportsRequest da eseguire
 
     Returns:
         Response dalla GA4 API
@@ -96,7 +247,84 @@ def _execute_ga4_request(client: BetaAnalyticsDataClient, request: RunReportRequ
         logger.debug(f"Rate limited: atteso {wait_time:.3f}s")
 
     # Esegui la richiesta (il retry è gestito dal decorator @ga4_retry)
-    return client.run_report(request)
+    with _ga4_concurrency:
+        if isinstance(request, BatchRunReportsRequest):
+            return client.batch_run_reports(request)
+        return client.run_report(request)
+
+
+def _run_ga4_pair(client: BetaAnalyticsDataClient, request_a, request_b):
+    """
+    Esegue due richieste GA4 in una sola batchRunReports.
+
+    Le coppie commodity/luce&gas differiscono solo per dimension_filter:
+    un unico round-trip e un unico slot di rate limit invece di due.
+
+    Returns:
+        Tuple (response_a, response_b)
+    """
+    request = BatchRunReportsRequest(
+        property=f'properties/{PROPERTY_ID}',
+        requests=[request_a, request_b]
+    )
+    response_a, response_b = _execute_ga4_request(client, request).reports
+    return response_a, response_b
+
+
+def _format_block(title: str, date: Optional[str], lines: List[str]) -> str:
+    """
+    Formatta un blocco di output con banner (una sola stringa, una sola scrittura).
+
+    Args:
+        title: Titolo del blocco
+        date: Data mostrata sotto il titolo (None per ometterla)
+        lines: Righe di contenuto
+
+    Returns:
+        Blocco formattato
+    """
+    banner = "=" * 80
+    header = [title, banner] + ([f"Date: {date}"] if date is not None else [])
+    return "\n".join(["", banner] + header + lines + [banner, ""])
+
+
+def _frame_preview(df: pd.DataFrame, max_rows: int = 10) -> List[str]:
+    """Righe di anteprima di un DataFrame per i blocchi di debug (prime max_rows)."""
+    lines = [df.head(max_rows).to_string(index=False)]
+    if len(df) > max_rows:
+        lines.append(f"... ({len(df)} righe totali)")
+    return lines
+
+
+def _response_columns(response) -> Tuple[List[str], List[str]]:
+    """
+    Colonne (dimensione, metrica) di una response a una dimensione e una metrica.
+
+    Legge le righe dal protobuf sottostante (type(response).pb): l'accesso
+    campo per campo del wrapper proto-plus costa un ordine di grandezza in più.
+
+    Returns:
+        Tuple (valori dimensione, valori metrica come stringhe GA4)
+    """
+    rows = type(response).pb(response).rows
+    return (
+        [row.dimension_values[0].value for row in rows],
+        [row.metric_values[0].value for row in rows],
+    )
+
+
+def _first_metric_value(response) -> Optional[str]:
+    """
+    Restituisce il primo valore metrica di una response (totals, poi rows).
+
+    Returns:
+        Valore come stringa o None se la response è vuota
+    """
+    if response.totals and len(response.totals) > 0:
+        return response.totals[0].metric_values[0].value
+    if response.rows and len(response.rows) > 0:
+        return response.rows[0].metric_values[0].value
+    return None
 
 
 # ============================================================================
@@ -132,6 +360,76 @@ def calculate_dates(period_type: str = 'ieri') -> Dict[str, str]:
 # FUNZIONE 1: SESSIONI
 # ============================================================================
 
+# Label di output per filtro, indicizzate sui bytes serializzati del filtro:
+# i builder in filters.py creano un nuovo oggetto a ogni chiamata, quindi
+# id() non è una chiave affidabile
+_LABEL_CACHE: Dict[bytes, str] = {}
+
+
+def _session_label(filter_expression) -> str:
+    """Determina la label di output per sessions() (memoizzata per filtro)."""
+    if filter_expression is None:
+        return "SESSIONI TOTALI"
+
+    key = FilterExpression.serialize(filter_expression)
+    label = _LABEL_CACHE.get(key)
+    if label is None:
+        text = str(filter_expression).lower()
+        if 'commodity' in text:
+            label = "SESSIONI COMMODITY"
+        elif 'lucegas' in text or 'luce' in text:
+            label = "SESSIONI LUCE&GAS"
+        else:
+            label = "SESSIONI"
+        _LABEL_CACHE[key] = label
+    return label
+
+
+def _report_template(metric: str, dimension: str = None, dimension_filter=None) -> RunReportRequest:
+    """Template RunReportRequest senza date_ranges (forma fissa della query)."""
+    return RunReportRequest(
+        property=f'properties/{PROPERTY_ID}',
+        dimensions=[Dimension(name=dimension)] if dimension else [],
+        metrics=[Metric(name=metric)],
+        dimension_filter=dimension_filter
+    )
+
+
+# Template costruiti una volta: per chiamata cambiano solo data e filtro
+_REQ_TEMPLATE_SESSIONS = _report_template('sessions')
+_REQ_TEMPLATE_SWI = _report_template('keyEvents:weborder_residenziale')
+_REQ_TEMPLATE_PRODOTTI = _report_template('keyEvents:weborder_residenziale', 'customEvent:prodotto')
+_REQ_TEMPLATE_STARTFUNNEL = _report_template('screenPageViews', dimension_filter=funnel_weborder_step1_filter())
+_REQ_TEMPLATE_SWI_COMMODITY = _report_template('keyEvents:weborder_residenziale', 'customEvent:commodity')
+_REQ_TEMPLATE_CHANNELS = _report_template('sessions', 'sessionCustomChannelGroup:5896515461')
+_REQ_TEMPLATE_CAMPAIGNS = _report_template('sessions', 'sessionCampaignName')
+
+# Filtri sessioni costruiti una volta: _request_from_template ne copia il contenuto
+_SESSION_COMMODITY_FILTER = session_commodity_filter()
+_SESSION_LUCEGAS_FILTER = session_lucegas_filter()
+
+
+def _request_from_template(template: RunReportRequest, date: str, dimension_filter=None) -> RunReportRequest:
+    """
+    Copia un template aggiungendo il range di una sola data.
+
+    Args:
+        template: Uno dei _REQ_TEMPLATE_* (non viene modificato)
+        date: Data in formato YYYY-MM-DD
+        dimension_filter: Filtro opzionale che sostituisce quello del template
+    """
+    request = RunReportRequest(template)
+    request.date_ranges.append(DateRange(start_date=date, end_date=date))
+    if dimension_filter:
+        request.dimension_filter = dimension_filter
+    return request
+
+
+def _sessions_request(date: str, filter_expression=None) -> RunReportRequest:
+    """Costruisce la richiesta sessioni per una data (filtro opzionale)."""
+    return _request_from_template(_REQ_TEMPLATE_SESSIONS, date, filter_expression)
+
+
 def sessions(
     client: BetaAnalyticsDataClient,
     date: str,
@@ -150,44 +448,20 @@ def sessions(
         Numero di sessioni (int)
     """
     # Determina label per output
-    if filter_expression is None:
-        label = "SESSIONI TOTALI"
-    elif 'commodity' in str(filter_expression).lower():
-        label = "SESSIONI COMMODITY"
-    elif 'lucegas' in str(filter_expression).lower() or 'luce' in str(filter_expression).lower():
-        label = "SESSIONI LUCE&GAS"
-    else:
-        label = "SESSIONI"
-    
-    request = RunReportRequest(
-        property=f'properties/{PROPERTY_ID}',
-        metrics=[Metric(name='sessions')],
-        date_ranges=[DateRange(start_date=date, end_date=date)],
-        dimension_filter=filter_expression if filter_expression else None
-    )
+    label = _session_label(filter_expression)
 
-    response = _execute_ga4_request(client, request)
+    response = _execute_ga4_request(client, _sessions_request(date, filter_expression))
 
     # Processa la response per estrarre il valore
-    sessions_count = 0
-
-    # Prova prima con totals
-    if response.totals and len(response.totals) > 0:
-        sessions_count = int(response.totals[0].metric_values[0].value)
-    # Altrimenti usa rows
-    elif response.rows and len(response.rows) > 0:
-        sessions_count = int(response.rows[0].metric_values[0].value)
-    else:
+    value = _first_metric_value(response)
+    if value is None:
         logger.warning(f"Nessun dato per sessioni ({label})")
         return 0
+    sessions_count = int(value)
 
     # Output pulito
-    print("\n" + "="*80)
-    print(label)
-    print("="*80)
-    print(f"Date: {date}")
-    print(f"Sessioni: {sessions_count}")
-    print("="*80 + "\n")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(_format_block(label, date, [f"Sessioni: {sessions_count}"]))
 
     return sessions_count
 
@@ -195,6 +469,11 @@ def sessions(
 # FUNZIONE 2: SWI (CONVERSIONI)
 # ============================================================================
 
+def _swi_request(date: str) -> RunReportRequest:
+    """Costruisce la richiesta conversioni weborder_residenziale per una data."""
+    return _request_from_template(_REQ_TEMPLATE_SWI, date)
+
+
 def giornaliero_swi(client: BetaAnalyticsDataClient, date: str) -> int:
     """
     Estrae conversioni weborder_residenziale per una data specifica.
@@ -207,34 +486,18 @@ def giornaliero_swi(client: BetaAnalyticsDataClient, date: str) -> int:
     Returns:
         Numero di conversioni (int)
     """
-    request = RunReportRequest(
-        property=f'properties/{PROPERTY_ID}',
-        metrics=[Metric(name='keyEvents:weborder_residenziale')],
-        date_ranges=[DateRange(start_date=date, end_date=date)]
-    )
-
-    response = _execute_ga4_request(client, request)
+    response = _execute_ga4_request(client, _swi_request(date))
 
     # Processa la response per estrarre il valore
-    conversions = 0
-    
-    # Prova prima con totals
-    if response.totals and len(response.totals) > 0:
-        conversions = int(response.totals[0].metric_values[0].value)
-    # Altrimenti usa rows
-    elif response.rows and len(response.rows) > 0:
-        conversions = int(response.rows[0].metric_values[0].value)
-    else:
+    value = _first_metric_value(response)
+    if value is None:
         logger.warning("Nessun dato per conversioni SWI")
         return 0
+    conversions = int(value)
 
     # Output pulito
-    print("\n" + "="*80)
-    print("SWI (CONVERSIONI)")
-    print("="*80)
-    print(f"Date: {date}")
-    print(f"Conversioni: {conversions}")
-    print("="*80 + "\n")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(_format_block("SWI (CONVERSIONI)", date, [f"Conversioni: {conversions}"]))
 
     return conversions
 
@@ -275,45 +538,44 @@ def giornaliero_prodotti(
     """
     logger.info("Esecuzione: giornaliero_prodotti")
 
-    request = RunReportRequest(
-        property=f'properties/{PROPERTY_ID}',
-        dimensions=[Dimension(name='customEvent:prodotto')],
-        metrics=[Metric(name='keyEvents:weborder_residenziale')],
-        date_ranges=[DateRange(start_date=date, end_date=date)]
-    )
+    response = _execute_ga4_request(client, _prodotti_request(date))
+    return _prodotti_from_response(response, date, total_swi)
+
+
+def _prodotti_request(date: str) -> RunReportRequest:
+    """Costruisce la richiesta conversioni per prodotto per una data."""
+    return _request_from_template(_REQ_TEMPLATE_PRODOTTI, date)
 
-    response = _execute_ga4_request(client, request)
 
+# Categorie prodotto principali (ordine di priorità nel match)
+PRODUCT_CATEGORIES = ['fixa', 'trend', 'pernoi', 'sempre']
+
+
+def _prodotti_from_response(response, date: str, total_swi: float) -> pd.DataFrame:
+    """Raggruppa per categoria prodotto le righe di una response prodotti."""
     if not response.rows:
         logger.warning("Nessun dato restituito per prodotti")
         return pd.DataFrame()
 
-    # Raggruppa per categoria
-    grouped = {
-        'fixa': 0.0,
-        'trend': 0.0,
-        'pernoi': 0.0,
-        'sempre': 0.0
-    }
-    others = {}
-
-    for row in response.rows:
-        prodotto = row.dimension_values[0].value.lower()
-        valore = float(row.metric_values[0].value)
-
-        if 'fixa' in prodotto:
-            grouped['fixa'] += valore
-        elif 'trend' in prodotto:
-            grouped['trend'] += valore
-        elif 'pernoi' in prodotto:
-            grouped['pernoi'] += valore
-        elif 'sempre' in prodotto:
-            grouped['sempre'] += valore
-        else:
-            if prodotto in others:
-                others[prodotto] += valore
-            else:
-                others[prodotto] = valore
+    prodotti, valori = _response_columns(response)
+    df = pd.DataFrame({'prodotto': prodotti, 'valore': [float(v) for v in valori]})
+    df['prodotto'] = df['prodotto'].str.lower()
+
+    # Raggruppa per categoria: prima categoria contenuta nel nome (come if/elif)
+    df['categoria'] = np.select(
+        [df['prodotto'].str.contains(cat, regex=False) for cat in PRODUCT_CATEGORIES],
+        PRODUCT_CATEGORIES,
+        default=''
+    )
+    is_other = df['categoria'] == ''
+
+    grouped = (
+        df[~is_other].groupby('categoria')['valore'].sum()
+        .reindex(PRODUCT_CATEGORIES, fill_value=0.0)
+        .to_dict()
+    )
+    # Altri prodotti: nome completo, in ordine di prima apparizione
+    others = df[is_other].groupby('prodotto', sort=False)['valore'].sum().to_dict()
 
     # Crea DataFrame risultato
     results = []
@@ -337,23 +599,20 @@ def giornaliero_prodotti(
     logger.info(f"Prodotti analizzati: {len(result_df)}")
     
     # Output pulito
-    print("\n" + "="*80)
-    print("PRODOTTI")
-    print("="*80)
-    print(f"Date: {date}")
-    print(f"\nProdotti principali:")
-    for product, total in grouped.items():
-        if total > 0:  # Mostra solo prodotti con valore > 0
-            percentage = (total / total_swi * 100) if total_swi > 0 else 0
-            print(f"  {product.capitalize():15} {int(total):5} conversioni ({percentage:.2f}%)")
-    
-    if others:
-        print(f"\nAltri prodotti:")
-        for product, total in others.items():
-            percentage = (total / total_swi * 100) if total_swi > 0 else 0
-            print(f"  {product:15} {int(total):5} conversioni ({percentage:.2f}%)")
-    
-    print("="*80 + "\n")
+    if logger.isEnabledFor(logging.INFO):
+        lines = ["", "Prodotti principali:"]
+        for product, total in grouped.items():
+            if total > 0:  # Mostra solo prodotti con valore > 0
+                percentage = (total / total_swi * 100) if total_swi > 0 else 0
+                lines.append(f"  {product.capitalize():15} {int(total):5} conversioni ({percentage:.2f}%)")
+
+        if others:
+            lines += ["", "Altri prodotti:"]
+            for product, total in others.items():
+                percentage = (total / total_swi * 100) if total_swi > 0 else 0
+                lines.append(f"  {product:15} {int(total):5} conversioni ({percentage:.2f}%)")
+
+        logger.info(_format_block("PRODOTTI", date, lines))
     
     return result_df
 
@@ -361,6 +620,11 @@ def giornaliero_prodotti(
 # FUNZIONE 5: START FUNNEL
 # ============================================================================
 
+def _startfunnel_request(date: str) -> RunReportRequest:
+    """Costruisce la richiesta visualizzazioni primo step funnel per una data."""
+    return _request_from_template(_REQ_TEMPLATE_STARTFUNNEL, date)
+
+
 def giornaliero_startfunnel(
     client: BetaAnalyticsDataClient,
     date: str
@@ -371,40 +635,76 @@ def giornaliero_startfunnel(
     """
     logger.info("Esecuzione: giornaliero_startfunnel")
 
-    request = RunReportRequest(
-        property=f'properties/{PROPERTY_ID}',
-        metrics=[Metric(name='screenPageViews')],
-        date_ranges=[DateRange(start_date=date, end_date=date)],
-        dimension_filter=funnel_weborder_step1_filter()
-    )
-
-    response = _execute_ga4_request(client, request)
+    response = _execute_ga4_request(client, _startfunnel_request(date))
 
     # Processa la response per estrarre il valore
-    step1_views = 0.0
-    
-    # Prova prima con totals
-    if response.totals and len(response.totals) > 0:
-        step1_views = float(response.totals[0].metric_values[0].value)
-    # Altrimenti usa rows
-    elif response.rows and len(response.rows) > 0:
-        step1_views = float(response.rows[0].metric_values[0].value)
-    else:
+    value = _first_metric_value(response)
+    if value is None:
         logger.warning("Nessun dato per start funnel")
         return 0.0
+    step1_views = float(value)
 
     # Output pulito
-    print("\n" + "="*80)
-    print("START FUNNEL (STEP 1)")
-    print("="*80)
-    print(f"Date: {date}")
-    print(f"Visualizzazioni: {int(step1_views)}")
-    print("="*80 + "\n")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(_format_block("START FUNNEL (STEP 1)", date, [f"Visualizzazioni: {int(step1_views)}"]))
     
     logger.info(f"Visualizzazioni step 1 funnel: {step1_views}")
     
     return step1_views
 
+# ============================================================================
+# BATCH GIORNALIERO
+# ============================================================================
+
+def run_daily_batch(
+    client: BetaAnalyticsDataClient,
+    date: str
+) -> Tuple[int, int, int, float, Optional[pd.DataFrame]]:
+    """
+    Estrae le metriche giornaliere di una data con una sola batchRunReports.
+
+    Raggruppa le 5 richieste per-data (sessioni commodity, sessioni luce&gas,
+    SWI, start funnel, prodotti) in un'unica chiamata: 1 round-trip e 1 slot
+    di rate limit invece di 5.
+
+    Args:
+        client: Client GA4 BetaAnalyticsDataClient
+        date: Data in formato YYYY-MM-DD
+
+    Returns:
+        Tuple (sessioni, sessioni_lucegas, swi, start_funnel, prodotti).
+        prodotti è None se SWI è zero (come in esegui_giornaliero).
+    """
+    logger.info(f"Esecuzione: run_daily_batch ({date})")
+
+    # Ordine delle richieste = ordine delle response (max 5 per batch)
+    request = BatchRunReportsRequest(
+        property=f'properties/{PROPERTY_ID}',
+        requests=[
+            _sessions_request(date, _SESSION_COMMODITY_FILTER),
+            _sessions_request(date, _SESSION_LUCEGAS_FILTER),
+            _swi_request(date),
+            _startfunnel_request(date),
+            _prodotti_request(date),
+        ]
+    )
+    commodity_resp, lucegas_resp, swi_resp, funnel_resp, prodotti_resp = \
+        _execute_ga4_request(client, request).reports
+
+    sessioni = int(_first_metric_value(commodity_resp) or 0)
+    sessioni_lucegas = int(_first_metric_value(lucegas_resp) or 0)
+    swi = int(_first_metric_value(swi_resp) or 0)
+    start_funnel = float(_first_metric_value(funnel_resp) or 0.0)
+
+    prodotti = _prodotti_from_response(prodotti_resp, date, swi) if swi > 0 else None
+
+    logger.info(
+        f"Batch {date}: sessioni={sessioni}, sessioni_lucegas={sessioni_lucegas}, "
+        f"swi={swi}, start_funnel={start_funnel}"
+    )
+    return sessioni, sessioni_lucegas, swi, start_funnel, prodotti
+
+
 # ============================================================================
 # FUNZIONE 6: CR CANALIZZAZIONE
 # ============================================================================
@@ -412,34 +712,24 @@ def giornaliero_startfunnel(
 def giornaliero_cr_canalizzazione(
     conversioni: float,
     start_funnel: float
-) -> pd.DataFrame:
+) -> float:
     """
     Calcola conversion rate della canalizzazione
     Equivalente a giornaliero_cr_canalizzazione() in Apps Script
+
+    Returns:
+        Conversion rate in percentuale (float); la forma "xx.xx%" è solo nel log
     """
     logger.info("Esecuzione: giornaliero_cr_canalizzazione")
     logger.info(f"Conversioni: {conversioni}, Start funnel: {start_funnel}")
 
-    # DEBUG: Stampa input
-    print("\n" + "="*80)
-    print("GIORNALIERO_CR_CANALIZZAZIONE - Input:")
-    print("="*80)
-    print(f"Conversioni: {conversioni}")
-    print(f"Start funnel: {start_funnel}")
-    print("="*80 + "\n")
-
     if start_funnel > 0:
         cr_can = (conversioni / start_funnel) * 100
     else:
         cr_can = 0.0
     
-    result = pd.DataFrame([{
-        'Metric': 'CR_canalizzazione',
-        'Value': f"{cr_can:.2f}%"
-    }])
-    
     logger.info(f"CR canalizzazione: {cr_can:.2f}%")
-    return result
+    return cr_can
 
 def SWI_per_commodity_type(client: BetaAnalyticsDataClient, date: str) -> pd.DataFrame:
     """
@@ -457,46 +747,94 @@ def SWI_per_commodity_type(client: BetaAnalyticsDataClient, date: str) -> pd.Dat
     logger.info("Esecuzione: SWI_per_commodity_type")
     
     # Query unica con dimensione commodity
-    request = RunReportRequest(
-        property=f'properties/{PROPERTY_ID}',
-        dimensions=[Dimension(name='customEvent:commodity')],
-        metrics=[Metric(name='keyEvents:weborder_residenziale')],
-        date_ranges=[DateRange(start_date=date, end_date=date)]
-    )
+    request = _request_from_template(_REQ_TEMPLATE_SWI_COMMODITY, date)
 
     response = _execute_ga4_request(client, request)
 
-    # Processa response
-    commodity_data = {}
-    
-    for row in response.rows:
-        commodity_type = row.dimension_values[0].value
-        conversions = int(row.metric_values[0].value)
-        commodity_data[commodity_type] = conversions
-    
-    # Crea DataFrame
-    data_rows = []
-    for commodity_type in sorted(commodity_data.keys()):
-        data_rows.append({
-            'Commodity_Type': commodity_type,
-            'Conversions': commodity_data[commodity_type]
-        })
+    # Nessuna riga: niente costruzione/formattazione DataFrame
+    if not response.rows:
+        logger.info("Commodity types estratti: 0")
+        return pd.DataFrame(columns=['Commodity_Type', 'Conversions'])
+
+    # Processa response in colonne parallele
+    types, values = _response_columns(response)
+    convs = [int(v) for v in values]
     
-    df = pd.DataFrame(data_rows)
+    # Crea DataFrame da array colonnari, ordinato per tipo
+    order = np.argsort(np.asarray(types, dtype=object), kind='stable')
+    df = pd.DataFrame({
+        'Commodity_Type': np.asarray(types, dtype=object)[order],
+        'Conversions': np.asarray(convs, dtype=np.int64)[order]
+    })
     
     # Output per debug
-    print("\n" + "="*80)
-    print("SWI PER COMMODITY TYPE")
-    print("="*80)
-    print(f"Date: {date}")
-    print()
-    print(df.to_string(index=False))
-    print("="*80 + "\n")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(_format_block("SWI PER COMMODITY TYPE", date, ["", *_frame_preview(df)]))
     
     logger.info(f"Commodity types estratti: {len(df)}")
     
     return df
 
+def _response_series(response, name: str) -> pd.Series:
+    """Serie dimensione -> sessioni (int64) da una response a una dimensione."""
+    keys, values = _response_columns(response)
+    # Parsing delle stringhe GA4 in C (numpy) invece di int() per riga
+    return pd.Series(np.array(values, dtype='int64'), index=keys, name=name)
+
+
+def _sessions_pair_frame(commodity_response, lucegas_response, key_column: str) -> pd.DataFrame:
+    """
+    Unisce le response commodity e luce&gas (stessa dimensione) in un DataFrame.
+
+    Args:
+        commodity_response: Response sessioni commodity per dimensione
+        lucegas_response: Response sessioni luce&gas per dimensione
+        key_column: Nome della colonna dimensione (Channel, Campaign)
+
+    Returns:
+        DataFrame con colonne key_column, Commodity_Sessions, LuceGas_Sessions
+        (vuoto se entrambe le response sono senza righe)
+    """
+    if not commodity_response.rows and not lucegas_response.rows:
+        return pd.DataFrame(columns=[key_column, 'Commodity_Sessions', 'LuceGas_Sessions'])
+
+    df = pd.concat([
+        _response_series(commodity_response, 'Commodity_Sessions'),
+        _response_series(lucegas_response, 'LuceGas_Sessions'),
+    ], axis=1)
+    return (
+        df.fillna(0)
+        .astype({'Commodity_Sessions': 'int64', 'LuceGas_Sessions': 'int64'})
+        .sort_index()
+        .rename_axis(key_column)
+        .reset_index()
+    )
+
+
+def _sessions_records(sessions_df: pd.DataFrame, key_column: str, key_name: str) -> List[Dict]:
+    """
+    Converte un DataFrame sessioni nel formato righe di insert_sessions_by_*.
+
+    Args:
+        sessions_df: DataFrame da _sessions_pair_frame
+        key_column: Colonna dimensione nel DataFrame (Channel, Campaign)
+        key_name: Chiave dimensione nel record (channel, campaign)
+
+    Returns:
+        Lista di dict {key_name, commodity_sessions, lucegas_sessions}
+    """
+    return (
+        sessions_df[[key_column, 'Commodity_Sessions', 'LuceGas_Sessions']]
+        .astype({'Commodity_Sessions': 'int64', 'LuceGas_Sessions': 'int64'})
+        .rename(columns={
+            key_column: key_name,
+            'Commodity_Sessions': 'commodity_sessions',
+            'LuceGas_Sessions': 'lucegas_sessions',
+        })
+        .to_dict('records')
+    )
+
+
 def daily_sessions_channels(client: BetaAnalyticsDataClient, date: str) -> pd.DataFrame:
     """
     Estrae le sessioni per canale (spaccato dettagliato) per una data specifica.
@@ -512,65 +850,20 @@ def daily_sessions_channels(client: BetaAnalyticsDataClient, date: str) -> pd.Da
         - LuceGas_Sessions: sessioni luce&gas
     """
     # Query per sessioni Commodity per canale
-    request_commodity = RunReportRequest(
-        property=f'properties/{PROPERTY_ID}',
-        dimensions=[Dimension(name="sessionCustomChannelGroup:5896515461")],
-        metrics=[Metric(name='sessions')],
-        date_ranges=[DateRange(start_date=date, end_date=date)],
-        dimension_filter=session_commodity_filter()
-    )
-
-    commodity_response = _execute_ga4_request(client, request_commodity)
+    request_commodity = _request_from_template(_REQ_TEMPLATE_CHANNELS, date, _SESSION_COMMODITY_FILTER)
 
     # Query per sessioni Luce&Gas per canale
-    request_lucegas = RunReportRequest(
-        property=f'properties/{PROPERTY_ID}',
-        dimensions=[Dimension(name="sessionCustomChannelGroup:5896515461")],
-        metrics=[Metric(name='sessions')],
-        date_ranges=[DateRange(start_date=date, end_date=date)],
-        dimension_filter=session_lucegas_filter()
-    )
+    request_lucegas = _request_from_template(_REQ_TEMPLATE_CHANNELS, date, _SESSION_LUCEGAS_FILTER)
 
-    lucegas_response = _execute_ga4_request(client, request_lucegas)
+    # Le due query differiscono solo per filtro: una sola batch
+    commodity_response, lucegas_response = _run_ga4_pair(client, request_commodity, request_lucegas)
 
-    # Processa response Commodity
-    commodity_data = {}
-    
-    for row in commodity_response.rows:
-        channel = row.dimension_values[0].value
-        sessions = int(row.metric_values[0].value)
-        commodity_data[channel] = sessions
-    
-    # Processa response Luce&Gas
-    lucegas_data = {}
-    
-    for row in lucegas_response.rows:
-        channel = row.dimension_values[0].value
-        sessions = int(row.metric_values[0].value)
-        lucegas_data[channel] = sessions
-    
-    # Combina i dati in un DataFrame
-    all_channels = set(commodity_data.keys()) | set(lucegas_data.keys())
-    
-    data_rows = []
-    for channel in sorted(all_channels):
-        row = {
-            'Channel': channel,
-            'Commodity_Sessions': commodity_data.get(channel, 0),
-            'LuceGas_Sessions': lucegas_data.get(channel, 0)
-        }
-        data_rows.append(row)
-    
-    df = pd.DataFrame(data_rows)
+    # Combina le due response in un DataFrame (Channel ordinato, 0 se assente)
+    df = _sessions_pair_frame(commodity_response, lucegas_response, 'Channel')
     
     # Output per debug
-    print("\n" + "="*80)
-    print("SESSIONI PER CANALE")
-    print("="*80)
-    print(f"Date: {date}")
-    print()
-    print(df.to_string(index=False))
-    print("="*80 + "\n")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(_format_block("SESSIONI PER CANALE", date, ["", *_frame_preview(df)]))
     
     return df
 
@@ -592,65 +885,20 @@ def daily_sessions_campaigns(client: BetaAnalyticsDataClient, date: str) -> pd.D
     logger.info(f"Esecuzione: daily_sessions_campaigns per {date}")
     
     # Query per sessioni Commodity per campagna
-    request_commodity = RunReportRequest(
-        property=f'properties/{PROPERTY_ID}',
-        dimensions=[Dimension(name="sessionCampaignName")],
-        metrics=[Metric(name='sessions')],
-        date_ranges=[DateRange(start_date=date, end_date=date)],
-        dimension_filter=session_commodity_filter()
-    )
-
-    commodity_response = _execute_ga4_request(client, request_commodity)
+    request_commodity = _request_from_template(_REQ_TEMPLATE_CAMPAIGNS, date, _SESSION_COMMODITY_FILTER)
 
     # Query per sessioni Luce&Gas per campagna
-    request_lucegas = RunReportRequest(
-        property=f'properties/{PROPERTY_ID}',
-        dimensions=[Dimension(name="sessionCampaignName")],
-        metrics=[Metric(name='sessions')],
-        date_ranges=[DateRange(start_date=date, end_date=date)],
-        dimension_filter=session_lucegas_filter()
-    )
+    request_lucegas = _request_from_template(_REQ_TEMPLATE_CAMPAIGNS, date, _SESSION_LUCEGAS_FILTER)
 
-    lucegas_response = _execute_ga4_request(client, request_lucegas)
+    # Le due query differiscono solo per filtro: una sola batch
+    commodity_response, lucegas_response = _run_ga4_pair(client, request_commodity, request_lucegas)
 
-    # Processa response Commodity
-    commodity_data = {}
-    
-    for row in commodity_response.rows:
-        campaign = row.dimension_values[0].value
-        sessions = int(row.metric_values[0].value)
-        commodity_data[campaign] = sessions
-    
-    # Processa response Luce&Gas
-    lucegas_data = {}
-    
-    for row in lucegas_response.rows:
-        campaign = row.dimension_values[0].value
-        sessions = int(row.metric_values[0].value)
-        lucegas_data[campaign] = sessions
-    
-    # Combina i dati in un DataFrame
-    all_campaigns = set(commodity_data.keys()) | set(lucegas_data.keys())
-    
-    data_rows = []
-    for campaign in sorted(all_campaigns):
-        row = {
-            'Campaign': campaign,
-            'Commodity_Sessions': commodity_data.get(campaign, 0),
-            'LuceGas_Sessions': lucegas_data.get(campaign, 0)
-        }
-        data_rows.append(row)
-    
-    df = pd.DataFrame(data_rows)
+    # Combina le due response in un DataFrame (Campaign ordinato, 0 se assente)
+    df = _sessions_pair_frame(commodity_response, lucegas_response, 'Campaign')
     
     # Output per debug
-    print("\n" + "="*80)
-    print("SESSIONI PER CAMPAGNA")
-    print("="*80)
-    print(f"Date: {date}")
-    print()
-    print(df.to_string(index=False))
-    print("="*80 + "\n")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(_format_block("SESSIONI PER CAMPAGNA", date, ["", *_frame_preview(df)]))
     
     logger.info(f"Campagne estratte: {len(df)}")
     
@@ -700,13 +948,7 @@ def extract_sessions_campaigns_delayed(target_date_str: str, db=None, skip_valid
         
         # Salva in database se fornito
         if db:
-            campaigns = []
-            for _, row in sessions_df.iterrows():
-                campaigns.append({
-                    'campaign': row['Campaign'],
-                    'commodity_sessions': int(row['Commodity_Sessions']),
-                    'lucegas_sessions': int(row['LuceGas_Sessions'])
-                })
+            campaigns = _sessions_records(sessions_df, 'Campaign', 'campaign')
             
             success = db.insert_sessions_by_campaign(target_date_str, campaigns, replace=True)
             if success:
@@ -727,6 +969,44 @@ def extract_sessions_campaigns_delayed(target_date_str: str, db=None, skip_valid
 # FUNZIONE PRINCIPALE
 # ============================================================================
 
+def _extract_daily_results(client: BetaAnalyticsDataClient, target_date: str) -> Dict:
+    """
+    Estrae le metriche giornaliere di una data con una sola batchRunReports.
+
+    Sessioni commodity/luce&gas, SWI, start funnel e prodotti arrivano da
+    run_daily_batch; CR e CR canalizzazione sono calcolati in locale.
+
+    Args:
+        client: Client GA4 BetaAnalyticsDataClient
+        target_date: Data in formato YYYY-MM-DD
+
+    Returns:
+        Dict risultati nel formato di esegui_giornaliero
+    """
+    sessioni, sessioni_lucegas, swi, start_funnel, prodotti = run_daily_batch(client, target_date)
+
+    results = {
+        'sessioni': sessioni,
+        'sessioni_lucegas': sessioni_lucegas,
+        'swi': swi,
+    }
+
+    # Conversion Rate
+    results['cr_commodity'] = calculate_cr(results['sessioni'], results['swi'])
+    results['cr_lucegas'] = calculate_cr(results['sessioni_lucegas'], results['swi'])
+
+    # CR Canalizzazione e Prodotti (usano total_swi)
+    if results['swi'] > 0:
+        results['cr_canalizzazione'] = giornaliero_cr_canalizzazione(results['swi'], start_funnel)
+        results['prodotti'] = prodotti
+    else:
+        logger.warning("Impossibile calcolare prodotti e CR canalizzazione: SWI mancante")
+        results['cr_canalizzazione'] = None
+        results['prodotti'] = None
+
+    return results
+
+
 def esegui_giornaliero(period_type: str = 'ieri') -> Tuple[Dict, Dict[str, str]]:
     """
     Esegue tutte le estrazioni giornaliere
@@ -751,54 +1031,13 @@ def esegui_giornaliero(period_type: str = 'ieri') -> Tuple[Dict, Dict[str, str]]
     dates = calculate_dates(period_type)
     target_date = dates['date_from']
     
-    # Esegue tutte le funzioni in sequenza
-    results = {}
-    
-    # 1. Sessioni Commodity
-    results['sessioni'] = sessions(client, target_date, session_commodity_filter())
-
-    # 1.1 Sessioni luce&gas
-    results['sessioni_lucegas'] = sessions(client, target_date, session_lucegas_filter())
-
-    # 2. SWI (conversioni)
-    results['swi'] = giornaliero_swi(client, target_date)
-    
-    # 3. Conversion Rate
-    results['cr_commodity'] = calculate_cr(results['sessioni'], results['swi'])
-    results['cr_lucegas'] = calculate_cr(results['sessioni_lucegas'], results['swi'])
+    # Esegue le estrazioni (un unico batchRunReports, vedi run_daily_batch)
+    results = _extract_daily_results(client, target_date)
     
     # Output CR
-    print("\n" + "="*80)
-    print("CONVERSION RATE COMMODITY")
-    print("="*80)
-    print(f"Date: {target_date}")
-    print(f"CR: {results['cr_commodity']:.2f}%")
-    print("="*80 + "\n")
-    
-    print("\n" + "="*80)
-    print("CONVERSION RATE LUCE&GAS")
-    print("="*80)
-    print(f"Date: {target_date}")
-    print(f"CR: {results['cr_lucegas']:.2f}%")
-    print("="*80 + "\n")
-    
-    # 4. Start Funnel
-    start_funnel_value = giornaliero_startfunnel(client, target_date)
-    
-    # 5. CR Canalizzazione
-    if results['swi'] is not None and results['swi'] > 0:
-        total_swi = results['swi']
-        results['cr_canalizzazione'] = giornaliero_cr_canalizzazione(
-            total_swi,
-            start_funnel_value
-        )
-        
-        # 6. Prodotti (usa total_swi)
-        results['prodotti'] = giornaliero_prodotti(client, target_date, total_swi)
-    else:
-        logger.warning("Impossibile calcolare prodotti e CR canalizzazione: SWI mancante")
-        results['cr_canalizzazione'] = None
-        results['prodotti'] = None
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(_format_block("CONVERSION RATE COMMODITY", target_date, [f"CR: {results['cr_commodity']:.2f}%"]))
+        logger.debug(_format_block("CONVERSION RATE LUCE&GAS", target_date, [f"CR: {results['cr_lucegas']:.2f}%"]))
     
     # NOTA: sessioni_canale NON estratte qui (ritardo GA4 ~48h)
     # Usare extract_sessions_channels_delayed() per D-2
@@ -835,127 +1074,154 @@ def _convert_dict_to_dataframe(data: dict, metric_name: str = 'Metric') -> pd.Da
         'Value': data
     }])
 
-def save_results_to_csv(results: Dict, output_dir: str = 'output', dates: Dict[str, str] = None):
+# Nomi leggibili per le metriche scalari nei CSV
+CSV_METRIC_NAMES = {
+    'sessioni': 'Sessioni Commodity',
+    'sessioni_lucegas': 'Sessioni Luce&Gas',
+    'swi': 'SWI (Conversioni)',
+    'cr_commodity': 'Conversion Rate Commodity',
+    'cr_lucegas': 'Conversion Rate Luce&Gas',
+    'cr_canalizzazione': 'CR Canalizzazione'
+}
+
+
+def _result_frame(name: str, data, dates: Dict[str, str] = None) -> Optional[pd.DataFrame]:
+    """
+    Converte un singolo risultato in DataFrame per l'export CSV.
+
+    Gestisce dict (legacy), valori singoli int/float e DataFrame; per altri
+    tipi prova un DataFrame a una colonna Value.
+
+    Returns:
+        DataFrame, oppure None se il dato non è convertibile
+    """
+    # Gestisce dict (risultati legacy o valori singoli)
+    if isinstance(data, dict):
+        metric_name = CSV_METRIC_NAMES.get(name, name.replace('_', ' ').title())
+        df = _convert_dict_to_dataframe(data, metric_name)
+        if dates and not df.empty:
+            # Aggiungi informazioni sulle date nel DataFrame
+            df['Date_From'] = dates.get('date_from', '')
+            df['Date_To'] = dates.get('date_to', '')
+        return df
+
+    # Gestisce valori singoli (int/float) - nuovo formato
+    if isinstance(data, (int, float)):
+        metric_name = CSV_METRIC_NAMES.get(name, name.replace('_', ' ').title())
+        return pd.DataFrame([{
+            'Metric': metric_name,
+            'Value': data,
+            'Date': dates.get('date_from', '') if dates else ''
+        }])
+
+    # Gestisce DataFrame (prodotti, ecc.)
+    if isinstance(data, pd.DataFrame):
+        return data
+
+    # Prova a convertire in DataFrame se possibile
+    try:
+        return pd.DataFrame([{'Value': data}])
+    except Exception:
+        return None
+
+
+def _csv_text(df: pd.DataFrame) -> str:
+    """Serializza un DataFrame CSV in memoria (terminatore riga esplicito)."""
+    return df.to_csv(index=False, lineterminator='\n')
+
+
+def save_results_to_csv(
+    results: Dict,
+    output_dir: str = 'output',
+    dates: Dict[str, str] = None,
+    combined: bool = False
+):
     """
     Salva tutti i risultati in file CSV separati
     Gestisce sia dict che DataFrame
+
+    Ogni CSV è serializzato in memoria e scritto con una sola write_text.
+    Con combined=True scrive anche il report completo dagli stessi
+    DataFrame, senza riconvertire results.
     """
     os.makedirs(output_dir, exist_ok=True)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    # Mapping dei nomi per metriche da dict
-    metric_names = {
-        'sessioni': 'Sessioni Commodity',
-        'sessioni_lucegas': 'Sessioni Luce&Gas',
-        'swi': 'SWI (Conversioni)',
-        'cr_commodity': 'Conversion Rate Commodity',
-        'cr_lucegas': 'Conversion Rate Luce&Gas'
-    }
-    
     saved_files = []
+    frames = []
     
     for name, data in results.items():
-        df = None
-        
-        # Gestisce dict (risultati legacy o valori singoli)
-        if isinstance(data, dict):
-            metric_name = metric_names.get(name, name.replace('_', ' ').title())
-            df = _convert_dict_to_dataframe(data, metric_name)
-            if dates:
-                # Aggiungi informazioni sulle date nel DataFrame
-                if not df.empty:
-                    df['Date_From'] = dates.get('date_from', '')
-                    df['Date_To'] = dates.get('date_to', '')
-        
-        # Gestisce valori singoli (int/float) - nuovo formato
-        elif isinstance(data, (int, float)):
-            metric_name = metric_names.get(name, name.replace('_', ' ').title())
-            df = pd.DataFrame([{
-                'Metric': metric_name,
-                'Value': data,
-                'Date': dates.get('date_from', '') if dates else ''
-            }])
-        
-        # Gestisce DataFrame (prodotti, ecc.)
-        elif isinstance(data, pd.DataFrame):
-            df = data
-        
-        # Gestisce None
-        elif data is None:
+        if data is None:
             logger.warning(f"✗ Saltato {name}: Dato None")
             continue
-        else:
-            # Prova a convertire in DataFrame se possibile
-            try:
-                df = pd.DataFrame([{'Value': data}])
-            except:
-                logger.warning(f"✗ Saltato {name}: Tipo non gestito ({type(data)})")
-                continue
+        
+        df = _result_frame(name, data, dates)
+        if df is None:
+            logger.warning(f"✗ Saltato {name}: Tipo non gestito ({type(data)})")
+            continue
         
         # Salva il DataFrame
-        if df is not None and not df.empty:
+        if not df.empty:
             filename = f"{output_dir}/{name}_{timestamp}.csv"
-            df.to_csv(filename, index=False, encoding='utf-8')
+            Path(filename).write_text(_csv_text(df), encoding='utf-8')
             logger.info(f"✓ Salvato: {filename}")
             saved_files.append(filename)
+            frames.append((name, df))
         else:
             logger.warning(f"✗ Saltato {name}: DataFrame vuoto o None")
     
+    if combined:
+        saved_files.append(_write_combined_report(frames, output_dir, dates))
+    
     return saved_files
 
 def create_combined_report(results: Dict, output_dir: str = 'output', dates: Dict[str, str] = None):
     """
     Crea un singolo CSV con tutti i risultati combinati
     """
+    frames = []
+    for name, data in results.items():
+        if data is None:
+            continue
+        df = _result_frame(name, data, dates)
+        if df is not None and not df.empty:
+            frames.append((name, df))
+    
+    return _write_combined_report(frames, output_dir, dates)
+
+def _write_combined_report(
+    frames: List[Tuple[str, pd.DataFrame]],
+    output_dir: str,
+    dates: Dict[str, str] = None
+) -> str:
+    """
+    Scrive il report completo a sezioni da coppie (nome, DataFrame) già pronte.
+
+    Le sezioni sono serializzate in memoria e il file è scritto con una sola
+    write_text.
+    """
     os.makedirs(output_dir, exist_ok=True)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f"{output_dir}/report_completo_{timestamp}.csv"
     
-    metric_names = {
-        'sessioni': 'Sessioni Commodity',
-        'sessioni_lucegas': 'Sessioni Luce&Gas',
-        'swi': 'SWI (Conversioni)',
-        'cr_commodity': 'Conversion Rate Commodity',
-        'cr_lucegas': 'Conversion Rate Luce&Gas'
-    }
+    parts = []
     
-    with open(filename, 'w', encoding='utf-8') as f:
-        # Aggiungi header con informazioni sul report
-        if dates:
-            f.write(f"REPORT GIORNALIERO GA4\n")
-            f.write(f"Periodo: {dates.get('date_from', '')} - {dates.get('date_to', '')}\n")
-            f.write(f"Generato il: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("\n" + "="*80 + "\n\n")
-        
-        for name, data in results.items():
-            df = None
-            
-            # Gestisce dict (legacy o valori singoli)
-            if isinstance(data, dict):
-                metric_name = metric_names.get(name, name.replace('_', ' ').title())
-                df = _convert_dict_to_dataframe(data, metric_name)
-                if dates and not df.empty:
-                    df['Date_From'] = dates.get('date_from', '')
-                    df['Date_To'] = dates.get('date_to', '')
-            
-            # Gestisce valori singoli (int/float)
-            elif isinstance(data, (int, float)):
-                metric_name = metric_names.get(name, name.replace('_', ' ').title())
-                df = pd.DataFrame([{
-                    'Metric': metric_name,
-                    'Value': data,
-                    'Date': dates.get('date_from', '') if dates else ''
-                }])
-            
-            # Gestisce DataFrame
-            elif isinstance(data, pd.DataFrame):
-                df = data
-            
-            # Salva la sezione
-            if df is not None and not df.empty:
-                f.write(f"\n=== {name.upper().replace('_', ' ')} ===\n")
-                df.to_csv(f, index=False)
-                f.write("\n")
+    # Aggiungi header con informazioni sul report
+    if dates:
+        parts.append(
+            f"REPORT GIORNALIERO GA4\n"
+            f"Periodo: {dates.get('date_from', '')} - {dates.get('date_to', '')}\n"
+            f"Generato il: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            "\n" + "="*80 + "\n\n"
+        )
+    
+    # Sezioni
+    for name, df in frames:
+        parts.append(f"\n=== {name.upper().replace('_', ' ')} ===\n")
+        parts.append(_csv_text(df))
+        parts.append("\n")
+    
+    Path(filename).write_text(''.join(parts), encoding='utf-8')
     
     logger.info(f"✓ Report completo salvato: {filename}")
     return filename
@@ -964,6 +1230,11 @@ def create_combined_report(results: Dict, output_dir: str = 'output', dates: Dic
 # DATABASE STORAGE (NEW)
 # ============================================================================
 
+def _coerce(value, types, default):
+    """Restituisce value se è del tipo atteso, altrimenti default."""
+    return value if isinstance(value, types) else default
+
+
 def save_to_database(results: Dict, date: str, db, redis_cache=None, dates: Dict[str, str] = None):
     """
     Salva risultati estrazione in database SQLite e Redis cache.
@@ -984,28 +1255,20 @@ def save_to_database(results: Dict, date: str, db, redis_cache=None, dates: Dict
         # Prepara metriche raw per database
         # I risultati sono ora int/float diretti invece di dict
         metrics = {
-            'sessioni_commodity': results.get('sessioni', 0) if isinstance(results.get('sessioni'), int) else 0,
-            'sessioni_lucegas': results.get('sessioni_lucegas', 0) if isinstance(results.get('sessioni_lucegas'), int) else 0,
-            'swi_conversioni': results.get('swi', 0) if isinstance(results.get('swi'), int) else 0,
-            'cr_commodity': results.get('cr_commodity', 0.0) if isinstance(results.get('cr_commodity'), (int, float)) else 0.0,
-            'cr_lucegas': results.get('cr_lucegas', 0.0) if isinstance(results.get('cr_lucegas'), (int, float)) else 0.0,
-            'cr_canalizzazione': 0.0,
+            'sessioni_commodity': _coerce(results.get('sessioni'), int, 0),
+            'sessioni_lucegas': _coerce(results.get('sessioni_lucegas'), int, 0),
+            'swi_conversioni': _coerce(results.get('swi'), int, 0),
+            'cr_commodity': _coerce(results.get('cr_commodity'), (int, float), 0.0),
+            'cr_lucegas': _coerce(results.get('cr_lucegas'), (int, float), 0.0),
+            'cr_canalizzazione': _coerce(results.get('cr_canalizzazione'), (int, float), 0.0),
             'start_funnel': 0
         }
         
-        # Estrai CR canalizzazione se disponibile
-        if results.get('cr_canalizzazione') is not None:
-            cr_can_df = results['cr_canalizzazione']
-            if isinstance(cr_can_df, pd.DataFrame) and not cr_can_df.empty:
-                cr_can_str = cr_can_df.iloc[0]['Value']
-                metrics['cr_canalizzazione'] = float(cr_can_str.replace('%', ''))
-        
         # Estrai start_funnel se disponibile
         # Calcoliamo dal CR canalizzazione se disponibile
-        if results.get('swi') and metrics['cr_canalizzazione'] > 0:
-            total_swi = results['swi'] if isinstance(results['swi'], int) else 0
-            if total_swi > 0:
-                metrics['start_funnel'] = int(total_swi / (metrics['cr_canalizzazione'] / 100))
+        total_swi = metrics['swi_conversioni']
+        if total_swi > 0 and metrics['cr_canalizzazione'] > 0:
+            metrics['start_funnel'] = int(total_swi / (metrics['cr_canalizzazione'] / 100))
         
         # Salva metriche in SQLite
         logger.info(f"Salvataggio metriche per {date}: {metrics}")
@@ -1020,13 +1283,12 @@ def save_to_database(results: Dict, date: str, db, redis_cache=None, dates: Dict
         # Prepara prodotti
         products = []
         if results.get('prodotti') is not None and not results['prodotti'].empty:
-            for _, row in results['prodotti'].iterrows():
-                percentage_str = row['Percentage'].replace('%', '')
-                products.append({
-                    'product_name': row['Product'],
-                    'total_conversions': float(row['Total']),
-                    'percentage': float(percentage_str)
-                })
+            prodotti_df = results['prodotti']
+            products = pd.DataFrame({
+                'product_name': prodotti_df['Product'],
+                'total_conversions': prodotti_df['Total'].astype(float),
+                'percentage': prodotti_df['Percentage'].str.rstrip('%').astype(float),
+            }).to_dict('records')
         
         # Salva prodotti in SQLite
         if products:
@@ -1053,21 +1315,33 @@ def save_to_database(results: Dict, date: str, db, redis_cache=None, dates: Dict
         return False
 
 
-def validate_date_for_channels(target_date_str: str, min_delay_days: int = 2) -> tuple:
+@lru_cache(maxsize=512)
+def _parse_ymd(date_str: str) -> datetime:
+    """Parsing YYYY-MM-DD con cache (le stesse date tornano nei backfill)."""
+    return datetime.strptime(date_str, '%Y-%m-%d')
+
+
+def validate_date_for_channels(
+    target_date_str: str,
+    min_delay_days: int = 2,
+    *,
+    today: datetime = None
+) -> tuple:
     """
     Valida che una data sia sufficientemente vecchia per avere dati canale GA4.
     
     Args:
         target_date_str: Data da validare (YYYY-MM-DD)
         min_delay_days: Ritardo minimo in giorni (default: 2)
+        today: Mezzanotte di oggi, calcolata una volta dal chiamante nei
+               backfill (default: datetime.now() troncato al giorno)
     
     Returns:
         Tuple (is_valid: bool, message: str)
     """
-    from datetime import datetime, timedelta
-    
-    target_date = datetime.strptime(target_date_str, '%Y-%m-%d')
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    target_date = _parse_ymd(target_date_str)
+    if today is None:
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     min_date = today - timedelta(days=min_delay_days)
     
     if target_date > min_date:
@@ -1120,13 +1394,7 @@ def extract_sessions_channels_delayed(target_date_str: str, db=None, skip_valida
         
         # Salva in database se fornito
         if db:
-            channels = []
-            for _, row in sessions_df.iterrows():
-                channels.append({
-                    'channel': row['Channel'],
-                    'commodity_sessions': int(row['Commodity_Sessions']),
-                    'lucegas_sessions': int(row['LuceGas_Sessions'])
-                })
+            channels = _sessions_records(sessions_df, 'Channel', 'channel')
             
             success = db.insert_sessions_by_channel(target_date_str, channels, replace=True)
             if success:
@@ -1158,9 +1426,8 @@ def extract_for_date(target_date_str: str) -> Tuple[Dict, Dict[str, str]]:
     Returns:
         Tuple (results, dates) come esegui_giornaliero
     """
-    from datetime import datetime
-    
-    target_date = datetime.strptime(target_date_str, '%Y-%m-%d')
+    # Valida formato data (solleva ValueError se non YYYY-MM-DD)
+    _parse_ymd(target_date_str)
     
     dates = {
         'date_from': target_date_str,
@@ -1172,45 +1439,57 @@ def extract_for_date(target_date_str: str) -> Tuple[Dict, Dict[str, str]]:
     # Autenticazione (lazy)
     client = get_ga_client()
     
-    # Esegue estrazione
-    results = {}
-    
-    # 1. Sessioni Commodity
-    results['sessioni'] = sessions(client, target_date_str, session_commodity_filter())
-    
-    # 1.1 Sessioni luce&gas
-    results['sessioni_lucegas'] = sessions(client, target_date_str, session_lucegas_filter())
-    
-    # 2. SWI (conversioni)
-    results['swi'] = giornaliero_swi(client, target_date_str)
-    
-    # 3. Conversion Rate
-    results['cr_commodity'] = calculate_cr(results['sessioni'], results['swi'])
-    results['cr_lucegas'] = calculate_cr(results['sessioni_lucegas'], results['swi'])
-    
-    # 4. Start Funnel
-    start_funnel_value = giornaliero_startfunnel(client, target_date_str)
-    
-    # 5. CR Canalizzazione
-    if results['swi'] is not None and results['swi'] > 0:
-        total_swi = results['swi']
-        results['cr_canalizzazione'] = giornaliero_cr_canalizzazione(
-            total_swi,
-            start_funnel_value
-        )
-        
-        # 6. Prodotti
-        results['prodotti'] = giornaliero_prodotti(client, target_date_str, total_swi)
-    else:
-        logger.warning("Impossibile calcolare prodotti e CR canalizzazione: SWI mancante")
-        results['cr_canalizzazione'] = None
-        results['prodotti'] = None
+    # Esegue estrazione (un unico batchRunReports, vedi run_daily_batch)
+    results = _extract_daily_results(client, target_date_str)
     
     # NOTA: sessioni_canale NON estratte qui (ritardo GA4 ~48h)
     # Usare extract_sessions_channels_delayed() per D-2
     
     return results, dates
 
+
+def extract_for_date_range(
+    start_date: str,
+    end_date: str,
+    max_workers: int = 4
+) -> Dict[str, Tuple[Dict, Dict[str, str]]]:
+    """
+    Esegue extract_for_date per ogni data di un intervallo, in parallelo.
+
+    Ogni data è una batch GA4 indipendente; rate limiter e semaforo di
+    concorrenza in _execute_ga4_request restano condivisi tra i worker.
+
+    Args:
+        start_date: Data iniziale (YYYY-MM-DD, inclusa)
+        end_date: Data finale (YYYY-MM-DD, inclusa)
+        max_workers: Numero massimo di date estratte in parallelo (default: 4)
+
+    Returns:
+        Dict data -> (results, dates) come extract_for_date, in ordine di data.
+        Per le date fallite il valore è l'eccezione sollevata.
+    """
+    start = _parse_ymd(start_date)
+    days = (_parse_ymd(end_date) - start).days + 1
+    dates = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+
+    if not dates:
+        return {}
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(dates)), thread_name_prefix='backfill') as executor:
+        futures = {executor.submit(extract_for_date, date): date for date in dates}
+        for future in as_completed(futures):
+            date = futures[future]
+            try:
+                results[date] = future.result()
+            except Exception as e:
+                logger.error(f"Errore estrazione per {date}: {e}", exc_info=True)
+                results[date] = e
+
+    failed = sum(isinstance(r, Exception) for r in results.values())
+    logger.info(f"Estrazione intervallo completata: {len(dates) - failed}/{len(dates)} date")
+    return {date: results[date] for date in dates}
+
 # ============================================================================
 # MAIN
 # ============================================================================
@@ -1248,10 +1527,7 @@ def main():
         results = esegui_giornaliero(args.period)
         
         # Salva risultati
-        save_results_to_csv(results, args.output_dir)
-        
-        if args.combined:
-            create_combined_report(results, args.output_dir)
+        save_results_to_csv(results, args.output_dir, combined=args.combined)
         
         logger.info("✓ Script completato con successo")
         return 0
@@ -20,9 +20,11 @@ Uso:
 
 from .registry import get_extractor, register_extractor, list_extractors
 from .base import BaseExtractor
+from .cache import CachedExtractor
 
 __all__ = [
     'BaseExtractor',
+    'CachedExtractor',
     'get_extractor',
     'register_extractor',
     'list_extractors',
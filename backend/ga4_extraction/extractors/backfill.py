@@ -5,15 +5,23 @@ Fornisce funzioni per eseguire backfill di nuove variabili usando
 l'orizzonte temporale esistente nel database.
 """
 
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as date_type, timedelta
 from typing import Dict, List, Optional, Any
 import logging
 
+from ..retry import QUOTA_EXCEPTIONS
 from .registry import get_extractor, list_extractors
 from .base import BaseExtractor
 
 logger = logging.getLogger(__name__)
 
+# Estrazioni GA4 concorrenti per backfill (margine sotto il limite GA4 di 10)
+BACKFILL_MAX_WORKERS = 5
+
+# Date salvate per transazione (extractor.save_many)
+SAVE_BATCH_SIZE = 50
+
 
 def get_db_date_range(db) -> tuple:
     """
@@ -36,7 +44,11 @@ def incremental_backfill(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     dry_run: bool = False,
-    skip_validation: bool = False
+    skip_validation: bool = False,
+    max_workers: int = BACKFILL_MAX_WORKERS,
+    db_date_range: Optional[tuple] = None,
+    missing_dates_override: Optional[List[str]] = None,
+    today: Optional[date_type] = None
 ) -> Dict[str, Any]:
     """
     Esegue backfill incrementale per un extractor specifico.
@@ -46,6 +58,12 @@ def incremental_backfill(
     2. Trova date mancanti per l'extractor (hanno metriche base ma non dati extractor)
     3. Estrae e salva dati solo per quelle date
 
+    Le estrazioni GA4 (I/O di rete) girano in parallelo su un pool limitato;
+    i salvataggi restano nel thread chiamante, in ordine di data, perché la
+    connessione db non è condivisibile tra thread. Un errore di quota GA4
+    (dopo i retry con backoff di ga4_retry) interrompe il backfill: le
+    estrazioni non ancora partite sono annullate.
+
     Args:
         extractor_name: Nome dell'extractor registrato (es. 'channels', 'campaigns')
         db: Istanza GA4Database (opzionale, crea nuova se non fornita)
@@ -53,6 +71,13 @@ def incremental_backfill(
         end_date: Data fine override (YYYY-MM-DD). Se None, usa max_date - delay dal DB
         dry_run: Se True, mostra solo cosa farebbe senza eseguire
         skip_validation: Se True, salta validazione date (es. per date storiche)
+        max_workers: Estrazioni GA4 concorrenti (default: BACKFILL_MAX_WORKERS)
+        db_date_range: (min_date, max_date) già letto con get_db_date_range;
+            se None viene letto dal DB quando serve
+        missing_dates_override: Date mancanti già calcolate (es. da
+            BaseExtractor.bulk_missing_dates); filtrate sul range effettivo
+            al posto di get_dates_missing
+        today: Data odierna per ritardo GA4 e validazione (default: oggi)
 
     Returns:
         Dict con risultati:
@@ -64,7 +89,8 @@ def incremental_backfill(
             'processed': int,
             'failed': int,
             'skipped': int,
-            'details': [{'date': str, 'success': bool, 'error': str|None}, ...]
+            'details': [{'date': str, 'success': bool, 'error': str|None}, ...],
+            'quota_exceeded': True  # solo se la quota GA4 è esaurita (stop anticipato)
         }
     """
     # Ottieni extractor
@@ -85,10 +111,13 @@ def incremental_backfill(
         from backend.ga4_extraction.database import GA4Database
         db = GA4Database()
 
+    if today is None:
+        today = date_type.today()
+
     try:
         # Determina orizzonte temporale
         if start_date is None or end_date is None:
-            db_min, db_max = get_db_date_range(db)
+            db_min, db_max = db_date_range or get_db_date_range(db)
 
             if db_min is None:
                 return {
@@ -104,21 +133,20 @@ def incremental_backfill(
 
             if end_date is None:
                 # Applica ritardo GA4
-                max_date_obj = datetime.strptime(db_max, '%Y-%m-%d')
-                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                max_date_obj = date_type.fromisoformat(db_max)
                 delay_limit = today - timedelta(days=extractor.ga4_delay_days)
 
                 # end_date è il minore tra db_max e (oggi - delay)
                 if max_date_obj > delay_limit:
-                    end_date = delay_limit.strftime('%Y-%m-%d')
+                    end_date = delay_limit.isoformat()
                 else:
                     end_date = db_max
 
         logger.info(f"Backfill incrementale '{extractor_name}': {start_date} → {end_date}")
 
         # Valida range
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+        start_dt = date_type.fromisoformat(start_date)
+        end_dt = date_type.fromisoformat(end_date)
 
         if start_dt > end_dt:
             return {
@@ -130,7 +158,10 @@ def incremental_backfill(
             }
 
         # Trova date mancanti
-        missing_dates = extractor.get_dates_missing(db, start_date, end_date)
+        if missing_dates_override is not None:
+            missing_dates = [d for d in missing_dates_override if start_date <= d <= end_date]
+        else:
+            missing_dates = extractor.get_dates_missing(db, start_date, end_date)
 
         logger.info(f"Trovate {len(missing_dates)} date mancanti per '{extractor_name}'")
 
@@ -164,48 +195,95 @@ def incremental_backfill(
 
         client = get_ga_client()
         details = []
-        processed = 0
-        failed = 0
         skipped = 0
 
-        for date in missing_dates:
-            # Valida data (se non skip)
-            if not skip_validation:
-                is_valid, msg = extractor.validate_date(date)
-                if not is_valid:
-                    logger.warning(f"Skip {date}: {msg}")
-                    details.append({'date': date, 'success': False, 'error': msg, 'skipped': True})
-                    skipped += 1
-                    continue
-
-            try:
-                # Estrai
-                data = extractor.extract(client, date)
+        # Valida date (se non skip)
+        if skip_validation:
+            to_extract, rejected = list(missing_dates), []
+        else:
+            to_extract, rejected = extractor.split_valid_dates(missing_dates, today=today)
 
-                if not data:
-                    logger.warning(f"Nessun dato estratto per {date}")
-                    details.append({'date': date, 'success': False, 'error': 'Nessun dato disponibile'})
-                    failed += 1
-                    continue
+        for date, msg in rejected:
+            logger.warning(f"Skip {date}: {msg}")
+            details.append({'date': date, 'success': False, 'error': msg, 'skipped': True})
+            skipped += 1
 
-                # Salva
-                success = extractor.save(db, date, data)
+        # Dati estratti in attesa di salvataggio (una transazione ogni SAVE_BATCH_SIZE date)
+        pending = {}
 
-                if success:
+        def flush_pending():
+            try:
+                saved = extractor.save_many(db, pending)
+            except Exception as e:
+                logger.error(f"✗ Errore salvataggio {extractor_name}: {e}")
+                saved = {}
+
+            # Il blocco è tutto o niente: riprova le date fallite una alla
+            # volta, così risulta non salvata solo la data con errore
+            failed = [date for date in pending if not saved.get(date)]
+            if failed and len(pending) > 1:
+                logger.warning(f"Riprovo {len(failed)} date {extractor_name} una alla volta")
+                for date in failed:
+                    try:
+                        saved[date] = extractor.save(db, date, pending[date])
+                    except Exception as e:
+                        logger.error(f"✗ Errore salvataggio {extractor_name} per {date}: {e}")
+
+            for date, data in pending.items():
+                if saved.get(date):
                     logger.info(f"✓ {extractor_name} salvato per {date}: {len(data)} record")
                     details.append({'date': date, 'success': True, 'records': len(data)})
-                    processed += 1
                 else:
                     logger.error(f"✗ Errore salvataggio {extractor_name} per {date}")
                     details.append({'date': date, 'success': False, 'error': 'Errore salvataggio'})
-                    failed += 1
-
-            except Exception as e:
-                logger.error(f"✗ Errore estrazione {extractor_name} per {date}: {e}")
-                details.append({'date': date, 'success': False, 'error': str(e)})
-                failed += 1
-
-        return {
+            pending.clear()
+
+        quota_exceeded = False
+        if to_extract:
+            with ThreadPoolExecutor(
+                max_workers=min(max_workers, len(to_extract)),
+                thread_name_prefix='backfill'
+            ) as executor:
+                # Estrai in parallelo
+                futures = [executor.submit(extractor.extract, client, date) for date in to_extract]
+
+                for date, future in zip(to_extract, futures):
+                    # Quota esaurita: le estrazioni non ancora partite sono annullate
+                    if quota_exceeded and future.cancel():
+                        details.append({'date': date, 'success': False, 'error': 'Quota GA4 esaurita'})
+                        continue
+
+                    try:
+                        data = future.result()
+                    except QUOTA_EXCEPTIONS as e:
+                        if not quota_exceeded:
+                            logger.error(f"✗ Quota GA4 esaurita durante backfill {extractor_name} ({date}): stop")
+                            quota_exceeded = True
+                        details.append({'date': date, 'success': False, 'error': str(e)})
+                        continue
+                    except Exception as e:
+                        logger.error(f"✗ Errore estrazione {extractor_name} per {date}: {e}")
+                        details.append({'date': date, 'success': False, 'error': str(e)})
+                        continue
+
+                    if not data:
+                        logger.warning(f"Nessun dato estratto per {date}")
+                        details.append({'date': date, 'success': False, 'error': 'Nessun dato disponibile'})
+                        continue
+
+                    # Salva a blocchi (thread chiamante)
+                    pending[date] = data
+                    if len(pending) >= SAVE_BATCH_SIZE:
+                        flush_pending()
+
+            if pending:
+                flush_pending()
+
+        details.sort(key=lambda d: d['date'])
+        processed = sum(1 for d in details if d['success'])
+        failed = len(details) - processed - skipped
+
+        result = {
             'success': failed == 0,
             'extractor': extractor_name,
             'date_range': {'start': start_date, 'end': end_date},
@@ -215,6 +293,9 @@ def incremental_backfill(
             'skipped': skipped,
             'details': details
         }
+        if quota_exceeded:
+            result['quota_exceeded'] = True
+        return result
 
     finally:
         if owns_db and db:
@@ -229,6 +310,10 @@ def backfill_all_extractors(
     """
     Esegue backfill incrementale per TUTTI gli extractors registrati.
 
+    L'orizzonte temporale del DB e le date mancanti di tutti gli extractor
+    sono calcolati una sola volta (BaseExtractor.bulk_missing_dates) e
+    passati a incremental_backfill.
+
     Args:
         db: Istanza GA4Database (opzionale)
         dry_run: Se True, mostra solo cosa farebbe
@@ -240,26 +325,61 @@ def backfill_all_extractors(
     extractors = list_extractors()
     results = {}
 
-    for ext_info in extractors:
-        name = ext_info['name']
-        logger.info(f"Backfill incrementale per '{name}'...")
+    # Setup database (una connessione per tutti gli extractor)
+    owns_db = db is None
+    if owns_db:
+        from backend.ga4_extraction.database import GA4Database
+        db = GA4Database()
+
+    # Data odierna unica per tutti gli extractor
+    today = date_type.today()
 
-        result = incremental_backfill(
-            extractor_name=name,
-            db=db,
-            dry_run=dry_run,
-            skip_validation=skip_validation
-        )
-        results[name] = result
+    try:
+        db_date_range = get_db_date_range(db)
+        db_min, db_max = db_date_range
+
+        # Date mancanti per tutti gli extractor sull'intero orizzonte DB
+        missing_by_name = {}
+        if db_min is not None:
+            instances = [get_extractor(ext_info['name']) for ext_info in extractors]
+            missing_by_name = BaseExtractor.bulk_missing_dates(
+                db, [ext for ext in instances if ext], db_min, db_max
+            )
+
+        for ext_info in extractors:
+            name = ext_info['name']
+            logger.info(f"Backfill incrementale per '{name}'...")
+
+            result = incremental_backfill(
+                extractor_name=name,
+                db=db,
+                dry_run=dry_run,
+                skip_validation=skip_validation,
+                db_date_range=db_date_range,
+                missing_dates_override=missing_by_name.get(name),
+                today=today
+            )
+            results[name] = result
+
+            # Quota GA4 condivisa: inutile proseguire con gli altri extractor
+            if result.get('quota_exceeded'):
+                logger.error("Quota GA4 esaurita: backfill interrotto")
+                break
+    finally:
+        if owns_db and db:
+            db.close()
 
     # Calcola totali
     total_processed = sum(r.get('processed', 0) for r in results.values())
     total_failed = sum(r.get('failed', 0) for r in results.values())
 
+    quota_exceeded = any(r.get('quota_exceeded') for r in results.values())
+
     return {
-        'success': total_failed == 0,
+        'success': total_failed == 0 and not quota_exceeded,
         'total_processed': total_processed,
         'total_failed': total_failed,
+        'quota_exceeded': quota_exceeded,
         'extractors': results
     }
 
@@ -5,7 +5,8 @@ Ogni extractor deve estendere questa classe e implementare i metodi astratti.
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from datetime import date as date_type, timedelta
+from typing import List, Dict, Any, Optional, Set, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -50,10 +51,23 @@ class BaseExtractor(ABC):
 
     def __init__(self):
         """Inizializza l'extractor e valida la configurazione."""
-        if not self.name:
-            raise ValueError(f"{self.__class__.__name__} deve definire 'name'")
-        if not self.table_name:
-            raise ValueError(f"{self.__class__.__name__} deve definire 'table_name'")
+        self.validate_class()
+
+    @classmethod
+    def validate_class(cls):
+        """
+        Valida gli attributi di classe obbligatori.
+
+        Chiamato da register_extractor alla definizione della classe (senza
+        istanziarla) e da __init__ per gli extractor non registrati.
+
+        Raises:
+            ValueError: Se name o table_name non sono definiti
+        """
+        if not cls.name:
+            raise ValueError(f"{cls.__name__} deve definire 'name'")
+        if not cls.table_name:
+            raise ValueError(f"{cls.__name__} deve definire 'table_name'")
 
     @abstractmethod
     def extract(self, client, date: str) -> List[Dict[str, Any]]:
@@ -88,12 +102,30 @@ class BaseExtractor(ABC):
         """
         pass
 
+    def save_many(self, db, date_to_data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, bool]:
+        """
+        Salva i dati di più date.
+
+        Implementazione generica: una save() per data. Le sottoclassi con
+        insert bulk nel database la sovrascrivono per usare una sola
+        transazione.
+
+        Args:
+            db: Istanza GA4Database
+            date_to_data: Dict data YYYY-MM-DD -> dati estratti
+
+        Returns:
+            Dict data -> True se salvata
+        """
+        return {date: self.save(db, date, data) for date, data in date_to_data.items()}
+
     def get_dates_missing(self, db, start_date: str, end_date: str) -> List[str]:
         """
         Trova date che hanno metriche base ma mancano dati per questo extractor.
 
-        Implementazione generica con LEFT JOIN.
-        Può essere sovrascritta per logica custom.
+        Differenza tra le date di daily_metrics e present_dates, calcolata in
+        bulk_missing_dates come per il backfill di tutti gli extractor. Per
+        logica custom sovrascrivere present_dates.
 
         Args:
             db: Istanza GA4Database
@@ -103,34 +135,71 @@ class BaseExtractor(ABC):
         Returns:
             Lista di date mancanti ordinate cronologicamente
         """
-        cursor = db.conn.cursor()
-        ph = db._placeholder
+        return self.bulk_missing_dates(db, [self], start_date, end_date)[self.name]
 
-        # Query generica: date in daily_metrics senza corrispondenza nella tabella target
-        query = f"""
-            SELECT dm.date
-            FROM daily_metrics dm
-            LEFT JOIN {self.table_name} t ON dm.date = t.date
-            WHERE dm.date BETWEEN {ph} AND {ph}
-            GROUP BY dm.date
-            HAVING COUNT(t.id) = 0
-            ORDER BY dm.date
+    def present_dates(self, db, start_date: str, end_date: str) -> Set[str]:
         """
+        Date del range già presenti per questo extractor.
 
-        cursor.execute(query, (start_date, end_date))
-        rows = cursor.fetchall()
+        Implementazione generica: date distinte della tabella target (indice
+        su date). Può essere sovrascritta per logica custom.
 
-        # Normalizza date come stringhe
-        dates = []
-        for row in rows:
-            date_val = row[0] if not isinstance(row, dict) else row['date']
-            if hasattr(date_val, 'isoformat'):
-                date_val = date_val.isoformat()
-            dates.append(str(date_val))
+        Args:
+            db: Istanza GA4Database
+            start_date: Data inizio (YYYY-MM-DD)
+            end_date: Data fine (YYYY-MM-DD)
 
-        return dates
+        Returns:
+            Set di date YYYY-MM-DD
+        """
+        cursor = db._scalar_cursor()
+        ph = db._placeholder
+        to_str = db._date_to_str
+
+        cursor.execute(
+            f"SELECT DISTINCT date FROM {self.table_name} WHERE date BETWEEN {ph} AND {ph}",
+            (start_date, end_date)
+        )
+        return {to_str(row[0]) for row in cursor.fetchall()}
+
+    @staticmethod
+    def bulk_missing_dates(
+        db,
+        extractors: List['BaseExtractor'],
+        start_date: str,
+        end_date: str
+    ) -> Dict[str, List[str]]:
+        """
+        Date mancanti per più extractor con una sola lettura di daily_metrics.
+
+        Le date di daily_metrics nel range sono lette una volta; per ogni
+        extractor la differenza con present_dates è calcolata in Python.
+
+        Args:
+            db: Istanza GA4Database
+            extractors: Extractor da analizzare
+            start_date: Data inizio (YYYY-MM-DD)
+            end_date: Data fine (YYYY-MM-DD)
+
+        Returns:
+            Dict nome extractor -> lista di date mancanti ordinate
+        """
+        cursor = db._scalar_cursor()
+        ph = db._placeholder
+        to_str = db._date_to_str
 
-    def validate_date(self, date: str) -> tuple:
+        cursor.execute(
+            f"SELECT date FROM daily_metrics WHERE date BETWEEN {ph} AND {ph}",
+            (start_date, end_date)
+        )
+        daily_dates = {to_str(row[0]) for row in cursor.fetchall()}
+
+        return {
+            extractor.name: sorted(daily_dates - extractor.present_dates(db, start_date, end_date))
+            for extractor in extractors
+        }
+
+    def validate_date(self, date: str, *, today: Optional[date_type] = None) -> tuple:
         """
         Valida che una data sia valida per l'estrazione.
 
@@ -138,14 +207,15 @@ class BaseExtractor(ABC):
 
         Args:
             date: Data da validare (YYYY-MM-DD)
+            today: Data odierna, calcolata una volta dal chiamante nei
+                   backfill (default: oggi)
 
         Returns:
             Tuple (is_valid: bool, message: str)
         """
-        from datetime import datetime, timedelta
-
-        target_date = datetime.strptime(date, '%Y-%m-%d')
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        target_date = date_type.fromisoformat(date)
+        if today is None:
+            today = date_type.today()
         min_date = today - timedelta(days=self.ga4_delay_days)
 
         if target_date > min_date:
@@ -158,5 +228,36 @@ class BaseExtractor(ABC):
 
         return True, f"Data valida per estrazione {self.name} ({date})"
 
+    def split_valid_dates(
+        self,
+        dates: List[str],
+        *,
+        today: Optional[date_type] = None
+    ) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """
+        Separa le date estraibili da quelle troppo recenti (backfill).
+
+        Applica validate_date a ogni data con lo stesso today: le sottoclassi
+        che la sovrascrivono sono rispettate anche nei backfill.
+
+        Args:
+            dates: Date da validare (YYYY-MM-DD)
+            today: Data odierna (default: oggi)
+
+        Returns:
+            Tuple (date valide, lista di (data scartata, messaggio))
+        """
+        if today is None:
+            today = date_type.today()
+
+        valid, rejected = [], []
+        for d in dates:
+            is_valid, message = self.validate_date(d, today=today)
+            if is_valid:
+                valid.append(d)
+            else:
+                rejected.append((d, message))
+        return valid, rejected
+
     def __repr__(self):
         return f"<{self.__class__.__name__}(name='{self.name}', table='{self.table_name}')>"
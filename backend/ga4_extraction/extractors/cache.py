@@ -0,0 +1,178 @@
+"""
+Cache su disco dei risultati degli extractors GA4.
+
+Un backfill interrotto a metà, al riavvio, rifarebbe tutte le chiamate GA4
+per le date estratte ma non ancora salvate. I risultati per date consolidate
+(oltre il ritardo GA4 dell'extractor) non cambiano più: vengono salvati in
+una tabella SQLite locale e riletti al posto della chiamata GA4.
+
+La cache è su file separato dal database principale (che può essere
+PostgreSQL) e si disattiva con GA4_EXTRACTION_CACHE_PATH vuota.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from abc import abstractmethod
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import List, Dict, Any, Optional
+
+from .base import BaseExtractor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = 'data/ga4_extraction_cache.db'
+
+_MISS = object()
+
+
+class ExtractionCache:
+    """
+    Tabella ga4_extraction_cache su SQLite.
+
+    Chiave (extractor, date, payload_hash); il risultato è salvato in JSON.
+    Una sola connessione condivisa tra i thread del backfill, serializzata
+    da un lock.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ga4_extraction_cache (
+                extractor TEXT NOT NULL,
+                date TEXT NOT NULL,
+                payload_hash TEXT NOT NULL,
+                result_json TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (extractor, date, payload_hash)
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, extractor: str, date: str, payload_hash: str) -> Any:
+        """Risultato in cache, o _MISS se assente."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT result_json FROM ga4_extraction_cache "
+                "WHERE extractor = ? AND date = ? AND payload_hash = ?",
+                (extractor, date, payload_hash)
+            ).fetchone()
+        return _MISS if row is None else json.loads(row[0])
+
+    def put(self, extractor: str, date: str, payload_hash: str, result: Any) -> None:
+        """Salva (o sostituisce) il risultato di un'estrazione."""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ga4_extraction_cache "
+                "(extractor, date, payload_hash, result_json, created_at) VALUES (?, ?, ?, ?, ?)",
+                (extractor, date, payload_hash, json.dumps(result), datetime.now().isoformat())
+            )
+            self.conn.commit()
+
+    def close(self):
+        """Chiude la connessione."""
+        with self._lock:
+            self.conn.close()
+
+
+_caches: Dict[str, Optional[ExtractionCache]] = {}
+_caches_lock = Lock()
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """
+    Cache dei risultati per il path in GA4_EXTRACTION_CACHE_PATH.
+
+    Returns:
+        ExtractionCache, o None se disattivata (variabile vuota) o se il
+        file non è apribile (es. filesystem in sola lettura)
+    """
+    path = os.getenv('GA4_EXTRACTION_CACHE_PATH', DEFAULT_CACHE_PATH)
+    if not path:
+        return None
+
+    if path not in _caches:
+        with _caches_lock:
+            if path not in _caches:  # Double-check locking
+                try:
+                    _caches[path] = ExtractionCache(path)
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"Cache estrazioni non disponibile ({path}): {e}")
+                    _caches[path] = None
+    return _caches[path]
+
+
+class CachedExtractor(BaseExtractor):
+    """
+    Extractor con cache su disco dei risultati per date consolidate.
+
+    Le sottoclassi implementano fetch() (la chiamata GA4) invece di
+    extract(): extract() legge prima dalla cache e, in caso di miss,
+    chiama fetch() e salva il risultato. Le date entro ga4_delay_days
+    e i risultati vuoti non vengono mai messi in cache.
+
+    Incrementare cache_version quando cambia la logica di fetch()
+    invalida i risultati salvati in precedenza.
+    """
+
+    cache_version: int = 1
+
+    @abstractmethod
+    def fetch(self, client, date: str) -> List[Dict[str, Any]]:
+        """
+        Estrae dati da GA4 per una data (senza cache).
+
+        Args:
+            client: BetaAnalyticsDataClient autenticato
+            date: Data in formato YYYY-MM-DD
+
+        Returns:
+            Lista di dizionari serializzabili in JSON
+        """
+        pass
+
+    def payload_hash(self) -> str:
+        """Hash dei parametri che determinano il risultato (property, versione)."""
+        from ..extraction import PROPERTY_ID
+
+        payload = json.dumps({
+            'property': PROPERTY_ID,
+            'extractor': self.name,
+            'version': self.cache_version,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def extract(self, client, date: str) -> List[Dict[str, Any]]:
+        """
+        Estrae dati per una data passando dalla cache su disco.
+
+        Args:
+            client: BetaAnalyticsDataClient autenticato
+            date: Data in formato YYYY-MM-DD
+
+        Returns:
+            Lista di dizionari con i dati estratti
+        """
+        cache = get_extraction_cache()
+        if cache is None or not self.validate_date(date)[0]:
+            return self.fetch(client, date)
+
+        key = self.payload_hash()
+        result = cache.get(self.name, date, key)
+        if result is not _MISS:
+            logger.debug(f"Cache hit {self.name} per {date}")
+            return result
+
+        result = self.fetch(client, date)
+        # Un risultato vuoto ("Nessun dato disponibile") non viene salvato:
+        # le esecuzioni successive devono poter richiedere di nuovo la data
+        if result:
+            cache.put(self.name, date, key, result)
+        return result
@@ -7,19 +7,21 @@ Estrae breakdown delle sessioni (commodity e luce&gas) per campagna.
 from typing import List, Dict, Any
 import logging
 
-from .base import BaseExtractor
+from ..extraction import daily_sessions_campaigns, _sessions_records
+from .cache import CachedExtractor
 from .registry import register_extractor
 
 logger = logging.getLogger(__name__)
 
 
 @register_extractor
-class CampaignsExtractor(BaseExtractor):
+class CampaignsExtractor(CachedExtractor):
     """
     Extractor per sessioni suddivise per campagna marketing.
 
     Tabella: sessions_by_campaign
     Ritardo GA4: 2 giorni (D-2)
+    Cache su disco: risultati per date consolidate (vedi CachedExtractor)
     """
 
     name = "campaigns"
@@ -27,7 +29,7 @@ class CampaignsExtractor(BaseExtractor):
     ga4_delay_days = 2
     description = "Sessioni per campagna marketing (commodity e luce&gas)"
 
-    def extract(self, client, date: str) -> List[Dict[str, Any]]:
+    def fetch(self, client, date: str) -> List[Dict[str, Any]]:
         """
         Estrae sessioni per campagna da GA4.
 
@@ -38,62 +40,11 @@ class CampaignsExtractor(BaseExtractor):
         Returns:
             Lista di dict: [{'campaign': str, 'commodity_sessions': int, 'lucegas_sessions': int}, ...]
         """
-        from google.analytics.data_v1beta.types import (
-            DateRange, Dimension, Metric, RunReportRequest
-        )
-        from backend.ga4_extraction.filters import session_commodity_filter, session_lucegas_filter
-        from backend.ga4_extraction.extraction import _execute_ga4_request, PROPERTY_ID
-
         logger.info(f"Estrazione sessioni per campagna per {date}")
 
-        # Query per sessioni Commodity per campagna
-        request_commodity = RunReportRequest(
-            property=f'properties/{PROPERTY_ID}',
-            dimensions=[Dimension(name="sessionCampaignName")],
-            metrics=[Metric(name='sessions')],
-            date_ranges=[DateRange(start_date=date, end_date=date)],
-            dimension_filter=session_commodity_filter()
-        )
-
-        commodity_response = _execute_ga4_request(client, request_commodity)
-
-        # Query per sessioni Luce&Gas per campagna
-        request_lucegas = RunReportRequest(
-            property=f'properties/{PROPERTY_ID}',
-            dimensions=[Dimension(name="sessionCampaignName")],
-            metrics=[Metric(name='sessions')],
-            date_ranges=[DateRange(start_date=date, end_date=date)],
-            dimension_filter=session_lucegas_filter()
-        )
-
-        lucegas_response = _execute_ga4_request(client, request_lucegas)
-
-        # Processa response Commodity
-        commodity_data = {}
-        if commodity_response.rows:
-            for row in commodity_response.rows:
-                campaign = row.dimension_values[0].value
-                sessions = int(row.metric_values[0].value)
-                commodity_data[campaign] = sessions
-
-        # Processa response Luce&Gas
-        lucegas_data = {}
-        if lucegas_response.rows:
-            for row in lucegas_response.rows:
-                campaign = row.dimension_values[0].value
-                sessions = int(row.metric_values[0].value)
-                lucegas_data[campaign] = sessions
-
-        # Combina i dati
-        all_campaigns = set(commodity_data.keys()) | set(lucegas_data.keys())
-
-        result = []
-        for campaign in sorted(all_campaigns):
-            result.append({
-                'campaign': campaign,
-                'commodity_sessions': commodity_data.get(campaign, 0),
-                'lucegas_sessions': lucegas_data.get(campaign, 0)
-            })
+        # Coppia commodity/luce&gas in una batch; unione e ordinamento delle chiavi
+        # avvengono per allineamento di indice in _sessions_pair_frame
+        result = _sessions_records(daily_sessions_campaigns(client, date), 'Campaign', 'campaign')
 
         logger.info(f"Estratte {len(result)} campagne per {date}")
         return result
@@ -115,3 +66,18 @@ class CampaignsExtractor(BaseExtractor):
             return False
 
         return db.insert_sessions_by_campaign(date, data, replace=True)
+
+    def save_many(self, db, date_to_data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, bool]:
+        """
+        Salva sessioni per campagna di più date in una sola transazione.
+
+        Args:
+            db: Istanza GA4Database
+            date_to_data: Dict data YYYY-MM-DD -> dati come save()
+
+        Returns:
+            Dict data -> True se salvata (tutte o nessuna)
+        """
+        rows = [(date, data) for date, data in date_to_data.items() if data]
+        saved = db.insert_sessions_by_campaign_bulk(rows, replace=True) > 0
+        return {date: saved and bool(data) for date, data in date_to_data.items()}
@@ -4,21 +4,36 @@ Registry per Extractors GA4.
 Gestisce la registrazione e il recupero degli extractors disponibili.
 """
 
-from typing import Dict, Optional, List
+from threading import Lock
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, List, Type
 import logging
 
 from .base import BaseExtractor
 
 logger = logging.getLogger(__name__)
 
-# Registry globale degli extractors
-_extractors: Dict[str, BaseExtractor] = {}
+# Registry globale degli extractors (classi; istanziate alla prima richiesta)
+_extractors: Dict[str, Type[BaseExtractor]] = {}
+
+# Istanze create da get_extractor (una per nome)
+_instances: Dict[str, BaseExtractor] = {}
+_instances_lock = Lock()
+
+# Vista in sola lettura delle istanze (nessuna copia per chiamata)
+_instances_view: Mapping[str, BaseExtractor] = MappingProxyType(_instances)
+
+# Auto-registrazione già eseguita
+_registered = False
 
 
 def register_extractor(extractor_class: type) -> type:
     """
     Decorator per registrare un extractor nel registry.
 
+    La classe non viene istanziata: name e table_name sono attributi di
+    classe, validati qui alla definizione.
+
     Uso:
         @register_extractor
         class MyExtractor(BaseExtractor):
@@ -34,14 +49,15 @@ def register_extractor(extractor_class: type) -> type:
     if not issubclass(extractor_class, BaseExtractor):
         raise TypeError(f"{extractor_class} deve estendere BaseExtractor")
 
-    # Istanzia per validare e ottenere il nome
-    instance = extractor_class()
-    name = instance.name
+    extractor_class.validate_class()
+    name = extractor_class.name
 
     if name in _extractors:
         logger.warning(f"Extractor '{name}' già registrato, sovrascrivo")
 
-    _extractors[name] = instance
+    with _instances_lock:
+        _extractors[name] = extractor_class
+        _instances.pop(name, None)
     logger.debug(f"Extractor registrato: {name} -> {extractor_class.__name__}")
 
     return extractor_class
@@ -51,16 +67,22 @@ def get_extractor(name: str) -> Optional[BaseExtractor]:
     """
     Ottiene un extractor dal registry per nome.
 
+    L'istanza è creata alla prima richiesta e riusata in seguito.
+
     Args:
         name: Nome dell'extractor
 
     Returns:
-        Istanza dell'extractor o None se non trovato
+        Istanza dell'extractor o None se non trovato (il messaggio con gli
+        extractor disponibili è a carico del chiamante)
     """
-    extractor = _extractors.get(name)
-    if not extractor:
-        logger.warning(f"Extractor '{name}' non trovato. Disponibili: {list(_extractors.keys())}")
-    return extractor
+    instance = _instances.get(name)
+    if instance is None and name in _extractors:
+        with _instances_lock:
+            instance = _instances.get(name)
+            if instance is None:  # Double-check locking
+                instance = _instances[name] = _extractors[name]()
+    return instance
 
 
 def list_extractors() -> List[Dict[str, str]]:
@@ -82,19 +104,26 @@ def list_extractors() -> List[Dict[str, str]]:
     ]
 
 
-def get_all_extractors() -> Dict[str, BaseExtractor]:
+def get_all_extractors() -> Mapping[str, BaseExtractor]:
     """
     Ottiene tutti gli extractors registrati.
 
     Returns:
-        Dict nome -> istanza extractor
+        Vista in sola lettura nome -> istanza extractor
     """
-    return _extractors.copy()
+    for name in list(_extractors):
+        get_extractor(name)
+    return _instances_view
 
 
 # Auto-import degli extractors per registrarli
 def _auto_register():
-    """Importa automaticamente tutti i moduli extractors per registrarli."""
+    """Importa automaticamente tutti i moduli extractors per registrarli (una volta)."""
+    global _registered
+    if _registered:
+        return
+    _registered = True
+
     try:
         from . import channels
     except ImportError as e:
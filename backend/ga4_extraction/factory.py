@@ -6,15 +6,102 @@ Implementa pattern Factory per centralizzare la creazione di istanze
 con gestione configurazione e dependency injection.
 """
 
+import atexit
+import json
 import logging
-from typing import Tuple, Optional, Dict, Any
+import os
+import sys
+import threading
+import weakref
+from functools import lru_cache
+from typing import TYPE_CHECKING, Tuple, Optional, Dict, Any
 from pathlib import Path
 
 from .database import GA4Database
-from .redis_cache import GA4RedisCache
+
+if TYPE_CHECKING:
+    # Import reale in _create_redis_cache: redis non viene caricato nei
+    # percorsi solo-database (create_database_only)
+    from .redis_cache import GA4RedisCache
 
 logger = logging.getLogger(__name__)
 
+# Risorse create dal factory ancora vive, chiuse all'uscita del processo.
+# WeakSet: il tracking non impedisce il garbage collection (atexit.register
+# su ogni istanza le terrebbe in vita per sempre)
+_open_resources: "weakref.WeakSet" = weakref.WeakSet()
+_open_resources_lock = threading.Lock()
+_atexit_registered = False
+
+
+def _close_open_resources() -> None:
+    """Chiude le risorse del factory ancora aperte (handler atexit)."""
+    for resource in list(_open_resources):
+        try:
+            resource.close()
+        except Exception:
+            pass
+
+
+def _track(resource):
+    """Registra una risorsa per la chiusura all'uscita (un solo handler atexit)."""
+    global _atexit_registered
+
+    with _open_resources_lock:
+        _open_resources.add(resource)
+        if not _atexit_registered:
+            atexit.register(_close_open_resources)
+            _atexit_registered = True
+    return resource
+
+
+# Variabili d'ambiente che sovrascrivono la sezione redis di config.yaml
+REDIS_ENV_VARS = ('REDIS_HOST', 'REDIS_PORT', 'REDIS_TOKEN', 'REDIS_PASSWORD', 'REDIS_DB', 'REDIS_SSL')
+
+
+@lru_cache(maxsize=8)
+def _resolve_redis_kwargs(redis_config_json: str, env: Tuple[Optional[str], ...]) -> Tuple[Tuple[str, Any], ...]:
+    """
+    Parametri GA4RedisCache risolti da config + env (memoizzati).
+
+    La chiave include i valori delle REDIS_ENV_VARS: un cambio di env
+    produce una nuova risoluzione.
+
+    Args:
+        redis_config_json: Sezione redis serializzata (json, sort_keys)
+        env: Valori di REDIS_ENV_VARS nello stesso ordine
+
+    Returns:
+        Coppie (nome, valore) dei kwargs di GA4RedisCache
+    """
+    redis_config = json.loads(redis_config_json)
+    host, port, token, password, db, ssl = env
+
+    # Priorità: env vars > config.yaml
+    # Accetta sia REDIS_TOKEN (Upstash) che REDIS_PASSWORD (standard)
+    return (
+        ('host', host or redis_config.get('host', 'localhost')),
+        ('port', int(port or redis_config.get('port', 6379))),
+        ('db', int(db or redis_config.get('db', 1))),
+        ('password', token or password or redis_config.get('password')),
+        ('ssl', (ssl or '').lower() == 'true' or redis_config.get('ssl', False)),
+        ('key_prefix', redis_config.get('key_prefix', 'ga4:metrics:')),
+        ('ttl_days', redis_config.get('ttl_days', 14)),
+    )
+
+
+# PRAGMA applicati alle connessioni SQLite create dal factory
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # lettori concorrenti durante le scritture
+    "PRAGMA synchronous=NORMAL",    # sicuro con WAL, meno fsync
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",     # ~64 MB di page cache
+)
+
+# mmap: letture senza syscall read(); escluso dove SQLite lo sconsiglia
+# (OpenBSD, senza unified buffer cache)
+SQLITE_MMAP_SIZE = 268435456  # 256 MB
+
 
 class GA4ResourceFactory:
     """
@@ -27,7 +114,7 @@ class GA4ResourceFactory:
     """
     
     @staticmethod
-    def create_from_config(config: Dict[str, Any]) -> Tuple[GA4Database, Optional[GA4RedisCache]]:
+    def create_from_config(config: Dict[str, Any]) -> Tuple[GA4Database, Optional['GA4RedisCache']]:
         """
         Crea istanze Database e Redis Cache da configurazione.
         
@@ -60,8 +147,8 @@ class GA4ResourceFactory:
         # Crea Database (obbligatorio)
         db = GA4ResourceFactory._create_database(db_config)
         
-        # Crea Redis Cache (opzionale)
-        cache = GA4ResourceFactory._create_redis_cache(db_config)
+        # Crea Redis Cache (opzionale), pre-riscaldata in background dal database
+        cache = GA4ResourceFactory._create_redis_cache(db_config, db)
         
         return db, cache
     
@@ -87,7 +174,8 @@ class GA4ResourceFactory:
         db_dir.mkdir(parents=True, exist_ok=True)
         
         logger.info(f"Creazione database: {db_path}")
-        db = GA4Database(db_path)
+        db = _track(GA4Database(db_path))
+        GA4ResourceFactory._tune_sqlite(db)
         
         # Assicura che lo schema esista
         db.create_schema()
@@ -95,12 +183,41 @@ class GA4ResourceFactory:
         return db
     
     @staticmethod
-    def _create_redis_cache(db_config: Dict[str, Any]) -> Optional[GA4RedisCache]:
+    def _tune_sqlite(db: GA4Database) -> None:
+        """
+        Applica i PRAGMA di performance a una connessione SQLite.
+        
+        Nessun effetto su PostgreSQL. Eseguito una volta alla creazione,
+        prima di create_schema().
+        
+        Args:
+            db: Istanza GA4Database
+        """
+        if db.db_type != 'sqlite':
+            return
+        
+        pragmas = list(SQLITE_PRAGMAS)
+        if not sys.platform.startswith('openbsd'):
+            pragmas.append(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        
+        for pragma in pragmas:
+            db.conn.execute(pragma)
+    
+    @staticmethod
+    def _create_redis_cache(
+        db_config: Dict[str, Any],
+        db: Optional[GA4Database] = None
+    ) -> Optional['GA4RedisCache']:
         """
         Crea istanza GA4RedisCache con gestione errori.
         
+        Se db è fornito e redis.prewarm non è False, la cache viene
+        ripopolata in background (sync_from_db sugli ultimi ttl_days giorni)
+        così le prime letture dopo un restart di Redis non ricadono sul DB.
+        
         Args:
             db_config: Configurazione database (contiene sezione 'redis')
+            db: Database da cui pre-riscaldare la cache (opzionale)
         
         Returns:
             Istanza GA4RedisCache o None se non disponibile
@@ -112,33 +229,27 @@ class GA4ResourceFactory:
             REDIS_DB: Database number (default: 1)
             REDIS_SSL: Se "true", usa connessione SSL (richiesto da Upstash)
         """
-        import os
-        
         redis_config = db_config.get('redis', {})
         
         if not redis_config:
             logger.info("Configurazione Redis non trovata, cache disabilitata")
             return None
         
-        # Priorità: env vars > config.yaml
-        # Accetta sia REDIS_TOKEN (Upstash) che REDIS_PASSWORD (standard)
-        redis_host = os.getenv('REDIS_HOST') or redis_config.get('host', 'localhost')
-        redis_port = int(os.getenv('REDIS_PORT') or redis_config.get('port', 6379))
-        redis_password = os.getenv('REDIS_TOKEN') or os.getenv('REDIS_PASSWORD') or redis_config.get('password')
-        redis_db = int(os.getenv('REDIS_DB') or redis_config.get('db', 1))
-        redis_ssl = os.getenv('REDIS_SSL', '').lower() == 'true' or redis_config.get('ssl', False)
+        redis_kwargs = dict(_resolve_redis_kwargs(
+            json.dumps(redis_config, sort_keys=True, default=str),
+            tuple(os.environ.get(name) for name in REDIS_ENV_VARS)
+        ))
+        redis_host, redis_port = redis_kwargs['host'], redis_kwargs['port']
         
         try:
-            cache = GA4RedisCache(
-                host=redis_host,
-                port=redis_port,
-                db=redis_db,
-                password=redis_password,
-                ssl=redis_ssl,
-                key_prefix=redis_config.get('key_prefix', 'ga4:metrics:'),
-                ttl_days=redis_config.get('ttl_days', 14)
-            )
+            from .redis_cache import GA4RedisCache
+
+            cache = _track(GA4RedisCache(**redis_kwargs))
             logger.info(f"✓ Redis cache connessa ({redis_host}:{redis_port})")
+            
+            if db is not None and redis_config.get('prewarm', True):
+                GA4ResourceFactory._start_prewarm(cache, db, redis_config.get('ttl_days', 14))
+            
             return cache
             
         except Exception as e:
@@ -146,6 +257,40 @@ class GA4ResourceFactory:
             logger.info("Continuando senza cache Redis (solo SQLite)")
             return None
     
+    @staticmethod
+    def _start_prewarm(cache: 'GA4RedisCache', db: GA4Database, days: int) -> Optional[threading.Thread]:
+        """
+        Avvia sync_from_db in un thread daemon.
+        
+        Il thread apre una propria connessione al database: quella di db
+        resta in uso al chiamante e non va condivisa tra thread.
+        
+        Args:
+            cache: Cache Redis da popolare
+            db: Database di riferimento (serve il suo db_path)
+            days: Giorni da sincronizzare
+        
+        Returns:
+            Thread avviato, o None se db usa una connessione da pool
+        """
+        if db.db_path == 'pooled':
+            return None
+        
+        def prewarm():
+            warm_db = None
+            try:
+                warm_db = GA4Database(db.db_path, run_migrations=False)
+                cache.sync_from_db(warm_db, days)
+            except Exception as e:
+                logger.warning(f"Pre-riscaldamento cache Redis fallito: {e}")
+            finally:
+                if warm_db is not None:
+                    warm_db.close()
+        
+        thread = threading.Thread(target=prewarm, name='redis-prewarm', daemon=True)
+        thread.start()
+        return thread
+    
     @staticmethod
     def create_database_only(db_path: str = "data/ga4_data.db") -> GA4Database:
         """
@@ -162,7 +307,8 @@ class GA4ResourceFactory:
         db_dir = Path(db_path).parent
         db_dir.mkdir(parents=True, exist_ok=True)
         
-        db = GA4Database(db_path)
+        db = _track(GA4Database(db_path))
+        GA4ResourceFactory._tune_sqlite(db)
         db.create_schema()
         
         return db
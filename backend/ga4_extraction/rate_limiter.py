@@ -41,7 +41,8 @@ class GA4RateLimiter:
         """
         self.max_rps = max_rps
         self.window_seconds = 1.0
-        self.request_times: deque = deque()
+        # Orari (monotonic) degli ultimi max_rps slot assegnati, anche futuri
+        self.request_times: deque = deque(maxlen=max_rps)
         self._lock = threading.Lock()
 
         # Stats per monitoring
@@ -50,46 +51,75 @@ class GA4RateLimiter:
 
         logger.debug(f"Rate limiter inizializzato: {max_rps} rps")
 
-    def wait_if_needed(self) -> float:
+    def reserve(self, n: int = 1) -> float:
         """
-        Attende se necessario per rispettare il rate limit.
+        Prenota il prossimo slot libero per n request senza attendere.
+
+        Al più max_rps slot in ogni finestra di window_seconds. Lo stato è
+        protetto da un lock tenuto solo per il calcolo, mai durante l'attesa
+        (wait_if_needed). Orari con time.monotonic(), immuni a salti
+        dell'orologio di sistema.
 
-        Deve essere chiamato PRIMA di ogni API request.
+        Le n request condividono lo stesso slot (eseguibili insieme allo
+        scadere dell'attesa): un solo lock per tutto il blocco.
+
+        Args:
+            n: Numero di request da prenotare (1 <= n <= max_rps)
 
         Returns:
-            Tempo di attesa effettivo in secondi (0 se nessuna attesa)
+            Secondi da attendere prima di eseguire le request (0 se nessuna attesa)
+
+        Raises:
+            ValueError: Se n è fuori da [1, max_rps]
         """
+        if not 1 <= n <= self.max_rps:
+            raise ValueError(f"n deve essere tra 1 e {self.max_rps}, ricevuto {n}")
+
         with self._lock:
-            now = time.time()
+            now = time.monotonic()
+            times = self.request_times
+
+            # Slot libero: quando esce dalla finestra lo slot oltre il quale
+            # restano al più max_rps - n slot (per n=1 il più vecchio)
+            slot = now
+            keep = self.max_rps - n
+            if len(times) > keep:
+                slot = max(now, times[len(times) - keep - 1] + self.window_seconds, times[-1])
+
+            # Prenota gli slot (maxlen scarta automaticamente i più vecchi)
+            times.extend([slot] * n)
+            wait_time = slot - now
 
-            # Rimuovi request più vecchie della finestra temporale
-            while self.request_times and self.request_times[0] < now - self.window_seconds:
-                self.request_times.popleft()
+            # Aggiorna stats
+            self._total_requests += n
+            self._total_wait_time += wait_time * n
 
-            wait_time = 0.0
+        return wait_time
 
-            # Se siamo al limite, calcola quanto aspettare
-            if len(self.request_times) >= self.max_rps:
-                oldest = self.request_times[0]
-                wait_time = self.window_seconds - (now - oldest)
+    def wait_if_needed(self, n: int = 1) -> float:
+        """
+        Attende se necessario per rispettare il rate limit.
 
-                if wait_time > 0:
-                    logger.debug(f"Rate limit raggiunto, attendo {wait_time:.3f}s")
-                    time.sleep(wait_time)
-                    now = time.time()
+        Deve essere chiamato PRIMA di ogni API request (o di un blocco di n
+        request da eseguire insieme).
 
-                    # Pulisci di nuovo dopo sleep
-                    while self.request_times and self.request_times[0] < now - self.window_seconds:
-                        self.request_times.popleft()
+        Lo slot viene prenotato sotto lock (reserve) e l'attesa avviene fuori
+        dal lock: i chiamanti concorrenti prenotano gli slot successivi senza
+        restare bloccati dietro lo sleep altrui.
 
-            # Registra questa request
-            self.request_times.append(time.time())
+        Args:
+            n: Numero di request coperte dall'attesa (default: 1)
 
-            # Aggiorna stats
-            self._total_requests += 1
-            self._total_wait_time += wait_time
+        Returns:
+            Tempo di attesa effettivo in secondi (0 se nessuna attesa)
+        """
+        wait_time = self.reserve(n)
+
+        if wait_time > 0:
+            logger.debug(f"Rate limit raggiunto, attendo {wait_time:.3f}s")
+            time.sleep(wait_time)
 
-            return wait_time
+        return wait_time
 
     def get_stats(self) -> dict:
         """
@@ -9,11 +9,132 @@ Sliding window: mantiene sempre gli ultimi 14 giorni in cache.
 import redis
 import json
 import logging
+import random
+import time
+import zlib
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from threading import Lock
+from typing import Dict, List, Optional, Any, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Serializzazione metriche: orjson (estensione C, dipendenza del progetto),
+# con fallback su json standard se non installato. Il formato in Redis resta
+# JSON testuale in entrambi i casi. Scalari numpy (valori da DataFrame) e
+# date/datetime sono serializzati senza conversioni preventive.
+try:
+    import orjson
+
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+
+    _loads = orjson.loads
+except ImportError:
+    def _json_default(obj: Any) -> Any:
+        # Scalari numpy -> tipi Python, date/datetime -> ISO
+        if hasattr(obj, 'item'):
+            return obj.item()
+        if hasattr(obj, 'isoformat'):
+            return obj.isoformat()
+        raise TypeError(f"Tipo non serializzabile: {type(obj).__name__}")
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, default=_json_default).encode()
+
+    _loads = json.loads
+
+# Formato blob (hash_storage=False): payload JSON oltre questa soglia (bytes)
+# salvati compressi con zlib, preceduti da _COMPRESSED_TAG; sotto soglia
+# restano JSON testuale, leggibile anche dalle chiavi scritte prima della
+# compressione (JSON non inizia mai con 'G'). Con hash_storage (default) i
+# campi sono singole metriche di pochi byte: restano JSON, senza compressione.
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_LEVEL = 3
+_COMPRESSED_TAG = b'G'
+
+
+def _encode(value: Any) -> bytes:
+    """Serializza un valore per Redis, comprimendo i payload grandi."""
+    raw = _dumps(value)
+    if len(raw) > COMPRESS_MIN_BYTES:
+        return _COMPRESSED_TAG + zlib.compress(raw, COMPRESS_LEVEL)
+    return raw
+
+
+def _decode(payload: bytes) -> Any:
+    """Ricostruisce un valore scritto da _encode (o JSON non compresso)."""
+    if payload[:1] == _COMPRESSED_TAG:
+        return _loads(zlib.decompress(payload[1:]))
+    return _loads(payload)
+
+# Connessioni massime per pool (un pool per endpoint Redis)
+REDIS_POOL_MAX_CONNECTIONS = 32
+
+# Timeout socket (secondi): Redis irraggiungibile non blocca l'avvio oltre questi limiti
+REDIS_CONNECT_TIMEOUT = 1.0
+REDIS_SOCKET_TIMEOUT = 2.0
+
+# Pool condivisi tra le istanze GA4RedisCache: socket (e handshake TLS)
+# riusati invece di una nuova connessione per istanza
+_pool_registry: Dict[Tuple, redis.ConnectionPool] = {}
+_pool_registry_lock = Lock()
+
+# Variazione casuale del TTL per chiave (±5%): le chiavi scritte insieme da
+# sync_from_db non scadono tutte nello stesso istante
+TTL_JITTER_RATIO = 0.05
+
+# Validità in secondi del risultato memorizzato di get_cache_info
+CACHE_INFO_TTL_SECONDS = 5.0
+
+# Chiavi per iterazione SCAN e per UNLINK (iterazione cooperativa, non blocca il server)
+SCAN_BATCH_SIZE = 500
+
+
+def _get_connection_pool(
+    host: str,
+    port: int,
+    db: int,
+    password: Optional[str],
+    ssl: bool
+) -> redis.ConnectionPool:
+    """
+    Restituisce (creandolo se serve) il pool condiviso per un endpoint Redis.
+
+    Args:
+        host: Host Redis
+        port: Porta Redis
+        db: Database Redis
+        password: Password Redis (opzionale)
+        ssl: Usa connessione SSL/TLS
+
+    Returns:
+        redis.ConnectionPool condiviso
+    """
+    key = (host, port, db, password, ssl)
+    pool = _pool_registry.get(key)
+    if pool is None:
+        with _pool_registry_lock:
+            pool = _pool_registry.get(key)
+            if pool is None:  # Double-check locking
+                pool = _pool_registry[key] = redis.ConnectionPool(
+                    connection_class=redis.SSLConnection if ssl else redis.Connection,
+                    host=host,
+                    port=port,
+                    db=db,
+                    password=password,
+                    max_connections=REDIS_POOL_MAX_CONNECTIONS,
+                    socket_keepalive=True,
+                    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+                    socket_timeout=REDIS_SOCKET_TIMEOUT,
+                    health_check_interval=30,
+                    # Risposte in bytes: i payload (JSON o blob compressi) vanno
+                    # a _loads/_decode, solo chiavi e nomi di campo vengono decodificati
+                    decode_responses=False
+                )
+    return pool
+
 
 class GA4RedisCache:
     """Manager per cache Redis delle metriche GA4."""
@@ -26,7 +147,9 @@ class GA4RedisCache:
         key_prefix: str = "ga4:metrics:",
         ttl_days: int = 14,
         password: str = None,
-        ssl: bool = False
+        ssl: bool = False,
+        hash_storage: bool = True,
+        lazy: bool = False
     ):
         """
         Inizializza connessione Redis.
@@ -39,28 +162,51 @@ class GA4RedisCache:
             ttl_days: TTL in giorni (default: 14)
             password: Password Redis (opzionale, richiesto per Upstash/Redis Cloud)
             ssl: Usa connessione SSL/TLS (default: False, richiesto per Upstash)
+            hash_storage: Salva le metriche come Hash Redis, un campo per metrica
+                (default: True). Con False usa il formato precedente (un blob
+                JSON per data). In lettura le chiavi nel formato JSON sono
+                sempre riconosciute, per la migrazione.
+            lazy: Se True non verifica la connessione qui: il ping avviene
+                alla prima lettura/scrittura e un errore viene solo loggato
+                (default: False, ping immediato che solleva ConnectionError)
         """
         self.host = host
         self.port = port
         self.db = db
         self.key_prefix = key_prefix
         self.ttl_seconds = ttl_days * 24 * 60 * 60  # Converti giorni in secondi
+        self.hash_storage = hash_storage
+        
+        # Ultimo get_cache_info: (timestamp monotonic, info), evita SCAN ripetuti
+        self._info_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        self._info_lock = Lock()
         
+        # Client leggero su pool condiviso per (host, port, db, password, ssl)
+        self.client = redis.Redis(
+            connection_pool=_get_connection_pool(host, port, db, password, ssl)
+        )
+        self._verified = False
+        
+        if not lazy:
+            try:
+                # Test connessione (limitato da REDIS_CONNECT_TIMEOUT)
+                self.client.ping()
+                self._verified = True
+                logger.info(f"Redis connesso: {host}:{port} (db={db}, ssl={ssl})")
+            except redis.ConnectionError as e:
+                logger.error(f"Errore connessione Redis: {e}")
+                raise
+    
+    def _ensure_verified(self) -> None:
+        """Ping alla prima operazione (modalità lazy); gli errori sono solo loggati."""
+        if self._verified:
+            return
         try:
-            self.client = redis.Redis(
-                host=host,
-                port=port,
-                db=db,
-                password=password,
-                ssl=ssl,
-                decode_responses=True  # Auto-decode bytes to strings
-            )
-            # Test connessione
             self.client.ping()
-            logger.info(f"Redis connesso: {host}:{port} (db={db}, ssl={ssl})")
-        except redis.ConnectionError as e:
-            logger.error(f"Errore connessione Redis: {e}")
-            raise
+            self._verified = True
+            logger.info(f"Redis connesso: {self.host}:{self.port} (db={self.db})")
+        except redis.RedisError as e:
+            logger.warning(f"Redis non raggiungibile: {e}")
     
     def _make_key(self, date: str) -> str:
         """
@@ -74,6 +220,36 @@ class GA4RedisCache:
         """
         return f"{self.key_prefix}{date}"
     
+    def _queue_write(self, pipe, date: str, metrics: Dict[str, Any]) -> None:
+        """
+        Accoda in una pipeline la scrittura delle metriche di una data con TTL.
+        
+        Formato Hash: un campo per metrica, valore serializzato JSON (tipi
+        preservati, None incluso); la chiave viene prima rimossa per
+        sostituire un eventuale blob JSON precedente e campi non più presenti.
+        Formato blob: un solo valore, compresso se grande (_encode).
+        """
+        key = self._make_key(date)
+        ttl = self._jittered_ttl()
+        if not self.hash_storage:
+            pipe.setex(key, ttl, _encode(metrics))
+            return
+        
+        pipe.delete(key)
+        if metrics:
+            pipe.hset(key, mapping={field: _dumps(value) for field, value in metrics.items()})
+            pipe.expire(key, ttl)
+    
+    def _jittered_ttl(self) -> int:
+        """TTL per una scrittura: ttl_seconds ± TTL_JITTER_RATIO."""
+        jitter = int(self.ttl_seconds * TTL_JITTER_RATIO)
+        return max(1, self.ttl_seconds + random.randint(-jitter, jitter))
+    
+    @staticmethod
+    def _decode_hash(fields: Dict[bytes, bytes]) -> Dict[str, Any]:
+        """Converte i campi di un Hash metriche nei valori originali."""
+        return {field.decode(): _loads(value) for field, value in fields.items()}
+    
     def set_metrics(
         self, 
         date: str, 
@@ -89,18 +265,13 @@ class GA4RedisCache:
         Returns:
             True se successo, False altrimenti
         """
+        self._ensure_verified()
         try:
-            key = self._make_key(date)
-            
-            # Serializza metriche in JSON
-            metrics_json = json.dumps(metrics)
-            
-            # Salva con TTL
-            self.client.setex(
-                key,
-                self.ttl_seconds,
-                metrics_json
-            )
+            # Scrittura e TTL in un solo round-trip (MULTI/EXEC)
+            with self.client.pipeline(transaction=True) as pipe:
+                self._queue_write(pipe, date, metrics)
+                pipe.execute()
+            self._info_cache = None
             
             logger.debug(f"Metriche cached per {date} con TTL {self.ttl_seconds}s")
             return True
@@ -119,25 +290,135 @@ class GA4RedisCache:
         Returns:
             Dictionary con metriche o None se non in cache
         """
+        self._ensure_verified()
         try:
             key = self._make_key(date)
-            metrics_json = self.client.get(key)
+            metrics = None
             
-            if metrics_json:
-                metrics = json.loads(metrics_json)
+            if self.hash_storage:
+                try:
+                    fields = self.client.hgetall(key)
+                    metrics = self._decode_hash(fields) if fields else None
+                except redis.ResponseError:
+                    # WRONGTYPE: chiave ancora nel formato JSON
+                    metrics_json = self.client.get(key)
+                    metrics = _decode(metrics_json) if metrics_json else None
+            else:
+                metrics_json = self.client.get(key)
+                metrics = _decode(metrics_json) if metrics_json else None
+            
+            if metrics:
                 logger.debug(f"Cache HIT per {date}")
                 return metrics
             
             logger.debug(f"Cache MISS per {date}")
             return None
             
-        except (redis.RedisError, json.JSONDecodeError) as e:
+        except (redis.RedisError, json.JSONDecodeError, zlib.error) as e:
             logger.error(f"Errore lettura cache per {date}: {e}")
             return None
     
+    def get_metric_field(self, date: str, field: str) -> Any:
+        """
+        Recupera una sola metrica per una data.
+        
+        Con hash_storage legge il solo campo (HGET), senza decodificare le
+        altre metriche.
+        
+        Args:
+            date: Data in formato YYYY-MM-DD
+            field: Nome della metrica (es. 'sessioni_commodity')
+        
+        Returns:
+            Valore della metrica o None se assente
+        """
+        if self.hash_storage:
+            try:
+                value = self.client.hget(self._make_key(date), field)
+                return _loads(value) if value is not None else None
+            except redis.ResponseError:
+                pass  # Chiave nel formato JSON: lettura completa
+            except (redis.RedisError, json.JSONDecodeError) as e:
+                logger.error(f"Errore lettura cache per {date}.{field}: {e}")
+                return None
+        
+        return (self.get_metrics(date) or {}).get(field)
+    
+    def get_many(self, dates: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Recupera metriche di più date dalla cache.
+        
+        Un solo round-trip per tutte le chiavi: pipeline di HGETALL (formato
+        Hash) o MGET (formato JSON, anche per chiavi non ancora migrate).
+        
+        Args:
+            dates: Date in formato YYYY-MM-DD
+        
+        Returns:
+            Dict con date come chiavi e metriche come valori (solo date in cache)
+        
+        Raises:
+            redis.RedisError: Errori di connessione/comando
+        """
+        self._ensure_verified()
+        result = {}
+        json_dates = dates
+        if self.hash_storage and dates:
+            with self.client.pipeline(transaction=False) as pipe:
+                for date_str in dates:
+                    pipe.hgetall(self._make_key(date_str))
+                replies = pipe.execute(raise_on_error=False)
+            
+            json_dates = []
+            for date_str, fields in zip(dates, replies):
+                if isinstance(fields, redis.ResponseError):
+                    json_dates.append(date_str)  # WRONGTYPE: formato JSON
+                elif isinstance(fields, Exception):
+                    raise fields
+                elif fields:
+                    try:
+                        result[date_str] = self._decode_hash(fields)
+                    except json.JSONDecodeError as e:
+                        logger.error(f"Errore lettura cache per {date_str}: {e}")
+        
+        values = self.client.mget([self._make_key(d) for d in json_dates]) if json_dates else []
+        for date_str, metrics_json in zip(json_dates, values):
+            if not metrics_json:
+                continue
+            try:
+                result[date_str] = _decode(metrics_json)
+            except (json.JSONDecodeError, zlib.error) as e:
+                logger.error(f"Errore lettura cache per {date_str}: {e}")
+        
+        return result
+    
+    def set_many(self, metrics_by_date: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Salva metriche di più date in cache con una pipeline (un round-trip).
+        
+        Args:
+            metrics_by_date: Dict data YYYY-MM-DD -> metriche
+        
+        Returns:
+            Numero di date salvate (0 se errore)
+        """
+        if not metrics_by_date:
+            return 0
+        self._ensure_verified()
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                for date, metrics in metrics_by_date.items():
+                    self._queue_write(pipe, date, metrics)
+                pipe.execute()
+            self._info_cache = None
+            return len(metrics_by_date)
+        except redis.RedisError as e:
+            logger.error(f"Errore salvataggio cache per {len(metrics_by_date)} date: {e}")
+            return 0
+    
     def get_recent_days(self, days: int = 14) -> Dict[str, Dict[str, Any]]:
         """
-        Recupera metriche degli ultimi N giorni dalla cache.
+        Recupera metriche degli ultimi N giorni dalla cache (vedi get_many).
         
         Args:
             days: Numero di giorni da recuperare (default: 14)
@@ -145,16 +426,14 @@ class GA4RedisCache:
         Returns:
             Dict con date come chiavi e metriche come valori
         """
-        result = {}
         today = datetime.now()
+        dates = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
         
-        for i in range(days):
-            date_obj = today - timedelta(days=i)
-            date_str = date_obj.strftime('%Y-%m-%d')
-            
-            metrics = self.get_metrics(date_str)
-            if metrics:
-                result[date_str] = metrics
+        try:
+            result = self.get_many(dates)
+        except redis.RedisError as e:
+            logger.error(f"Errore lettura cache ultimi {days} giorni: {e}")
+            return {}
         
         logger.info(f"Recuperati {len(result)}/{days} giorni da cache")
         return result
@@ -167,6 +446,9 @@ class GA4RedisCache:
         - Popolare cache dopo backfill
         - Ripopolare cache dopo restart Redis
         
+        Le metriche sono lette con una sola query sul range e scritte con
+        una pipeline (un round-trip per tutte le date).
+        
         Args:
             db: Istanza GA4Database
             days: Numero di giorni da sincronizzare (default: 14)
@@ -174,22 +456,27 @@ class GA4RedisCache:
         Returns:
             Numero di record sincronizzati
         """
-        count = 0
+        if days <= 0:
+            return 0
+        
         today = datetime.now()
+        start_date = (today - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        end_date = today.strftime('%Y-%m-%d')
         
-        for i in range(days):
-            date_obj = today - timedelta(days=i)
-            date_str = date_obj.strftime('%Y-%m-%d')
-            
-            # Recupera da DB
-            metrics = db.get_metrics(date_str)
-            
-            if metrics:
-                # Salva in cache (rimuovi extraction_timestamp per cache leggera)
-                cache_metrics = {k: v for k, v in metrics.items() if k != 'extraction_timestamp'}
-                
-                if self.set_metrics(date_str, cache_metrics):
+        try:
+            count = 0
+            with self.client.pipeline(transaction=False) as pipe:
+                # Righe in streaming dalla query sul range direttamente nella pipeline
+                for metrics in db.iter_date_range(start_date, end_date):
+                    # Cache leggera: senza extraction_timestamp
+                    cache_metrics = {k: v for k, v in metrics.items() if k != 'extraction_timestamp'}
+                    self._queue_write(pipe, metrics['date'], cache_metrics)
                     count += 1
+                pipe.execute()
+            self._info_cache = None
+        except redis.RedisError as e:
+            logger.error(f"Errore sincronizzazione cache da DB: {e}")
+            return 0
         
         logger.info(f"Sincronizzati {count}/{days} giorni da DB a Redis")
         return count
@@ -207,12 +494,24 @@ class GA4RedisCache:
         try:
             key = self._make_key(date)
             deleted = self.client.delete(key)
+            self._info_cache = None
             logger.info(f"Rimossa data {date} da cache: {deleted > 0}")
             return deleted > 0
         except redis.RedisError as e:
             logger.error(f"Errore rimozione cache per {date}: {e}")
             return False
     
+    def _scan_keys(self):
+        """Itera le chiavi GA4 con SCAN (mai KEYS, che blocca il server)."""
+        return self.client.scan_iter(match=f"{self.key_prefix}*", count=SCAN_BATCH_SIZE)
+    
+    def _unlink(self, keys: List[bytes]) -> int:
+        """Rimuove chiavi con UNLINK (free asincrono); DELETE su server senza UNLINK."""
+        try:
+            return self.client.unlink(*keys)
+        except redis.ResponseError:
+            return self.client.delete(*keys)
+    
     def clear_all(self) -> int:
         """
         Rimuove tutte le chiavi GA4 dalla cache.
@@ -223,21 +522,34 @@ class GA4RedisCache:
             Numero di chiavi rimosse
         """
         try:
-            # Trova tutte le chiavi con prefisso
-            pattern = f"{self.key_prefix}*"
-            keys = self.client.keys(pattern)
+            # Database vuoto: nessuna chiave da cercare
+            if self.client.dbsize() == 0:
+                return 0
             
-            if keys:
-                deleted = self.client.delete(*keys)
-                logger.warning(f"Rimossa intera cache GA4: {deleted} chiavi")
-                return deleted
+            deleted = self._clear_by_scan()
+            self._info_cache = None
             
-            return 0
+            if deleted:
+                logger.warning(f"Rimossa intera cache GA4: {deleted} chiavi")
+            return deleted
             
         except redis.RedisError as e:
             logger.error(f"Errore rimozione cache completa: {e}")
             return 0
     
+    def _clear_by_scan(self) -> int:
+        """Rimuove le chiavi con prefisso via SCAN lato client, a blocchi."""
+        deleted = 0
+        chunk = []
+        for key in self._scan_keys():
+            chunk.append(key)
+            if len(chunk) >= SCAN_BATCH_SIZE:
+                deleted += self._unlink(chunk)
+                chunk = []
+        if chunk:
+            deleted += self._unlink(chunk)
+        return deleted
+    
     def get_cached_dates(self) -> List[str]:
         """
         Recupera lista di tutte le date attualmente in cache.
@@ -246,14 +558,9 @@ class GA4RedisCache:
             Lista di date in formato YYYY-MM-DD
         """
         try:
-            pattern = f"{self.key_prefix}*"
-            keys = self.client.keys(pattern)
-            
             # Estrai date dai nomi delle chiavi
-            dates = []
-            for key in keys:
-                date = key.replace(self.key_prefix, '')
-                dates.append(date)
+            prefix_len = len(self.key_prefix)
+            dates = [key[prefix_len:].decode() for key in self._scan_keys()]
             
             dates.sort(reverse=True)  # Più recenti prima
             return dates
@@ -266,9 +573,18 @@ class GA4RedisCache:
         """
         Recupera informazioni sullo stato della cache.
         
+        Il risultato è memorizzato per CACHE_INFO_TTL_SECONDS (e invalidato
+        dalle scritture): chiamate ravvicinate (dashboard, healthcheck) non
+        ripetono lo SCAN delle chiavi.
+        
         Returns:
             Dict con statistiche cache
         """
+        with self._info_lock:
+            cached = self._info_cache
+            if cached is not None and time.monotonic() - cached[0] < CACHE_INFO_TTL_SECONDS:
+                return dict(cached[1])
+        
         try:
             dates = self.get_cached_dates()
             
@@ -281,7 +597,9 @@ class GA4RedisCache:
                 'redis_connected': True
             }
             
-            return info
+            with self._info_lock:
+                self._info_cache = (time.monotonic(), info)
+            return dict(info)
             
         except redis.RedisError as e:
             logger.error(f"Errore recupero info cache: {e}")
@@ -304,7 +622,12 @@ class GA4RedisCache:
             return False
     
     def close(self):
-        """Chiude connessione Redis."""
+        """
+        Rilascia il client Redis.
+
+        Il pool condiviso resta aperto (connessioni riusate dalle istanze
+        successive sullo stesso endpoint).
+        """
         if hasattr(self, 'client'):
             self.client.close()
             logger.info("Connessione Redis chiusa")
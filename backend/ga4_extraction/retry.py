@@ -1,7 +1,8 @@
 """
 Retry Logic per GA4 API.
 
-Implementa exponential backoff con jitter per gestire errori transitori.
+Implementa exponential backoff con jitter (default: full jitter) per gestire
+errori transitori.
 
 Utilizzo:
     from backend.ga4_extraction.retry import ga4_retry, execute_with_retry
@@ -15,11 +16,13 @@ Utilizzo:
     response = execute_with_retry(lambda: client.run_report(request))
 """
 
+import copy
 import time
 import random
 import logging
-from functools import wraps
-from typing import Callable, TypeVar, Optional, Tuple, Type
+import threading
+from functools import lru_cache, wraps
+from typing import Callable, Dict, TypeVar, Optional, Tuple, Type
 
 logger = logging.getLogger(__name__)
 
@@ -63,6 +66,167 @@ except ImportError:
     pass
 
 
+# Errori di quota (429 / RESOURCE_EXHAUSTED): se persistono dopo i retry,
+# ulteriori richieste consumerebbero solo altra quota
+QUOTA_EXCEPTIONS: Tuple[Type[Exception], ...] = ()
+
+try:
+    from google.api_core import exceptions as google_exceptions
+
+    QUOTA_EXCEPTIONS = (google_exceptions.TooManyRequests,)  # Include ResourceExhausted
+except ImportError:
+    pass
+
+
+# Circuit breaker: dopo CIRCUIT_FAILURE_THRESHOLD chiamate consecutive fallite per
+# errori transitori (ognuna dopo tutti i suoi retry) le chiamate falliscono subito
+# per CIRCUIT_HALF_OPEN_AFTER secondi, poi una sola chiamata di prova decide se
+# richiudere il circuito. Gli errori di quota non passano dal circuit breaker:
+# li gestisce il blocco GA4_QUOTA_BACKOFF_SECONDS di extraction.py
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_HALF_OPEN_AFTER = 30.0
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker per gli errori GA4 transitori.
+
+    Stati: 'closed' (chiamate normali), 'open' (fallimento immediato con
+    l'ultimo errore, nessuna chiamata di rete), 'half_open' (una sola
+    chiamata di prova in corso). Thread-safe.
+    """
+
+    __slots__ = (
+        'threshold', 'half_open_after', 'fail_count', 'opened_at',
+        'state', 'last_exception', 'lock',
+    )
+
+    def __init__(
+        self,
+        threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        half_open_after: float = CIRCUIT_HALF_OPEN_AFTER,
+    ):
+        """
+        Inizializza circuit breaker chiuso.
+
+        Args:
+            threshold: Chiamate fallite consecutive che aprono il circuito
+            half_open_after: Secondi di circuito aperto prima della chiamata di prova
+        """
+        self.threshold = threshold
+        self.half_open_after = half_open_after
+        self.fail_count = 0
+        self.opened_at = 0.0
+        self.state = 'closed'
+        self.last_exception: Optional[BaseException] = None
+        self.lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Verifica che la chiamata possa partire.
+
+        Raises:
+            Exception: L'ultimo errore registrato, se il circuito è aperto
+                       (o se un'altra chiamata di prova è già in corso)
+        """
+        if self.state == 'closed':
+            return
+        with self.lock:
+            if self.state == 'closed':
+                return
+            now = time.monotonic()
+            if now - self.opened_at >= self.half_open_after:
+                # Questa chiamata è la prova: le altre restano bloccate fino
+                # all'esito (o per un'altra finestra, se la prova non riporta)
+                self.state = 'half_open'
+                self.opened_at = now
+                return
+            raise self.last_exception
+
+    def on_success(self) -> None:
+        """Registra una chiamata riuscita: richiude il circuito."""
+        if self.state == 'closed' and self.fail_count == 0:
+            return
+        with self.lock:
+            self.state = 'closed'
+            self.fail_count = 0
+
+    def on_failure(self, exc: BaseException) -> None:
+        """Registra una chiamata fallita: apre il circuito alla soglia (o se fallisce la prova)."""
+        with self.lock:
+            self.fail_count += 1
+            self.last_exception = exc
+            if self.state == 'half_open' or self.fail_count >= self.threshold:
+                if self.state != 'open':
+                    logger.error(
+                        "Circuit breaker GA4 aperto dopo %d chiamate fallite (%s): stop chiamate per %.0fs",
+                        self.fail_count, type(exc).__name__, self.half_open_after
+                    )
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+# Circuit breaker di processo per categoria di errore (oggi solo 'transient')
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(category: str) -> CircuitBreaker:
+    """
+    Ottiene il circuit breaker di processo per una categoria di errori.
+
+    Args:
+        category: 'transient' (errori retryable diversi dalla quota)
+
+    Returns:
+        CircuitBreaker condiviso
+    """
+    breaker = _breakers.get(category)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(category)
+            if breaker is None:  # Double-check locking
+                breaker = _breakers[category] = CircuitBreaker()
+    return breaker
+
+
+# Classificazione per tipo di eccezione, calcolata alla prima occorrenza di
+# ogni tipo: gli errori successivi dello stesso tipo costano un lookup
+_EXCEPTION_KINDS: Dict[type, str] = {}
+
+
+def _classify(exc: BaseException) -> str:
+    """
+    Classifica un errore per la retry logic.
+
+    Returns:
+        'permanent' (no retry), 'quota' o 'transient' (retry; solo 'transient'
+        alimenta il circuit breaker) oppure 'unclassified' (propagato)
+    """
+    exc_type = type(exc)
+    kind = _EXCEPTION_KINDS.get(exc_type)
+    if kind is None:
+        # Stessa precedenza delle clausole except originali: permanenti prima
+        if issubclass(exc_type, PERMANENT_EXCEPTIONS):
+            kind = 'permanent'
+        elif issubclass(exc_type, RETRYABLE_EXCEPTIONS):
+            kind = 'quota' if issubclass(exc_type, QUOTA_EXCEPTIONS) else 'transient'
+        else:
+            kind = 'unclassified'
+        _EXCEPTION_KINDS[exc_type] = kind
+    return kind
+
+
+def reset_circuit_breakers() -> None:
+    """Richiude tutti i circuit breaker (utile per test)."""
+    with _breakers_lock:
+        _breakers.clear()
+
+
+# Strategie di jitter supportate da RetryConfig.calculate_delay
+JITTER_MODES: Tuple[str, ...] = ('full', 'equal', 'decorrelated')
+
+
 class RetryConfig:
     """Configurazione per retry logic."""
 
@@ -73,6 +237,7 @@ class RetryConfig:
         max_delay: float = 60.0,
         exponential_base: float = 2.0,
         jitter: bool = True,
+        jitter_mode: str = 'full',
     ):
         """
         Inizializza configurazione retry.
@@ -83,39 +248,81 @@ class RetryConfig:
             max_delay: Delay massimo in secondi (default: 60.0)
             exponential_base: Base per exponential backoff (default: 2.0)
             jitter: Se True, aggiunge random jitter al delay (default: True)
+            jitter_mode: Tipo di jitter (default: 'full'):
+                - 'full': uniforme tra 0 e il delay esponenziale
+                - 'equal': metà delay fissa + metà casuale
+                - 'decorrelated': uniforme tra base_delay e 3x il delay
+                  precedente (richiede prev_delay in calculate_delay)
+
+        Raises:
+            ValueError: Se jitter_mode non è tra quelli supportati
         """
+        if jitter_mode not in JITTER_MODES:
+            raise ValueError(f"jitter_mode non valido: {jitter_mode} (ammessi: {', '.join(JITTER_MODES)})")
+
         self.max_attempts = max_attempts
         self.base_delay = base_delay
         self.max_delay = max_delay
         self.exponential_base = exponential_base
         self.jitter = jitter
+        self.jitter_mode = jitter_mode
 
-    def calculate_delay(self, attempt: int) -> float:
+    def calculate_delay(self, attempt: int, prev_delay: Optional[float] = None) -> float:
         """
         Calcola delay per il tentativo corrente.
 
+        Il jitter sparpaglia i retry di chiamate fallite insieme (es. burst
+        di 429): con 'full' i client concorrenti non si ripresentano tutti
+        nella stessa finestra.
+
         Args:
             attempt: Numero tentativo (0-indexed)
+            prev_delay: Delay usato al tentativo precedente (solo 'decorrelated';
+                        None al primo retry)
 
         Returns:
             Delay in secondi
         """
-        # Exponential backoff: base_delay * (exponential_base ^ attempt)
-        delay = self.base_delay * (self.exponential_base ** attempt)
+        # Exponential backoff: base_delay * (exponential_base ^ attempt), cap al max_delay
+        delay = min(self.base_delay * (self.exponential_base ** attempt), self.max_delay)
 
-        # Cap al max_delay
-        delay = min(delay, self.max_delay)
+        if not self.jitter:
+            return max(0, delay)
 
-        # Aggiungi jitter (±25%)
-        if self.jitter:
-            jitter_range = delay * 0.25
-            delay = delay + random.uniform(-jitter_range, jitter_range)
+        if self.jitter_mode == 'equal':
+            return delay / 2 + random.uniform(0, delay / 2)
 
-        return max(0, delay)
+        if self.jitter_mode == 'decorrelated':
+            previous = prev_delay if prev_delay is not None else self.base_delay
+            upper = max(self.base_delay, previous * 3)
+            return min(self.max_delay, random.uniform(self.base_delay, upper))
 
+        # 'full'
+        return random.uniform(0, delay)
 
+    def build_schedule(self) -> Tuple[float, ...]:
+        """
+        Calcola in anticipo i delay di tutti i retry (jitter incluso).
+
+        Returns:
+            Tupla di max_attempts - 1 delay in secondi, uno per retry
+        """
+        schedule = []
+        delay = None
+        for attempt in range(max(0, self.max_attempts - 1)):
+            delay = self.calculate_delay(attempt, delay)
+            schedule.append(delay)
+        return tuple(schedule)
+
+
+@lru_cache(maxsize=1)
 def _get_default_config() -> RetryConfig:
-    """Ottiene configurazione retry dai settings centralizzati."""
+    """
+    Ottiene configurazione retry dai settings centralizzati.
+
+    Letta una volta per processo; il risultato è condiviso e non va
+    modificato (i decorator ne usano una copia).
+    """
     try:
         from backend.ga4_extraction.app_config import get_config
 
@@ -160,53 +367,79 @@ def ga4_retry(
     """
 
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        # Config effettiva risolta alla prima chiamata (non all'import, quando
+        # i settings potrebbero non essere ancora caricati) e poi riusata
+        resolved: Optional[RetryConfig] = None
+
+        def get_config() -> RetryConfig:
+            nonlocal resolved
+            if resolved is None:
+                config = copy.copy(_get_default_config())
+                if max_attempts is not None:
+                    config.max_attempts = max_attempts
+                if base_delay is not None:
+                    config.base_delay = base_delay
+                if max_delay is not None:
+                    config.max_delay = max_delay
+                resolved = config
+            return resolved
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> T:
-            # Ottieni config (con override se specificati)
-            config = _get_default_config()
-            if max_attempts is not None:
-                config.max_attempts = max_attempts
-            if base_delay is not None:
-                config.base_delay = base_delay
-            if max_delay is not None:
-                config.max_delay = max_delay
-
+            config = get_config()
             last_exception = None
+            # Delay dei retry, calcolati al primo errore (nessun costo se la chiamata riesce)
+            schedule = None
+
+            # Circuito aperto: fallisce subito, senza chiamata di rete. Il
+            # controllo è per chiamata: i retry di una chiamata ammessa proseguono
+            breakers = tuple(_breakers.values())
+            for breaker in breakers:
+                breaker.before_call()
 
             for attempt in range(config.max_attempts):
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
+                    for breaker in breakers:
+                        breaker.on_success()
+                    return result
 
-                except PERMANENT_EXCEPTIONS as e:
-                    # Errori permanenti: non fare retry
-                    logger.error(f"Errore permanente (no retry): {type(e).__name__}: {e}")
-                    raise
+                except Exception as e:
+                    kind = _classify(e)
+
+                    if kind == 'permanent' or kind == 'unclassified':
+                        # Non fare retry (GA4 ha comunque risposto: circuito chiuso)
+                        for breaker in breakers:
+                            breaker.on_success()
+                        if kind == 'permanent':
+                            logger.error("Errore permanente (no retry): %s: %s", type(e).__name__, e)
+                        else:
+                            logger.error("Errore non classificato: %s: %s", type(e).__name__, e)
+                        raise
 
-                except RETRYABLE_EXCEPTIONS as e:
                     last_exception = e
                     remaining = config.max_attempts - attempt - 1
 
                     if remaining > 0:
-                        delay = config.calculate_delay(attempt)
+                        if schedule is None:
+                            schedule = config.build_schedule()
+                        delay = schedule[attempt]
+                        # Formattazione differita: nessun costo se WARNING è filtrato
                         logger.warning(
-                            f"Errore transiente (tentativo {attempt + 1}/{config.max_attempts}): "
-                            f"{type(e).__name__}: {e}. "
-                            f"Retry in {delay:.2f}s..."
+                            "Errore transiente (tentativo %d/%d): %s: %s. Retry in %.2fs...",
+                            attempt + 1, config.max_attempts, type(e).__name__, e, delay
                         )
                         time.sleep(delay)
                     else:
                         logger.error(
-                            f"Errore dopo {config.max_attempts} tentativi: "
-                            f"{type(e).__name__}: {e}"
+                            "Errore dopo %d tentativi: %s: %s",
+                            config.max_attempts, type(e).__name__, e
                         )
 
-                except Exception as e:
-                    # Eccezioni non classificate: log e propaga
-                    logger.error(f"Errore non classificato: {type(e).__name__}: {e}")
-                    raise
-
-            # Se arriviamo qui, abbiamo esaurito i tentativi
+            # Se arriviamo qui, abbiamo esaurito i tentativi: una chiamata fallita
             if last_exception:
+                if _classify(last_exception) == 'transient':
+                    get_circuit_breaker('transient').on_failure(last_exception)
                 raise last_exception
 
         return wrapper
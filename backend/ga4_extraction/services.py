@@ -8,9 +8,13 @@ Implementa logica business centralizzata seguendo principi SOLID:
 - Testabilità: facile mockare dipendenze
 """
 
+import copy
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Any, Tuple
+import time
+from collections import OrderedDict
+from datetime import date as date_type, datetime, timedelta
+from threading import Lock
+from typing import Dict, Optional, Any, Tuple, Union
 
 from .database import GA4Database
 from .redis_cache import GA4RedisCache
@@ -18,6 +22,11 @@ from .extraction import esegui_giornaliero, save_to_database
 
 logger = logging.getLogger(__name__)
 
+# Cache locale al processo davanti a Redis/DB per le letture ripetute
+# (dashboard): validità breve, eviction LRU oltre LOCAL_CACHE_MAXSIZE voci
+LOCAL_CACHE_TTL_SECONDS = 5.0
+LOCAL_CACHE_MAXSIZE = 256
+
 
 class GA4DataService:
     """
@@ -30,18 +39,62 @@ class GA4DataService:
     - Coordinamento tra DB e Cache
     """
     
-    def __init__(self, db: GA4Database, cache: Optional[GA4RedisCache] = None):
+    def __init__(
+        self,
+        db: GA4Database,
+        cache: Optional[GA4RedisCache] = None,
+        local_ttl_seconds: float = LOCAL_CACHE_TTL_SECONDS
+    ):
         """
         Inizializza service con dipendenze.
         
         Args:
             db: Istanza GA4Database (obbligatoria)
             cache: Istanza GA4RedisCache (opzionale)
+            local_ttl_seconds: Validità della cache locale in memoria per
+                metriche, prodotti e statistiche (default: 5s, 0 = disattivata)
         """
         self.db = db
         self.cache = cache
+        self.local_ttl_seconds = local_ttl_seconds
+        
+        # (tipo, chiave) -> (scadenza monotonic, valore)
+        self._local: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._local_lock = Lock()
         logger.info("GA4DataService inizializzato")
     
+    def _local_get(self, key: Tuple[str, str]) -> Any:
+        """Valore dalla cache locale (copia), o None se assente o scaduto."""
+        if self.local_ttl_seconds <= 0:
+            return None
+        with self._local_lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            value = entry[1]
+        # Copia: i chiamanti possono modificare il risultato
+        return copy.deepcopy(value)
+    
+    def _local_put(self, key: Tuple[str, str], value: Any) -> None:
+        """Salva un valore nella cache locale (None non viene salvato)."""
+        if self.local_ttl_seconds <= 0 or value is None:
+            return
+        value = copy.deepcopy(value)
+        with self._local_lock:
+            self._local[key] = (time.monotonic() + self.local_ttl_seconds, value)
+            self._local.move_to_end(key)
+            while len(self._local) > LOCAL_CACHE_MAXSIZE:
+                self._local.popitem(last=False)
+    
+    def clear_local_cache(self) -> None:
+        """Svuota la cache locale (es. dopo una scrittura)."""
+        with self._local_lock:
+            self._local.clear()
+    
     def data_exists_for_date(self, date: str, check_products: bool = True) -> bool:
         """
         Verifica se dati esistono già per una data.
@@ -66,22 +119,26 @@ class GA4DataService:
             Tuple (success: bool, date: str|None)
         """
         # Calcola data ieri
-        yesterday = datetime.now() - timedelta(days=1)
-        target_date = yesterday.strftime('%Y-%m-%d')
+        today = datetime.now().date()
         
-        return self.extract_and_save_for_date(target_date, force=force)
+        return self.extract_and_save_for_date(today - timedelta(days=1), force=force, today=today)
     
     def extract_and_save_for_date(
         self, 
-        target_date: str, 
-        force: bool = False
+        target_date: Union[str, date_type], 
+        force: bool = False,
+        *,
+        today: Optional[date_type] = None
     ) -> Tuple[bool, Optional[str]]:
         """
         Estrae e salva dati per una data specifica con check esistenza.
         
         Args:
-            target_date: Data in formato YYYY-MM-DD
+            target_date: Data in formato YYYY-MM-DD o oggetto date
             force: Se True, estrae anche se dati esistono già (default: False)
+            today: Data di riferimento per riconoscere "ieri" (default: oggi).
+                   Chi chiama in ciclo la passa una volta sola, così il
+                   risultato non cambia a cavallo della mezzanotte.
         
         Returns:
             Tuple (success: bool, date: str|None)
@@ -94,20 +151,27 @@ class GA4DataService:
             if success:
                 print(f"Dati estratti per {date}")
         """
+        # Normalizza una volta: stringa ISO per db/log, date per i confronti
+        if isinstance(target_date, datetime):
+            target_date = target_date.date()
+        target = target_date if isinstance(target_date, date_type) else None
+        if target is not None:
+            target_date = target.isoformat()
+        
         try:
             # Check esistenza dati (se non force)
             if not force and self.data_exists_for_date(target_date):
-                logger.info(f"✓ Dati già presenti per {target_date}, skip estrazione")
+                logger.info("✓ Dati già presenti per %s, skip estrazione", target_date)
                 return True, target_date
             
-            logger.info(f"Inizio estrazione dati GA4 per {target_date}...")
+            logger.info("Inizio estrazione dati GA4 per %s...", target_date)
             
             # Determina tipo estrazione in base alla data
-            date_obj = datetime.strptime(target_date, '%Y-%m-%d')
-            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            yesterday = today - timedelta(days=1)
+            if target is None:
+                target = date_type.fromisoformat(target_date)
+            today = today or datetime.now().date()
             
-            if date_obj.date() == yesterday.date():
+            if (today - target).days == 1:
                 extraction_type = 'ieri'
             else:
                 extraction_type = target_date
@@ -122,14 +186,15 @@ class GA4DataService:
             success = save_to_database(results, actual_date, self.db, self.cache, dates)
             
             if success:
-                logger.info(f"✓ Dati salvati in database per {actual_date}")
+                logger.info("✓ Dati salvati in database per %s", actual_date)
+                self.clear_local_cache()
                 return True, actual_date
             else:
-                logger.error(f"Errore salvataggio dati per {actual_date}")
+                logger.error("Errore salvataggio dati per %s", actual_date)
                 return False, None
                 
         except Exception as e:
-            logger.error(f"Errore estrazione/salvataggio per {target_date}: {e}", exc_info=True)
+            logger.error("Errore estrazione/salvataggio per %s: %s", target_date, e, exc_info=True)
             return False, None
     
     def get_data_for_date(
@@ -140,25 +205,38 @@ class GA4DataService:
         """
         Recupera dati per una data con cache-first strategy.
         
+        Ordine: cache locale in memoria, cache Redis, database.
+        
         Args:
             date: Data in formato YYYY-MM-DD
-            use_cache: Se True, prova prima la cache Redis (default: True)
+            use_cache: Se True, prova prima le cache locale e Redis (default: True)
         
         Returns:
             Dictionary con metriche o None se non trovate
         """
-        # Prova cache se disponibile e richiesto
-        if use_cache and self.cache:
+        if not use_cache:
+            return self.db.get_metrics(date)
+        
+        local = self._local_get(('metrics', date))
+        if local is not None:
+            return local
+        
+        data = None
+        # Prova cache se disponibile
+        if self.cache:
             try:
-                cached_data = self.cache.get_metrics(date)
-                if cached_data:
-                    logger.debug(f"Cache hit per {date}")
-                    return cached_data
+                data = self.cache.get_metrics(date)
+                if data:
+                    logger.debug("Cache hit per %s", date)
             except Exception as e:
                 logger.warning(f"Errore lettura cache per {date}: {e}")
         
         # Fallback a database
-        return self.db.get_metrics(date)
+        if not data:
+            data = self.db.get_metrics(date)
+        
+        self._local_put(('metrics', date), data)
+        return data
     
     def get_products_for_date(self, date: str) -> list:
         """
@@ -170,24 +248,71 @@ class GA4DataService:
         Returns:
             Lista di dict con prodotti
         """
-        return self.db.get_products(date)
+        products = self._local_get(('products', date))
+        if products is None:
+            products = self.db.get_products(date)
+            self._local_put(('products', date), products)
+        return products
     
     def get_date_range_data(
         self, 
         start_date: str, 
-        end_date: str
+        end_date: str,
+        use_cache: bool = True
     ) -> list:
         """
         Recupera dati per un range di date.
         
+        Le date entro il TTL della cache Redis sono lette con una sola
+        pipeline; le mancanti (e le date più vecchie, mai in cache) con una
+        sola query sul database. Le date recuperate dal database rientrano
+        in cache con un'altra pipeline.
+        
         Args:
             start_date: Data inizio (YYYY-MM-DD)
             end_date: Data fine (YYYY-MM-DD)
+            use_cache: Se True, prova prima la cache Redis (default: True)
         
         Returns:
             Lista di dict con metriche ordinate per data
         """
-        return self.db.get_date_range(start_date, end_date)
+        if not use_cache or not self.cache:
+            return self.db.get_date_range(start_date, end_date)
+        
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        dates = [
+            (start + timedelta(days=i)).strftime('%Y-%m-%d')
+            for i in range((end - start).days + 1)
+        ]
+        
+        # Solo le date ancora entro il TTL possono essere in cache
+        cutoff = (datetime.now() - timedelta(seconds=self.cache.ttl_seconds)).strftime('%Y-%m-%d')
+        cacheable = [d for d in dates if d >= cutoff]
+        
+        rows = {}
+        try:
+            rows = self.cache.get_many(cacheable)
+        except Exception as e:
+            logger.warning(f"Errore lettura cache per {start_date} → {end_date}: {e}")
+        
+        missing = [d for d in dates if d not in rows]
+        if missing:
+            # Righe DB nello stesso formato della cache (senza extraction_timestamp,
+            # come sync_from_db): la lista restituita ha una forma sola
+            from_db = {
+                row['date']: {k: v for k, v in row.items() if k != 'extraction_timestamp'}
+                for row in self.db.get_date_range(missing[0], missing[-1])
+                if row['date'] not in rows
+            }
+            rows.update(from_db)
+            
+            # Ripopola cache
+            refill = {date: from_db[date] for date in cacheable if date in from_db}
+            if refill:
+                self.cache.set_many(refill)
+        
+        return [rows[d] for d in dates if d in rows]
     
     def calculate_comparison(
         self, 
@@ -213,7 +338,11 @@ class GA4DataService:
         Returns:
             Dict con statistiche (min_date, max_date, record_count, etc.)
         """
-        return self.db.get_statistics()
+        stats = self._local_get(('statistics', ''))
+        if stats is None:
+            stats = self.db.get_statistics()
+            self._local_put(('statistics', ''), stats)
+        return stats
     
     def close(self):
         """Chiude connessioni a DB e Cache."""
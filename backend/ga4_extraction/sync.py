@@ -5,11 +5,20 @@ Sincronizza tutte le tabelle satellite con daily_metrics come riferimento.
 """
 
 import logging
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+import pandas as pd
+
 logger = logging.getLogger(__name__)
 
+# Estrazioni GA4 concorrenti per tabella (rate limit e semaforo GA4 in extraction)
+SYNC_MAX_WORKERS = 8
+
+# Date salvate per transazione (insert_*_bulk)
+SYNC_SAVE_BATCH_SIZE = 50
+
 # Configurazione tabelle da sincronizzare
 SYNC_CONFIG = {
     'products_performance': {
@@ -128,30 +137,69 @@ def sync_database(db, dry_run: bool = False, tables: Optional[list] = None) -> d
                 result['errors'].append(f"Autenticazione GA4 fallita: {e}")
                 return result
 
-        # Sync delle date mancanti
+        # Sync delle date mancanti: estrazioni GA4 in parallelo, salvataggi
+        # a blocchi nel thread chiamante (la connessione db non è condivisa
+        # tra thread), una transazione per blocco
         synced = 0
         errors = []
-
-        for date in missing_dates:
-            try:
-                success = _sync_single_date(
-                    db=db,
-                    client=client,
-                    table_name=table_name,
-                    date=date,
-                    config=config
-                )
-
-                if success:
+        pending = []
+
+        def flush_pending():
+            nonlocal synced
+            if _save_many(db, table_name, pending):
+                saved = {date for date, _ in pending}
+            elif len(pending) > 1:
+                # Il blocco è tutto o niente: riprova una data alla volta, così
+                # risulta non salvata solo la data con errore
+                logger.warning(f"Riprovo {len(pending)} date {table_name} una alla volta")
+                saved = {date for date, records in pending if _save_many(db, table_name, [(date, records)])}
+            else:
+                saved = set()
+
+            for date, _ in pending:
+                if date in saved:
                     synced += 1
                     logger.info(f"  ✓ {table_name} - {date}")
                 else:
                     errors.append(f"{date}: sync fallito")
                     logger.warning(f"  ✗ {table_name} - {date}: sync fallito")
+            pending.clear()
+
+        # SWI totale per products letto prima, sempre nel thread chiamante
+        swi_by_date = {}
+        if config['needs_swi']:
+            for date in missing_dates:
+                metrics = db.get_metrics(date)
+                swi_by_date[date] = metrics.get('swi_conversioni') if metrics else None
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(SYNC_MAX_WORKERS, len(missing_dates))),
+            thread_name_prefix='sync'
+        ) as executor:
+            futures = [
+                executor.submit(_fetch_single_date, client, table_name, date, swi_by_date.get(date))
+                for date in missing_dates
+            ]
+
+            for date, future in zip(missing_dates, futures):
+                try:
+                    records = future.result()
+                except Exception as e:
+                    errors.append(f"{date}: {str(e)}")
+                    logger.error(f"  ✗ {table_name} - {date}: {e}")
+                    continue
+
+                if not records:
+                    errors.append(f"{date}: sync fallito")
+                    logger.warning(f"  ✗ {table_name} - {date}: sync fallito")
+                    continue
 
-            except Exception as e:
-                errors.append(f"{date}: {str(e)}")
-                logger.error(f"  ✗ {table_name} - {date}: {e}")
+                pending.append((date, records))
+                if len(pending) >= SYNC_SAVE_BATCH_SIZE:
+                    flush_pending()
+
+        if pending:
+            flush_pending()
 
         result['details'][table_name] = {
             'status': 'synced' if synced > 0 else 'failed',
@@ -171,118 +219,120 @@ def sync_database(db, dry_run: bool = False, tables: Optional[list] = None) -> d
     return result
 
 
-def _sync_single_date(db, client, table_name: str, date: str, config: dict) -> bool:
+def _fetch_single_date(
+    client,
+    table_name: str,
+    date: str,
+    total_swi: Optional[float] = None
+) -> Optional[List[Dict[str, Any]]]:
     """
-    Sincronizza una singola data per una tabella specifica.
+    Estrae da GA4 i record di una data per una tabella (nessun accesso al db).
+
+    Thread-safe: chiamata in parallelo da sync_database.
 
     Args:
-        db: Istanza GA4Database
         client: Client GA4 autenticato
         table_name: Nome tabella da sincronizzare
         date: Data da sincronizzare (YYYY-MM-DD)
-        config: Configurazione tabella da SYNC_CONFIG
+        total_swi: SWI totale della data (richiesto solo da products_performance)
 
     Returns:
-        True se sync riuscito, False altrimenti
+        Lista di record pronti per l'insert, o None se nessun dato
+
+    Raises:
+        Exception: Errori GA4 (gestiti dal chiamante)
     """
     from .extraction import (
         giornaliero_prodotti,
         SWI_per_commodity_type,
         daily_sessions_channels,
         daily_sessions_campaigns,
+        _sessions_records,
     )
 
-    try:
-        if table_name == 'products_performance':
-            # Products richiede SWI totale
-            metrics = db.get_metrics(date)
-            if not metrics or metrics.get('swi_conversioni') is None:
-                logger.warning(f"SWI mancante per {date}, skip products")
-                return False
-
-            total_swi = metrics['swi_conversioni']
-            df = giornaliero_prodotti(client, date, total_swi)
-
-            if df.empty:
-                logger.warning(f"Nessun dato prodotto per {date}")
-                return False
-
-            # Prepara dati per insert
-            products = []
-            for _, row in df.iterrows():
-                # Gestisce percentuale come stringa "XX.XX%"
-                pct_str = row['Percentage']
-                if isinstance(pct_str, str):
-                    pct_val = float(pct_str.replace('%', ''))
-                else:
-                    pct_val = float(pct_str)
+    if table_name == 'products_performance':
+        # Products richiede SWI totale
+        if total_swi is None:
+            logger.warning(f"SWI mancante per {date}, skip products")
+            return None
+
+        df = giornaliero_prodotti(client, date, total_swi)
 
-                products.append({
-                    'product_name': row['Product'],
-                    'total_conversions': float(row['Total']),
-                    'percentage': pct_val
-                })
+        if df.empty:
+            logger.warning(f"Nessun dato prodotto per {date}")
+            return None
 
-            return db.insert_products(date, products, replace=True)
+        # Prepara dati per insert (percentuale anche come stringa "XX.XX%")
+        percentage = df['Percentage']
+        if not pd.api.types.is_numeric_dtype(percentage):
+            percentage = percentage.astype(str).str.rstrip('%')
 
-        elif table_name == 'swi_by_commodity':
-            df = SWI_per_commodity_type(client, date)
+        return pd.DataFrame({
+            'product_name': df['Product'],
+            'total_conversions': df['Total'].astype(float),
+            'percentage': percentage.astype(float),
+        }).to_dict('records')
 
-            if df.empty:
-                logger.warning(f"Nessun dato SWI commodity per {date}")
-                return False
+    elif table_name == 'swi_by_commodity':
+        df = SWI_per_commodity_type(client, date)
 
-            commodities = []
-            for _, row in df.iterrows():
-                commodities.append({
-                    'commodity_type': row['Commodity_Type'],
-                    'conversions': int(row['Conversions'])
-                })
+        if df.empty:
+            logger.warning(f"Nessun dato SWI commodity per {date}")
+            return None
 
-            return db.insert_swi_by_commodity(date, commodities, replace=True)
+        return pd.DataFrame({
+            'commodity_type': df['Commodity_Type'],
+            'conversions': df['Conversions'].astype('int64'),
+        }).to_dict('records')
 
-        elif table_name == 'sessions_by_channel':
-            df = daily_sessions_channels(client, date)
+    elif table_name == 'sessions_by_channel':
+        df = daily_sessions_channels(client, date)
 
-            if df.empty:
-                logger.warning(f"Nessun dato channels per {date}")
-                return False
+        if df.empty:
+            logger.warning(f"Nessun dato channels per {date}")
+            return None
 
-            channels = []
-            for _, row in df.iterrows():
-                channels.append({
-                    'channel': row['Channel'],
-                    'commodity_sessions': int(row['Commodity_Sessions']),
-                    'lucegas_sessions': int(row['LuceGas_Sessions'])
-                })
+        return _sessions_records(df, 'Channel', 'channel')
 
-            return db.insert_sessions_by_channel(date, channels, replace=True)
+    elif table_name == 'sessions_by_campaign':
+        df = daily_sessions_campaigns(client, date)
 
-        elif table_name == 'sessions_by_campaign':
-            df = daily_sessions_campaigns(client, date)
+        if df.empty:
+            logger.warning(f"Nessun dato campaigns per {date}")
+            return None
 
-            if df.empty:
-                logger.warning(f"Nessun dato campaigns per {date}")
-                return False
+        return _sessions_records(df, 'Campaign', 'campaign')
 
-            campaigns = []
-            for _, row in df.iterrows():
-                campaigns.append({
-                    'campaign': row['Campaign'],
-                    'commodity_sessions': int(row['Commodity_Sessions']),
-                    'lucegas_sessions': int(row['LuceGas_Sessions'])
-                })
+    else:
+        logger.error(f"Tabella non supportata: {table_name}")
+        return None
 
-            return db.insert_sessions_by_campaign(date, campaigns, replace=True)
 
-        else:
-            logger.error(f"Tabella non supportata: {table_name}")
-            return False
+def _save_many(db, table_name: str, rows: list) -> bool:
+    """
+    Salva i record di più date in una sola transazione (insert_*_bulk).
 
-    except Exception as e:
-        logger.error(f"Errore sync {table_name} per {date}: {e}", exc_info=True)
+    Args:
+        db: Istanza GA4Database
+        table_name: Nome tabella
+        rows: Lista di tuple (data, record prodotti da _fetch_single_date)
+
+    Returns:
+        True se tutte le date sono state salvate, False altrimenti
+    """
+    bulk_insert = {
+        'products_performance': db.insert_products_bulk,
+        'swi_by_commodity': db.insert_swi_by_commodity_bulk,
+        'sessions_by_channel': db.insert_sessions_by_channel_bulk,
+        'sessions_by_campaign': db.insert_sessions_by_campaign_bulk,
+    }.get(table_name)
+
+    if bulk_insert is None:
+        logger.error(f"Tabella non supportata: {table_name}")
         return False
 
+    return bulk_insert(rows, replace=True) == len(rows)
+
 
 def print_alignment_status(status: dict) -> None:
     """
@@ -7,13 +7,44 @@ Supporta sia SQLite che PostgreSQL.
 
 import os
 import glob
+import hashlib
 import logging
+import operator
+import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Checksum delle migrations: BLAKE2b a 16 byte (32 caratteri hex come il
+# vecchio MD5). Il valore viene solo registrato in _migrations, mai confrontato.
+CHECKSUM_DIGEST_SIZE = 16
+
+# Nome dell'advisory lock PostgreSQL che serializza le esecuzioni concorrenti
+MIGRATION_LOCK_NAME = 'minime_migrations'
+
+
+def _split_sqlite_statements(sql_content: str) -> List[str]:
+    """
+    Divide uno script SQL nei singoli statement per cursor.execute.
+
+    sqlite3.complete_statement riconosce i ';' dentro stringhe, commenti e
+    trigger (BEGIN ... END): il testo viene accumulato fino a uno statement
+    completo (all'ultimo pezzo viene aggiunto il ';' mancante). Serve al
+    posto di executescript, che esegue COMMIT prima dello script e non può
+    stare dentro una transazione.
+    """
+    statements = []
+    buffer = ''
+    for piece in sql_content.split(';'):
+        buffer += piece + ';'
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer)
+            buffer = ''
+    return statements
+
 
 class MigrationRunner:
     """
@@ -39,6 +70,13 @@ class MigrationRunner:
         self._placeholder = '%s' if db_type == 'postgresql' else '?'
         self._migrations_dir = Path(__file__).parent / 'versions'
 
+        # Versioni applicate, lette da _migrations una sola volta per runner
+        self._applied_cache: Optional[set] = None
+
+        # Elenco file .sql, riletto solo se cambia l'mtime della directory
+        self._files_cache: Optional[List[Path]] = None
+        self._files_cache_key: Optional[tuple] = None
+
         # Assicura che la tabella _migrations esista
         self._ensure_migrations_table()
 
@@ -70,9 +108,15 @@ class MigrationRunner:
         """
         Recupera l'elenco delle migrations già applicate.
 
+        Una sola SELECT per runner: il risultato è tenuto in cache e
+        aggiornato da apply_migration.
+
         Returns:
-            Set di nomi file migration già applicati
+            Set di nomi file migration già applicati (copia)
         """
+        if self._applied_cache is not None:
+            return set(self._applied_cache)
+
         cursor = self.conn.cursor()
         cursor.execute("SELECT version FROM _migrations ORDER BY version")
         rows = cursor.fetchall()
@@ -85,7 +129,8 @@ class MigrationRunner:
             else:
                 applied.add(row[0])
 
-        return applied
+        self._applied_cache = applied
+        return set(applied)
 
     def get_pending_migrations(self) -> List[Path]:
         """
@@ -94,20 +139,53 @@ class MigrationRunner:
         Returns:
             Lista di Path ai file .sql da applicare, ordinati per nome
         """
-        applied = self.get_applied_migrations()
+        return self._compute_pending(self.get_applied_migrations())
 
+    def _compute_pending(self, applied: set) -> List[Path]:
+        """Migrations della directory versions non presenti in applied, ordinate per nome."""
         # Trova tutti i file .sql nella directory versions
-        all_migrations = sorted(self._migrations_dir.glob('*.sql'))
+        all_migrations = self._list_migration_files()
 
         # Filtra quelle già applicate
-        pending = [m for m in all_migrations if m.name not in applied]
+        return [m for m in all_migrations if m.name not in applied]
 
-        return pending
+    def _list_migration_files(self) -> List[Path]:
+        """
+        File .sql della directory migrations, ordinati per nome.
 
-    def _calculate_checksum(self, sql_content: str) -> str:
-        """Calcola checksum MD5 del contenuto SQL."""
-        import hashlib
-        return hashlib.md5(sql_content.encode()).hexdigest()
+        Aggiungere o rimuovere un file aggiorna l'mtime della directory:
+        finché non cambia, l'elenco precedente viene riusato senza rileggerla.
+        """
+        try:
+            key = (self._migrations_dir, os.stat(self._migrations_dir).st_mtime_ns)
+        except FileNotFoundError:
+            return []
+
+        if self._files_cache is None or self._files_cache_key != key:
+            with os.scandir(self._migrations_dir) as it:
+                entries = sorted(
+                    (e for e in it if e.name.endswith('.sql') and e.is_file()),
+                    key=operator.attrgetter('name')
+                )
+            self._files_cache = [Path(e.path) for e in entries]
+            self._files_cache_key = key
+
+        return list(self._files_cache)
+
+    def _read_migration(self, migration_path: Path) -> Tuple[str, str]:
+        """
+        Legge un file di migration e ne calcola il checksum in un solo passaggio.
+
+        Il file è letto come bytes una volta sola: il checksum (BLAKE2b) è
+        calcolato sui byte grezzi e il testo viene decodificato una sola volta
+        per l'esecuzione, senza ri-codificarlo.
+
+        Returns:
+            Tuple (sql_content, checksum)
+        """
+        raw = migration_path.read_bytes()
+        checksum = hashlib.blake2b(raw, digest_size=CHECKSUM_DIGEST_SIZE).hexdigest()
+        return raw.decode('utf-8'), checksum
 
     def apply_migration(self, migration_path: Path) -> Tuple[bool, str]:
         """
@@ -123,14 +201,11 @@ class MigrationRunner:
 
         try:
             # Leggi contenuto SQL
-            with open(migration_path, 'r', encoding='utf-8') as f:
-                sql_content = f.read()
+            sql_content, checksum = self._read_migration(migration_path)
 
             if not sql_content.strip():
                 return False, f"Migration {version} è vuota"
 
-            checksum = self._calculate_checksum(sql_content)
-
             cursor = self.conn.cursor()
 
             # Esegui SQL (può contenere più statement)
@@ -148,6 +223,8 @@ class MigrationRunner:
             )
 
             self.conn.commit()
+            if self._applied_cache is not None:
+                self._applied_cache.add(version)
 
             logger.info(f"✓ Migration applicata: {version}")
             return True, f"Migration {version} applicata con successo"
@@ -157,38 +234,145 @@ class MigrationRunner:
             logger.error(f"✗ Errore migration {version}: {e}")
             return False, f"Errore in {version}: {str(e)}"
 
+    def apply_batch(self, migration_paths: List[Path]) -> Tuple[int, int, List[str]]:
+        """
+        Applica più migrations in una sola transazione (un solo COMMIT).
+
+        Ogni migration gira in un SAVEPOINT: un errore annulla solo quella
+        migration e ferma il batch, le precedenti vengono comunque confermate.
+
+        Args:
+            migration_paths: Path ai file .sql, nell'ordine di applicazione
+
+        Returns:
+            Tuple (applied_count, failed_count, messages)
+        """
+        applied_rows = []  # (version, checksum), registrati tutti insieme prima del COMMIT
+        failed = 0
+        messages = []
+
+        cursor = self.conn.cursor()
+        ph = self._placeholder
+
+        try:
+            # SQLite (isolation legacy) non apre transazioni implicite per il DDL
+            if self.db_type != 'postgresql' and not self.conn.in_transaction:
+                cursor.execute("BEGIN")
+
+            for index, migration_path in enumerate(migration_paths):
+                version = migration_path.name
+                savepoint = f"mig_{index}"
+
+                sql_content, checksum = self._read_migration(migration_path)
+
+                if not sql_content.strip():
+                    failed += 1
+                    messages.append(f"Migration {version} è vuota")
+                    logger.error(f"Stop migrations a causa di errore in {version}")
+                    break
+
+                cursor.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    if self.db_type == 'postgresql':
+                        cursor.execute(sql_content)
+                    else:
+                        for statement in _split_sqlite_statements(sql_content):
+                            cursor.execute(statement)
+                    cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+
+                except Exception as e:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                    cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+                    failed += 1
+                    messages.append(f"Errore in {version}: {str(e)}")
+                    logger.error(f"✗ Errore migration {version}: {e}")
+                    # Stop al primo errore per evitare stato inconsistente
+                    logger.error(f"Stop migrations a causa di errore in {version}")
+                    break
+
+                applied_rows.append((version, checksum))
+                messages.append(f"Migration {version} applicata con successo")
+
+            # Registra le migrations applicate con un solo statement
+            if applied_rows:
+                if self.db_type == 'postgresql':
+                    from psycopg2.extras import execute_values
+                    execute_values(
+                        cursor,
+                        "INSERT INTO _migrations (version, checksum) VALUES %s",
+                        applied_rows
+                    )
+                else:
+                    cursor.executemany(
+                        f"INSERT INTO _migrations (version, checksum) VALUES ({ph}, {ph})",
+                        applied_rows
+                    )
+
+            self.conn.commit()
+
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        applied_versions = [version for version, _ in applied_rows]
+        for version in applied_versions:
+            logger.info(f"✓ Migration applicata: {version}")
+        if self._applied_cache is not None:
+            self._applied_cache.update(applied_versions)
+
+        return len(applied_versions), failed, messages
+
     def run_all_pending(self) -> Tuple[int, int, List[str]]:
         """
-        Applica tutte le migrations pendenti.
+        Applica tutte le migrations pendenti (in un'unica transazione, vedi apply_batch).
 
         Returns:
             Tuple (applied_count, failed_count, messages)
         """
-        pending = self.get_pending_migrations()
+        with self._migration_lock():
+            # Un'altra istanza può averle applicate mentre si attendeva il lock
+            self._applied_cache = None
+            pending = self.get_pending_migrations()
 
-        if not pending:
-            logger.info("Nessuna migration pendente")
-            return 0, 0, ["Nessuna migration da applicare"]
+            if not pending:
+                logger.info("Nessuna migration pendente")
+                return 0, 0, ["Nessuna migration da applicare"]
 
-        logger.info(f"Trovate {len(pending)} migrations pendenti")
+            logger.info(f"Trovate {len(pending)} migrations pendenti")
 
-        applied = 0
-        failed = 0
-        messages = []
+            return self.apply_batch(pending)
 
-        for migration_path in pending:
-            success, message = self.apply_migration(migration_path)
-            messages.append(message)
+    @contextmanager
+    def _migration_lock(self):
+        """
+        Serializza le esecuzioni concorrenti (es. più istanze all'avvio).
 
-            if success:
-                applied += 1
-            else:
-                failed += 1
-                # Stop al primo errore per evitare stato inconsistente
-                logger.error(f"Stop migrations a causa di errore in {migration_path.name}")
-                break
+        PostgreSQL: advisory lock di sessione, rilasciato all'uscita.
+        SQLite: BEGIN IMMEDIATE prende il lock di scrittura prima di leggere
+        _migrations; la transazione è poi quella usata da apply_batch.
+        """
+        cursor = self.conn.cursor()
 
-        return applied, failed, messages
+        if self.db_type == 'postgresql':
+            cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (MIGRATION_LOCK_NAME,))
+            try:
+                yield
+            finally:
+                # Chiude l'eventuale transazione di sola lettura prima dell'unlock
+                self.conn.rollback()
+                cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (MIGRATION_LOCK_NAME,))
+                self.conn.commit()
+            return
+
+        began = not self.conn.in_transaction
+        if began:
+            cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        finally:
+            # Nessuna migration applicata: rilascia il lock
+            if began and self.conn.in_transaction:
+                self.conn.rollback()
 
     def get_status(self) -> dict:
         """
@@ -198,7 +382,7 @@ class MigrationRunner:
             Dict con informazioni sullo stato
         """
         applied = self.get_applied_migrations()
-        pending = self.get_pending_migrations()
+        pending = self._compute_pending(applied)
 
         return {
             'applied_count': len(applied),
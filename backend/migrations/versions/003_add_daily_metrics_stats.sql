@@ -0,0 +1,30 @@
+-- Migration: 003_add_daily_metrics_stats.sql
+-- Descrizione: Riepilogo aggregato di daily_metrics per get_statistics
+-- Note: Una sola riga (id = 1) aggiornata da insert_daily_metrics nella
+--       stessa transazione dell'upsert. Sintassi compatibile SQLite/PostgreSQL.
+
+-- ============================================================================
+-- TABELLA: daily_metrics_stats
+-- ============================================================================
+-- MIN/MAX date, conteggio e somme per le medie, senza scansione completa
+
+CREATE TABLE IF NOT EXISTS daily_metrics_stats (
+    id INTEGER PRIMARY KEY,
+    min_date DATE,
+    max_date DATE,
+    record_count INTEGER NOT NULL DEFAULT 0,
+    sum_sessioni_commodity BIGINT NOT NULL DEFAULT 0,
+    sum_swi_conversioni BIGINT NOT NULL DEFAULT 0
+);
+
+-- Popola il riepilogo dai dati già presenti
+INSERT INTO daily_metrics_stats
+    (id, min_date, max_date, record_count, sum_sessioni_commodity, sum_swi_conversioni)
+SELECT 1, s.min_date, s.max_date, s.record_count, s.sum_sessioni_commodity, s.sum_swi_conversioni
+FROM (
+    SELECT MIN(date) AS min_date, MAX(date) AS max_date, COUNT(*) AS record_count,
+           COALESCE(SUM(sessioni_commodity), 0) AS sum_sessioni_commodity,
+           COALESCE(SUM(swi_conversioni), 0) AS sum_swi_conversioni
+    FROM daily_metrics
+) s
+WHERE NOT EXISTS (SELECT 1 FROM daily_metrics_stats WHERE id = 1);
@@ -129,6 +129,18 @@ def migrate_daily_metrics(sqlite_conn, pg_conn):
                 start_funnel = EXCLUDED.start_funnel
         """
         execute_values(pg_cur, insert_sql, rows)
+
+        # Ricostruisce il riepilogo statistiche (righe cancellate e reinserite)
+        pg_cur.execute("SELECT to_regclass('daily_metrics_stats')")
+        if pg_cur.fetchone()[0]:
+            pg_cur.execute("DELETE FROM daily_metrics_stats")
+            pg_cur.execute("""
+                INSERT INTO daily_metrics_stats
+                    (id, min_date, max_date, record_count, sum_sessioni_commodity, sum_swi_conversioni)
+                SELECT 1, MIN(date), MAX(date), COUNT(*),
+                       COALESCE(SUM(sessioni_commodity), 0), COALESCE(SUM(swi_conversioni), 0)
+                FROM daily_metrics
+            """)
     pg_conn.commit()
     print(f"✓ daily_metrics: {len(rows)} record migrati")
     return len(rows)
@@ -122,9 +122,9 @@ def import_json_to_postgres():
         with open(metrics_file, 'r', encoding='utf-8') as f:
             metrics = json.load(f)
         
-        imported = 0
-        for m in metrics:
-            success = db.insert_daily_metrics(m['date'], {
+        # Tutte le date in una transazione (executemany), non un commit per riga
+        imported = db.insert_daily_metrics_bulk([
+            (m['date'], {
                 'sessioni_commodity': m['sessioni_commodity'],
                 'sessioni_lucegas': m['sessioni_lucegas'],
                 'swi_conversioni': m['swi_conversioni'],
@@ -133,8 +133,8 @@ def import_json_to_postgres():
                 'cr_canalizzazione': m['cr_canalizzazione'],
                 'start_funnel': m['start_funnel']
             })
-            if success:
-                imported += 1
+            for m in metrics
+        ])
         
         logger.info(f"  ✓ daily_metrics: {imported}/{len(metrics)} record importati")
     
@@ -0,0 +1,13 @@
+"""
+Fixture condivise dei test.
+
+La cache su disco degli extractors è disattivata: i test non devono
+leggere né scrivere data/ga4_extraction_cache.db.
+"""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _no_extraction_cache(monkeypatch):
+    monkeypatch.setenv('GA4_EXTRACTION_CACHE_PATH', '')
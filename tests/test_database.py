@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Test per GA4Database su SQLite temporaneo.
+
+Verifica query di lettura, controlli di esistenza e stato di allineamento
+senza dipendere dal database locale in data/.
+"""
+
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from backend.ga4_extraction.database import GA4Database
+
+
+METRICS = {
+    'sessioni_commodity': 150,
+    'sessioni_lucegas': 25000,
+    'swi_conversioni': 200,
+    'cr_commodity': 133.33,
+    'cr_lucegas': 0.80,
+    'cr_canalizzazione': 35.5,
+    'start_funnel': 563
+}
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Database SQLite temporaneo con schema completo."""
+    database = GA4Database(str(tmp_path / 'test_ga4.db'))
+    database.create_schema()
+    yield database
+    database.close()
+
+
+class TestAlignmentStatus:
+    """Test per check_alignment_status."""
+
+    def test_empty_database_is_aligned(self, db):
+        status = db.check_alignment_status()
+
+        assert status['reference']['count'] == 0
+        assert status['summary']['all_aligned'] is True
+
+    def test_missing_dates_per_table(self, db):
+        for date in ('2025-11-01', '2025-11-02', '2025-11-03', '2025-11-04'):
+            db.insert_daily_metrics(date, METRICS)
+        db.insert_products('2025-11-01', [
+            {'product_name': 'fixa', 'total_conversions': 10.0, 'percentage': 50.0},
+            {'product_name': 'trend', 'total_conversions': 10.0, 'percentage': 50.0},
+        ])
+        db.insert_sessions_by_channel('2025-11-01', [
+            {'channel': 'Organic', 'commodity_sessions': 10, 'lucegas_sessions': 5}
+        ])
+
+        status = db.check_alignment_status()
+        tables = status['tables']
+
+        assert status['reference']['count'] == 4
+        assert status['reference']['max_date'] == '2025-11-04'
+        assert tables['products_performance']['missing_dates'] == [
+            '2025-11-02', '2025-11-03', '2025-11-04'
+        ]
+        assert tables['products_performance']['actual_count'] == 1
+        assert tables['swi_by_commodity']['missing_count'] == 4
+        # Tabelle D-2: attese solo date fino a max_date - 2
+        assert tables['sessions_by_channel']['expected_count'] == 2
+        assert tables['sessions_by_channel']['missing_dates'] == ['2025-11-02']
+        assert status['summary']['all_aligned'] is False
+
+    def test_unreadable_table_reported_as_empty(self, db):
+        db.insert_daily_metrics('2025-11-01', METRICS)
+        db.conn.execute("DROP TABLE swi_by_commodity")
+
+        tables = db.check_alignment_status()['tables']
+
+        assert tables['swi_by_commodity'].keys() == tables['products_performance'].keys()
+        assert tables['swi_by_commodity']['missing_dates'] == ['2025-11-01']
+        assert tables['swi_by_commodity']['actual_count'] == 0
+        assert tables['swi_by_commodity']['aligned'] is False
+
+
+class TestDataExists:
+    """Test per data_exists."""
+
+    def test_missing_date(self, db):
+        assert db.data_exists('2025-11-01') is False
+
+    def test_complete_metrics(self, db):
+        db.insert_daily_metrics('2025-11-01', METRICS)
+
+        assert db.data_exists('2025-11-01') is True
+
+    def test_zero_essential_field(self, db):
+        db.insert_daily_metrics('2025-11-01', {**METRICS, 'swi_conversioni': 0})
+
+        assert db.data_exists('2025-11-01') is False
+
+    def test_check_products(self, db):
+        db.insert_daily_metrics('2025-11-01', METRICS)
+
+        assert db.data_exists('2025-11-01', check_products=True) is False
+
+        db.insert_products('2025-11-01', [
+            {'product_name': 'fixa', 'total_conversions': 10.0, 'percentage': 100.0}
+        ])
+
+        assert db.data_exists('2025-11-01', check_products=True) is True
+
+
+class TestRowAccess:
+    """Test per accesso colonne con righe tuple (connessione senza row_factory)."""
+
+    def test_tuple_rows(self, tmp_path):
+        import sqlite3
+
+        conn = sqlite3.connect(str(tmp_path / 'plain.db'))
+        database = GA4Database(conn=conn, run_migrations=False)
+        database.create_schema()
+        database.insert_daily_metrics('2025-11-01', METRICS)
+
+        assert database._row_kind == 'tuple'
+        assert database.get_latest_date() == '2025-11-01'
+        assert database.get_record_count() == 1
+        assert database.data_exists('2025-11-01') is True
+        assert database.check_alignment_status()['reference']['count'] == 1
+        conn.close()
+
+
+class TestComparisonsBulk:
+    """Test per calculate_comparisons_bulk."""
+
+    def test_matches_scalar_comparison(self, db):
+        db.insert_daily_metrics('2025-11-01', METRICS)
+        db.insert_daily_metrics('2025-11-02', {**METRICS, 'swi_conversioni': 0, 'cr_lucegas': 0})
+        db.insert_daily_metrics('2025-11-08', {**METRICS, 'sessioni_commodity': 300, 'swi_conversioni': 150})
+        db.insert_daily_metrics('2025-11-09', METRICS)
+        db.insert_daily_metrics('2025-11-10', METRICS)
+        dates = ['2025-11-08', '2025-11-09', '2025-11-10', '2025-11-11']
+
+        bulk = db.calculate_comparisons_bulk(dates)
+
+        assert bulk == {d: db.calculate_comparison(d) for d in dates}
+        assert bulk['2025-11-08']['comparison']['sessioni_commodity_change'] == pytest.approx(100.0)
+        # Valore precedente a 0: stesso 0.0 della versione scalare
+        assert bulk['2025-11-09']['comparison']['swi_conversioni_change'] == 0.0
+        assert bulk['2025-11-08']['previous_date'] == '2025-11-01'
+        assert bulk['2025-11-10']['previous'] is None
+        assert bulk['2025-11-11'] is None
+
+
+class TestStatistics:
+    """Test per get_statistics su riepilogo daily_metrics_stats."""
+
+    def test_empty(self, db):
+        assert db.get_statistics()['record_count'] == 0
+
+    def test_summary_follows_inserts_and_replace(self, db):
+        db.insert_daily_metrics('2025-11-02', METRICS)
+        db.insert_daily_metrics('2025-11-01', {**METRICS, 'sessioni_commodity': 50})
+        db.insert_daily_metrics('2025-11-02', {**METRICS, 'swi_conversioni': 100})
+
+        stats = db.get_statistics()
+
+        assert stats['min_date'] == '2025-11-01'
+        assert stats['max_date'] == '2025-11-02'
+        assert stats['record_count'] == 2
+        assert stats['avg_sessioni_commodity'] == pytest.approx(100.0)
+        assert stats['avg_swi_conversioni'] == pytest.approx(150.0)
+        assert stats == pytest.approx(db._scan_statistics())
+
+    def test_missing_summary_falls_back_to_scan(self, db):
+        db.insert_daily_metrics('2025-11-01', METRICS)
+        db.conn.execute("DELETE FROM daily_metrics_stats")
+        db.conn.commit()
+
+        assert db.get_statistics()['record_count'] == 1
+        # Lettura senza scritture: il riepilogo resta assente
+        assert db.conn.execute("SELECT COUNT(*) FROM daily_metrics_stats").fetchone()[0] == 0
+
+    def test_summary_shrinks_after_delete(self, db):
+        db.insert_daily_metrics('2025-11-01', METRICS)
+        db.insert_daily_metrics('2025-11-03', METRICS)
+        db.conn.execute("DELETE FROM daily_metrics WHERE date = '2025-11-03'")
+        db.refresh_statistics()
+        db.insert_daily_metrics('2025-11-02', METRICS)
+
+        assert db.get_statistics() == pytest.approx(db._scan_statistics())
+        assert db.get_statistics()['max_date'] == '2025-11-02'
+
+    def test_insert_without_summary_table(self, tmp_path):
+        import sqlite3
+
+        conn = sqlite3.connect(str(tmp_path / 'no_stats.db'))
+        database = GA4Database(conn=conn, run_migrations=False)
+        database.create_schema()
+        conn.execute("DROP TABLE daily_metrics_stats")
+        database._stats_table_exists = None
+
+        assert database.insert_daily_metrics('2025-11-01', METRICS) is True
+        assert database.get_record_count() == 1
+        conn.close()
+
+
+class TestInsertDailyMetricsBulk:
+    """Test per insert_daily_metrics_bulk."""
+
+    def test_bulk_insert_and_replace(self, db):
+        db.insert_daily_metrics('2025-11-02', METRICS)
+
+        saved = db.insert_daily_metrics_bulk([
+            ('2025-11-01', METRICS),
+            ('2025-11-02', {**METRICS, 'sessioni_commodity': 50}),
+            ('2025-11-03', METRICS),
+        ])
+
+        assert saved == 3
+        assert db.get_record_count() == 3
+        assert db.get_metrics('2025-11-02')['sessioni_commodity'] == 50
+        assert db.get_statistics() == pytest.approx(db._scan_statistics())
+
+
+class TestIterDateRange:
+    """Test per iter_date_range / get_date_range."""
+
+    def test_streams_in_date_order(self, db):
+        for date in ('2025-11-03', '2025-11-01', '2025-11-02'):
+            db.insert_daily_metrics(date, METRICS)
+
+        rows = db.iter_date_range('2025-11-01', '2025-11-02')
+
+        assert not isinstance(rows, list)
+        assert [r['date'] for r in rows] == ['2025-11-01', '2025-11-02']
+        assert len(db.get_date_range('2025-11-01', '2025-11-30')) == 3
+
+
+class TestExtractorDatesMissing:
+    """Test per BaseExtractor.get_dates_missing (NOT EXISTS su range)."""
+
+    def test_dates_without_target_rows(self, db):
+        from backend.ga4_extraction.extractors.channels import ChannelsExtractor
+
+        for date in ('2025-11-01', '2025-11-02', '2025-11-03', '2025-11-04'):
+            db.insert_daily_metrics(date, METRICS)
+        db.insert_sessions_by_channel('2025-11-02', [
+            {'channel': 'Organic', 'commodity_sessions': 10, 'lucegas_sessions': 5},
+            {'channel': 'Paid', 'commodity_sessions': 1, 'lucegas_sessions': 2},
+        ])
+
+        missing = ChannelsExtractor().get_dates_missing(db, '2025-11-01', '2025-11-03')
+
+        assert missing == ['2025-11-01', '2025-11-03']
+
+    def test_bulk_matches_per_extractor(self, db):
+        from backend.ga4_extraction.extractors.base import BaseExtractor
+        from backend.ga4_extraction.extractors.channels import ChannelsExtractor
+        from backend.ga4_extraction.extractors.campaigns import CampaignsExtractor
+
+        for date in ('2025-11-01', '2025-11-02', '2025-11-03'):
+            db.insert_daily_metrics(date, METRICS)
+        db.insert_sessions_by_campaign('2025-11-03', [
+            {'campaign': 'brand', 'commodity_sessions': 1, 'lucegas_sessions': 2}
+        ])
+        extractors = [ChannelsExtractor(), CampaignsExtractor()]
+
+        bulk = BaseExtractor.bulk_missing_dates(db, extractors, '2025-11-01', '2025-11-03')
+
+        for ext in extractors:
+            assert bulk[ext.name] == ext.get_dates_missing(db, '2025-11-01', '2025-11-03')
+        assert bulk['campaigns'] == ['2025-11-01', '2025-11-02']
+
+    def test_bulk_uses_present_dates_hook(self, db):
+        from backend.ga4_extraction.extractors.base import BaseExtractor
+        from backend.ga4_extraction.extractors.channels import ChannelsExtractor
+
+        class PartialChannels(ChannelsExtractor):
+            def present_dates(self, db, start_date, end_date):
+                return {'2025-11-02'}
+
+        for date in ('2025-11-01', '2025-11-02'):
+            db.insert_daily_metrics(date, METRICS)
+        extractor = PartialChannels()
+
+        bulk = BaseExtractor.bulk_missing_dates(db, [extractor], '2025-11-01', '2025-11-02')
+
+        assert bulk['channels'] == ['2025-11-01']
+        assert extractor.get_dates_missing(db, '2025-11-01', '2025-11-02') == ['2025-11-01']
+
+
+class TestInsertSessionsBulk:
+    """Test per insert_sessions_by_channel_bulk."""
+
+    def test_replaces_only_given_dates(self, db):
+        db.insert_sessions_by_channel('2025-11-01', [
+            {'channel': 'Old', 'commodity_sessions': 1, 'lucegas_sessions': 1}
+        ])
+        db.insert_sessions_by_channel('2025-11-03', [
+            {'channel': 'Keep', 'commodity_sessions': 3, 'lucegas_sessions': 3}
+        ])
+
+        saved = db.insert_sessions_by_channel_bulk([
+            ('2025-11-01', [{'channel': 'Organic', 'commodity_sessions': 10, 'lucegas_sessions': 5}]),
+            ('2025-11-02', [
+                {'channel': 'Organic', 'commodity_sessions': 7, 'lucegas_sessions': 2},
+                {'channel': 'Paid', 'commodity_sessions': 1, 'lucegas_sessions': 0},
+            ]),
+        ])
+
+        assert saved == 2
+        assert [c['channel'] for c in db.get_sessions_by_channel('2025-11-01')] == ['Organic']
+        assert len(db.get_sessions_by_channel('2025-11-02')) == 2
+        assert [c['channel'] for c in db.get_sessions_by_channel('2025-11-03')] == ['Keep']
+
+
+class TestRangeComplete:
+    """Test per BaseExtractor.get_dates_missing su range completi e date orfane."""
+
+    def test_complete_range_is_empty(self, db):
+        from backend.ga4_extraction.extractors.channels import ChannelsExtractor
+
+        extractor = ChannelsExtractor()
+        for date in ('2025-11-01', '2025-11-02'):
+            db.insert_daily_metrics(date, METRICS)
+        db.insert_sessions_by_channel('2025-11-01', [
+            {'channel': 'Organic', 'commodity_sessions': 10, 'lucegas_sessions': 5},
+            {'channel': 'Paid', 'commodity_sessions': 1, 'lucegas_sessions': 2},
+        ])
+
+        assert extractor.get_dates_missing(db, '2025-11-01', '2025-11-01') == []
+        assert extractor.get_dates_missing(db, '2025-11-01', '2025-11-02') == ['2025-11-02']
+
+    def test_orphan_dates_do_not_hide_gaps(self, db):
+        from backend.ga4_extraction.extractors.channels import ChannelsExtractor
+
+        extractor = ChannelsExtractor()
+        db.insert_daily_metrics('2025-11-01', METRICS)
+        # Data presente solo nella tabella satellite (FK non applicata su SQLite)
+        db.insert_sessions_by_channel('2025-11-02', [
+            {'channel': 'Organic', 'commodity_sessions': 10, 'lucegas_sessions': 5},
+        ])
+
+        assert extractor.get_dates_missing(db, '2025-11-01', '2025-11-02') == ['2025-11-01']
+
+
+class TestSyncDatabase:
+    """Test per sync_database con estrazioni GA4 finte."""
+
+    def test_parallel_fetch_serial_save(self, db, monkeypatch):
+        import threading
+        from backend.ga4_extraction import extraction, sync
+
+        for date in ('2025-11-01', '2025-11-02', '2025-11-03'):
+            db.insert_daily_metrics(date, METRICS)
+        fetch_threads = set()
+
+        def fake_fetch(client, table_name, date, total_swi=None):
+            fetch_threads.add(threading.get_ident())
+            if date == '2025-11-02':
+                raise RuntimeError('GA4 down')
+            return [{'commodity_type': 'luce', 'conversions': 5}]
+
+        monkeypatch.setattr(extraction, 'get_ga_client', lambda: object())
+        monkeypatch.setattr(sync, '_fetch_single_date', fake_fetch)
+
+        result = sync.sync_database(db, tables=['swi_by_commodity'])
+        details = result['details']['swi_by_commodity']
+
+        assert details['synced_count'] == 2
+        assert details['errors'] == ['2025-11-02: GA4 down']
+        assert threading.get_ident() not in fetch_threads
+        assert db.check_alignment_status()['tables']['swi_by_commodity']['missing_dates'] == ['2025-11-02']
+
+    def test_failed_batch_retried_per_date(self, db, monkeypatch):
+        from backend.ga4_extraction import extraction, sync
+
+        for date in ('2025-11-01', '2025-11-02', '2025-11-03'):
+            db.insert_daily_metrics(date, METRICS)
+
+        def fake_fetch(client, table_name, date, total_swi=None):
+            if date == '2025-11-02':
+                return [{'commodity_type': 'luce'}]  # record non valido: blocco fallito
+            return [{'commodity_type': 'luce', 'conversions': 5}]
+
+        monkeypatch.setattr(extraction, 'get_ga_client', lambda: object())
+        monkeypatch.setattr(sync, '_fetch_single_date', fake_fetch)
+
+        result = sync.sync_database(db, tables=['swi_by_commodity'])
+        details = result['details']['swi_by_commodity']
+
+        assert details['synced_count'] == 2
+        assert details['errors'] == ['2025-11-02: sync fallito']
+        assert db.check_alignment_status()['tables']['swi_by_commodity']['missing_dates'] == ['2025-11-02']
+
+
+class TestDataServiceLocalCache:
+    """Test per la cache locale di GA4DataService."""
+
+    def test_repeated_reads_hit_memory(self, db, monkeypatch):
+        from backend.ga4_extraction.services import GA4DataService
+
+        db.insert_daily_metrics('2025-11-01', METRICS)
+        service = GA4DataService(db)
+        calls = []
+        get_metrics = db.get_metrics
+        monkeypatch.setattr(db, 'get_metrics', lambda date: calls.append(date) or get_metrics(date))
+
+        first = service.get_data_for_date('2025-11-01')
+        first['sessioni_commodity'] = -1
+        second = service.get_data_for_date('2025-11-01')
+
+        assert calls == ['2025-11-01']
+        assert second['sessioni_commodity'] == 150
+
+        service.clear_local_cache()
+        service.get_data_for_date('2025-11-01')
+        assert len(calls) == 2
+
+    def test_disabled(self, db):
+        from backend.ga4_extraction.services import GA4DataService
+
+        service = GA4DataService(db, local_ttl_seconds=0)
+        db.insert_daily_metrics('2025-11-01', METRICS)
+        service.get_statistics()
+
+        assert service._local == {}
+
+
+class TestInsertSatelliteBulk:
+    """Test per insert_products_bulk / insert_swi_by_commodity_bulk."""
+
+    def test_matches_single_inserts(self, db):
+        db.insert_products('2025-11-01', [
+            {'product_name': 'old', 'total_conversions': 1.0, 'percentage': 100.0}
+        ])
+
+        saved = db.insert_products_bulk([
+            ('2025-11-01', [{'product_name': 'fixa', 'total_conversions': 10.0, 'percentage': 50.0}]),
+            ('2025-11-02', [{'product_name': 'trend', 'total_conversions': 5.0, 'percentage': 25.0}]),
+        ])
+        assert saved == 2
+        assert [p['product_name'] for p in db.get_products('2025-11-01')] == ['fixa']
+
+        assert db.insert_swi_by_commodity_bulk([
+            ('2025-11-01', [{'commodity_type': 'luce', 'conversions': 3}]),
+        ]) == 1
+        assert db.get_swi_by_commodity('2025-11-01')[0]['conversions'] == 3
+
+    def test_date_range_merges_cache_and_db(self, db):
+        from datetime import date, timedelta
+        from unittest.mock import MagicMock
+        from backend.ga4_extraction.services import GA4DataService
+
+        days = [(date.today() - timedelta(days=i)).isoformat() for i in (3, 2, 1)]
+        for day in days:
+            db.insert_daily_metrics(day, METRICS)
+        cache = MagicMock(ttl_seconds=14 * 86400)
+        cache.get_many.return_value = {days[1]: {'date': days[1], 'cached': True}}
+
+        rows = GA4DataService(db, cache).get_date_range_data(days[0], days[2])
+
+        assert [r['date'] for r in rows] == days
+        assert rows[1] == {'date': days[1], 'cached': True}
+        assert 'extraction_timestamp' not in rows[0]
+        assert sorted(cache.set_many.call_args[0][0]) == [days[0], days[2]]
+
+
+class TestMigrationRunner:
+    """Test per MigrationRunner su due connessioni allo stesso file."""
+
+    def test_second_runner_rereads_applied_under_lock(self, tmp_path):
+        import sqlite3
+        from backend.migrations.runner import MigrationRunner
+
+        path = str(tmp_path / 'migrations.db')
+        first = MigrationRunner(sqlite3.connect(path), 'sqlite')
+        second = MigrationRunner(sqlite3.connect(path), 'sqlite')
+        # Stato letto prima che l'altra istanza applichi le migrations
+        assert second.get_status()['pending_count'] > 0
+
+        applied, failed, _ = first.run_all_pending()
+
+        assert applied > 0 and failed == 0
+        assert second.run_all_pending() == (0, 0, ["Nessuna migration da applicare"])
+        assert second.conn.in_transaction is False
+        first.conn.close()
+        second.conn.close()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test per DatabasePool in modalità SQLite.
+"""
+
+import sys
+import os
+import sqlite3
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from backend.db_pool import DatabasePool
+
+
+def test_sqlite_connection_reused_and_bounded(tmp_path):
+    pool = DatabasePool(str(tmp_path / 'pool.db'), pool_size=1)
+
+    with pool.get_connection() as first:
+        pass
+    with pool.get_connection() as second:
+        # Connessione in uso: una richiesta concorrente ne riceve un'altra
+        with pool.get_connection() as third:
+            pass
+
+    # Riusata anche da un altro thread, una volta restituita
+    other = []
+
+    def use_pool():
+        with pool.get_connection() as conn:
+            other.append(conn)
+
+    thread = threading.Thread(target=use_pool)
+    thread.start()
+    thread.join()
+
+    assert first is second
+    assert third is not first
+    # pool_size=1: third è tornata per prima, first (eccedente) è stata chiusa
+    assert other[0] is third
+    assert pool._sqlite_idle == [third]
+    with pytest.raises(sqlite3.ProgrammingError):
+        first.execute('SELECT 1')
+    pool.close()
+
+
+def test_get_database_uses_pooled_connection(tmp_path):
+    pool = DatabasePool(str(tmp_path / 'pool.db'))
+
+    with pool.get_database() as db:
+        db.create_schema()
+        db.insert_daily_metrics('2025-11-01', {
+            'sessioni_commodity': 150, 'sessioni_lucegas': 25000, 'swi_conversioni': 200,
+            'cr_commodity': 133.33, 'cr_lucegas': 0.80, 'cr_canalizzazione': 35.5,
+            'start_funnel': 563
+        })
+        conn = db.conn
+
+    with pool.get_database() as db:
+        assert db.conn is conn
+        assert db.get_latest_date() == '2025-11-01'
+    pool.close()
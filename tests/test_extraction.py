@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Test per le funzioni di estrazione GA4 con client finto.
+
+Le response sono costruite con i tipi reali di google.analytics.data_v1beta,
+quindi il parsing viene verificato senza chiamate di rete.
+"""
+
+import sys
+import os
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from google.analytics.data_v1beta.types import (
+    BatchRunReportsRequest, BatchRunReportsResponse, RunReportResponse,
+    Row, MetricValue, DimensionValue
+)
+
+from backend.ga4_extraction.extraction import run_daily_batch
+
+
+def _total(value):
+    """Response con un solo valore nei totals."""
+    return RunReportResponse(totals=[Row(metric_values=[MetricValue(value=str(value))])])
+
+
+def _products(values):
+    """Response prodotti: una riga per (prodotto, conversioni)."""
+    return RunReportResponse(rows=[
+        Row(dimension_values=[DimensionValue(value=name)],
+            metric_values=[MetricValue(value=str(conv))])
+        for name, conv in values
+    ])
+
+
+class TestRunDailyBatch:
+    """Test per run_daily_batch."""
+
+    def test_single_batch_call(self):
+        client = MagicMock()
+        client.batch_run_reports.return_value = BatchRunReportsResponse(reports=[
+            _total(1000), _total(20000), _total(50), _total(200),
+            _products([('Fixa Luce', 30), ('Trend Gas', 15), ('altro', 5)]),
+        ])
+
+        sessioni, lucegas, swi, start_funnel, prodotti = run_daily_batch(client, '2025-11-01')
+
+        client.run_report.assert_not_called()
+        request = client.batch_run_reports.call_args[0][0]
+        assert isinstance(request, BatchRunReportsRequest)
+        assert len(request.requests) == 5
+        assert (sessioni, lucegas, swi, start_funnel) == (1000, 20000, 50, 200.0)
+        totals = dict(zip(prodotti['Product'], prodotti['Total']))
+        assert totals['fixa'] == 30.0
+        assert totals['trend'] == 15.0
+        assert totals['altro'] == 5.0
+
+    def test_no_swi_skips_products(self):
+        client = MagicMock()
+        client.batch_run_reports.return_value = BatchRunReportsResponse(reports=[
+            _total(1000), _total(20000), RunReportResponse(), _total(0), RunReportResponse(),
+        ])
+
+        result = run_daily_batch(client, '2025-11-01')
+
+        assert result == (1000, 20000, 0, 0.0, None)
+
+
+class TestProdottiGrouping:
+    """Test per il raggruppamento prodotti."""
+
+    def test_categories_and_others(self):
+        from backend.ga4_extraction.extraction import _prodotti_from_response
+
+        response = _products([
+            ('Fixa Luce', 10), ('FIXA Gas', 5), ('Trend Sempre', 4),
+            ('Zeta', 2), ('Alfa', 3), ('zeta', 1),
+        ])
+
+        df = _prodotti_from_response(response, '2025-11-01', 25)
+
+        assert list(df['Product']) == ['fixa', 'trend', 'pernoi', 'sempre', 'zeta', 'alfa']
+        assert list(df['Total']) == [15.0, 4.0, 0.0, 0.0, 3.0, 3.0]
+        assert df['Percentage'].iloc[0] == '60.00%'
+
+
+class TestDailySessionsChannels:
+    """Test per daily_sessions_channels con le due query in una batch."""
+
+    def test_merges_both_responses(self):
+        from backend.ga4_extraction.extraction import daily_sessions_channels
+
+        client = MagicMock()
+        client.batch_run_reports.return_value = BatchRunReportsResponse(reports=[
+            _products([('Organic', 10), ('Paid', 5)]),
+            _products([('Organic', 100), ('Email', 7)]),
+        ])
+
+        df = daily_sessions_channels(client, '2025-11-01')
+
+        client.run_report.assert_not_called()
+        request = client.batch_run_reports.call_args[0][0]
+        assert 'offerte/casa' in str(request.requests[0].dimension_filter)
+        assert list(df['Channel']) == ['Email', 'Organic', 'Paid']
+        assert list(df['Commodity_Sessions']) == [0, 10, 5]
+        assert list(df['LuceGas_Sessions']) == [7, 100, 0]
+
+    def test_both_responses_empty(self):
+        from backend.ga4_extraction.extraction import daily_sessions_channels
+
+        client = MagicMock()
+        client.batch_run_reports.return_value = BatchRunReportsResponse(reports=[
+            RunReportResponse(), RunReportResponse()
+        ])
+
+        df = daily_sessions_channels(client, '2025-11-01')
+
+        assert df.empty
+        assert list(df.columns) == ['Channel', 'Commodity_Sessions', 'LuceGas_Sessions']
+
+
+class TestExtractForDate:
+    """Test per extract_for_date (una sola batch per data)."""
+
+    def test_results_from_single_batch(self, monkeypatch):
+        from backend.ga4_extraction import extraction
+
+        client = MagicMock()
+        client.batch_run_reports.return_value = BatchRunReportsResponse(reports=[
+            _total(1000), _total(20000), _total(50), _total(200),
+            _products([('Fixa', 40), ('Trend', 10)]),
+        ])
+        monkeypatch.setattr(extraction, '_ga_client', client)
+
+        results, dates = extraction.extract_for_date('2025-11-01')
+
+        assert dates == {'date_from': '2025-11-01', 'date_to': '2025-11-01'}
+        assert client.batch_run_reports.call_count == 1
+        client.run_report.assert_not_called()
+        assert (results['sessioni'], results['sessioni_lucegas'], results['swi']) == (1000, 20000, 50)
+        assert results['cr_commodity'] == 5.0
+        assert results['cr_canalizzazione'] == 25.0
+        assert list(results['prodotti']['Product'][:2]) == ['fixa', 'trend']
+
+
+class TestSwiPerCommodityType:
+    """Test per SWI_per_commodity_type."""
+
+    def test_sorted_columnar_frame(self):
+        from backend.ga4_extraction.extraction import SWI_per_commodity_type
+
+        client = MagicMock()
+        client.run_report.return_value = _products([('luce', 5), ('dual', 12), ('gas', 3)])
+
+        df = SWI_per_commodity_type(client, '2025-11-01')
+
+        assert list(df['Commodity_Type']) == ['dual', 'gas', 'luce']
+        assert list(df['Conversions']) == [12, 3, 5]
+
+
+class TestSaveResultsToCsv:
+    """Test per save_results_to_csv."""
+
+    def test_per_metric_files_and_combined(self, tmp_path):
+        import pandas as pd
+        from backend.ga4_extraction.extraction import save_results_to_csv
+
+        results = {
+            'sessioni': 1000,
+            'cr_canalizzazione': None,
+            'prodotti': pd.DataFrame({'Product': ['fixa'], 'Total': [4.0], 'Percentage': ['100.00%']}),
+        }
+
+        saved = save_results_to_csv(results, str(tmp_path), {'date_from': '2025-11-01'}, combined=True)
+
+        assert len(saved) == 3
+        assert open(saved[0], encoding='utf-8').read() == (
+            "Metric,Value,Date\nSessioni Commodity,1000,2025-11-01\n"
+        )
+        combined = open(saved[2], encoding='utf-8').read()
+        assert '=== SESSIONI ===' in combined and '=== PRODOTTI ===' in combined
+        assert combined.startswith("REPORT GIORNALIERO GA4\nPeriodo: 2025-11-01 - \n")
+        assert "\n=== PRODOTTI ===\nProduct,Total,Percentage\nfixa,4.0,100.00%\n\n" in combined
+
+
+class TestValidateDateForChannels:
+    """Test per validate_date_for_channels con today esplicito."""
+
+    def test_delay_relative_to_given_today(self):
+        from datetime import datetime
+        from backend.ga4_extraction.extraction import validate_date_for_channels
+
+        today = datetime(2025, 11, 10)
+
+        assert validate_date_for_channels('2025-11-08', today=today)[0] is True
+        assert validate_date_for_channels('2025-11-09', today=today)[0] is False
+
+
+class TestExtractForDateRange:
+    """Test per extract_for_date_range."""
+
+    def test_every_date_in_range(self, monkeypatch):
+        from backend.ga4_extraction import extraction
+
+        client = MagicMock()
+        client.batch_run_reports.return_value = BatchRunReportsResponse(reports=[
+            _total(1000), _total(20000), _total(0), _total(0), _products([]),
+        ])
+        monkeypatch.setattr(extraction, '_ga_client', client)
+
+        results = extraction.extract_for_date_range('2025-11-01', '2025-11-03', max_workers=2)
+
+        assert sorted(results) == ['2025-11-01', '2025-11-02', '2025-11-03']
+        assert results['2025-11-02'][1] == {'date_from': '2025-11-02', 'date_to': '2025-11-02'}
+        assert client.batch_run_reports.call_count == 3
+
+    def test_failed_date_kept_in_order(self, monkeypatch):
+        from backend.ga4_extraction import extraction
+
+        def fake_extract(date):
+            if date == '2025-11-02':
+                raise ValueError("bad request")
+            return {'sessioni': 1}, {'date_from': date, 'date_to': date}
+
+        monkeypatch.setattr(extraction, 'extract_for_date', fake_extract)
+
+        results = extraction.extract_for_date_range('2025-11-01', '2025-11-03', max_workers=3)
+
+        assert list(results) == ['2025-11-01', '2025-11-02', '2025-11-03']
+        assert isinstance(results['2025-11-02'], ValueError)
+        assert results['2025-11-03'][0] == {'sessioni': 1}
+
+
+class TestSessionExtractors:
+    """Test per CampaignsExtractor (coppia commodity/luce&gas in una batch)."""
+
+    def test_single_batch_per_date(self):
+        from backend.ga4_extraction.extractors.campaigns import CampaignsExtractor
+
+        client = MagicMock()
+        client.batch_run_reports.return_value = BatchRunReportsResponse(reports=[
+            _products([('promo', 3)]),
+            _products([('brand', 8), ('promo', 1)]),
+        ])
+
+        data = CampaignsExtractor().extract(client, '2025-11-01')
+
+        assert client.batch_run_reports.call_count == 1
+        client.run_report.assert_not_called()
+        assert data == [
+            {'campaign': 'brand', 'commodity_sessions': 0, 'lucegas_sessions': 8},
+            {'campaign': 'promo', 'commodity_sessions': 3, 'lucegas_sessions': 1},
+        ]
+
+
+class TestGa4Cache:
+    """Test per la cache in memoria di _execute_ga4_request."""
+
+    def test_consolidated_date_cached_per_client(self):
+        from backend.ga4_extraction.extraction import giornaliero_swi
+
+        client = MagicMock()
+        client.run_report.return_value = _total(50)
+
+        assert giornaliero_swi(client, '2025-11-01') == giornaliero_swi(client, '2025-11-01') == 50
+        assert client.run_report.call_count == 1
+
+        other = MagicMock()
+        other.run_report.return_value = _total(70)
+        assert giornaliero_swi(other, '2025-11-01') == 70
+
+    def test_recent_date_not_cached(self):
+        from datetime import datetime
+        from backend.ga4_extraction.extraction import giornaliero_swi
+
+        client = MagicMock()
+        client.run_report.return_value = _total(50)
+        today = datetime.now().strftime('%Y-%m-%d')
+
+        giornaliero_swi(client, today)
+        giornaliero_swi(client, today)
+
+        assert client.run_report.call_count == 2
+
+
+class TestCircuitBreaker:
+    """Test per il circuit breaker di ga4_retry."""
+
+    def test_open_circuit_skips_calls(self, monkeypatch):
+        import pytest
+        from google.api_core.exceptions import ServiceUnavailable
+        from backend.ga4_extraction import retry
+
+        monkeypatch.setattr(retry, '_breakers', {})
+        calls = []
+
+        @retry.ga4_retry(max_attempts=1)
+        def unavailable():
+            calls.append(1)
+            raise ServiceUnavailable('down')
+
+        for _ in range(retry.CIRCUIT_FAILURE_THRESHOLD + 2):
+            with pytest.raises(ServiceUnavailable):
+                unavailable()
+
+        assert len(calls) == retry.CIRCUIT_FAILURE_THRESHOLD
+        assert retry.get_circuit_breaker('transient').state == 'open'
+
+    def test_threshold_counts_calls_and_ignores_quota(self, monkeypatch):
+        import pytest
+        from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+        from backend.ga4_extraction import retry
+
+        monkeypatch.setattr(retry, '_breakers', {})
+        monkeypatch.setattr(retry.time, 'sleep', lambda seconds: None)
+
+        @retry.ga4_retry(max_attempts=3)
+        def failing(exc):
+            raise exc
+
+        for _ in range(retry.CIRCUIT_FAILURE_THRESHOLD):
+            with pytest.raises(ResourceExhausted):
+                failing(ResourceExhausted('quota'))
+        assert 'quota' not in retry._breakers
+
+        for _ in range(retry.CIRCUIT_FAILURE_THRESHOLD - 1):
+            with pytest.raises(ServiceUnavailable):
+                failing(ServiceUnavailable('down'))
+        assert retry.get_circuit_breaker('transient').state == 'closed'
+
+    def test_probe_closes_circuit(self):
+        from backend.ga4_extraction.retry import CircuitBreaker
+
+        breaker = CircuitBreaker(threshold=1, half_open_after=0.0)
+        breaker.on_failure(RuntimeError('down'))
+        breaker.before_call()
+
+        assert breaker.state == 'half_open'
+        breaker.on_success()
+        assert breaker.state == 'closed'
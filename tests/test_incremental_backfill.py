@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Test per incremental_backfill con extractor finto.
+
+Verifica estrazioni in parallelo e salvataggi nel thread chiamante,
+senza chiamate GA4 reali.
+"""
+
+import sys
+import os
+import threading
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from backend.ga4_extraction.extractors import backfill
+from backend.ga4_extraction.extractors.base import BaseExtractor
+
+
+class FakeExtractor(BaseExtractor):
+    """Extractor minimale: nessun dato per 2025-11-02, errore per 2025-11-03."""
+
+    name = 'fake'
+    table_name = 'fake'
+    ga4_delay_days = 2
+
+    def __init__(self):
+        super().__init__()
+        self.saved = []
+        self.save_threads = set()
+
+    def get_dates_missing(self, db, start_date, end_date):
+        return ['2025-11-01', '2025-11-02', '2025-11-03', '2025-11-04']
+
+    def validate_date(self, date, *, today=None):
+        return True, 'ok'
+
+    def extract(self, client, date):
+        if date == '2025-11-03':
+            raise RuntimeError('GA4 down')
+        return [] if date == '2025-11-02' else [{'date': date}]
+
+    def save(self, db, date, data):
+        self.save_threads.add(threading.get_ident())
+        self.saved.append(date)
+        return True
+
+
+class TestIncrementalBackfill:
+    """Test per incremental_backfill."""
+
+    def test_parallel_extract_serial_save(self, monkeypatch):
+        from backend.ga4_extraction import extraction
+
+        extractor = FakeExtractor()
+        monkeypatch.setattr(backfill, 'get_extractor', lambda name: extractor)
+        monkeypatch.setattr(extraction, '_ga_client', MagicMock())
+
+        result = backfill.incremental_backfill(
+            'fake', db=MagicMock(), start_date='2025-11-01', end_date='2025-11-04'
+        )
+
+        assert (result['processed'], result['failed']) == (2, 2)
+        assert extractor.saved == ['2025-11-01', '2025-11-04']
+        assert extractor.save_threads == {threading.get_ident()}
+        assert [d['date'] for d in result['details']] == [
+            '2025-11-01', '2025-11-02', '2025-11-03', '2025-11-04'
+        ]
+
+    def test_failed_batch_retried_per_date(self, monkeypatch):
+        from backend.ga4_extraction import extraction
+
+        class BadDateExtractor(FakeExtractor):
+            def save_many(self, db, date_to_data):
+                raise RuntimeError('batch rollback')
+
+            def save(self, db, date, data):
+                if date == '2025-11-04':
+                    raise ValueError('record non valido')
+                return super().save(db, date, data)
+
+        extractor = BadDateExtractor()
+        monkeypatch.setattr(backfill, 'get_extractor', lambda name: extractor)
+        monkeypatch.setattr(extraction, '_ga_client', MagicMock())
+
+        result = backfill.incremental_backfill(
+            'fake', db=MagicMock(), start_date='2025-11-01', end_date='2025-11-04'
+        )
+
+        assert extractor.saved == ['2025-11-01']
+        assert (result['processed'], result['failed']) == (1, 3)
+
+
+class TestBackfillAllExtractors:
+    """Test per backfill_all_extractors."""
+
+    def test_date_range_read_once(self, monkeypatch):
+        db = MagicMock()
+        db.get_statistics.return_value = {
+            'record_count': 2, 'min_date': '2025-11-01', 'max_date': '2025-11-02'
+        }
+        extractor = FakeExtractor()
+        extractor.get_dates_missing = lambda db, start, end: []
+        monkeypatch.setattr(backfill, 'list_extractors', lambda: [{'name': 'a'}, {'name': 'b'}])
+        monkeypatch.setattr(backfill, 'get_extractor', lambda name: extractor)
+
+        result = backfill.backfill_all_extractors(db=db)
+
+        assert result['success'] is True
+        assert db.get_statistics.call_count == 1
+
+
+class TestValidateDate:
+    """Test per BaseExtractor.validate_date con today esplicito."""
+
+    def test_ga4_delay(self):
+        from datetime import date
+        from backend.ga4_extraction.extractors.channels import ChannelsExtractor
+
+        extractor = ChannelsExtractor()
+        today = date(2025, 11, 10)
+
+        assert extractor.validate_date('2025-11-08', today=today)[0] is True
+        valid, message = extractor.validate_date('2025-11-09', today=today)
+        assert valid is False
+        assert 'Giorni trascorsi: 1' in message
+
+    def test_split_uses_overridden_validate_date(self):
+        from datetime import date
+
+        class WeekdayExtractor(FakeExtractor):
+            def validate_date(self, d, *, today=None):
+                return d != '2025-11-02', 'domenica'
+
+        valid, rejected = WeekdayExtractor().split_valid_dates(
+            ['2025-11-01', '2025-11-02'], today=date(2025, 11, 10)
+        )
+
+        assert valid == ['2025-11-01']
+        assert rejected == [('2025-11-02', 'domenica')]
+
+
+class TestValidationThreshold:
+    """Test per la soglia di ritardo GA4 in incremental_backfill."""
+
+    def test_recent_dates_skipped(self, monkeypatch):
+        from datetime import date
+        from backend.ga4_extraction import extraction
+        from backend.ga4_extraction.extractors.channels import ChannelsExtractor
+
+        extractor = ChannelsExtractor()
+        extracted = []
+        monkeypatch.setattr(extractor, 'get_dates_missing', lambda db, s, e: ['2025-11-07', '2025-11-08', '2025-11-09'])
+        monkeypatch.setattr(extractor, 'extract', lambda client, d: extracted.append(d) or [{'date': d}])
+        monkeypatch.setattr(extractor, 'save_many', lambda db, pending: dict.fromkeys(pending, True))
+        monkeypatch.setattr(backfill, 'get_extractor', lambda name: extractor)
+        monkeypatch.setattr(extraction, '_ga_client', MagicMock())
+
+        result = backfill.incremental_backfill(
+            'channels', db=MagicMock(), start_date='2025-11-07', end_date='2025-11-09',
+            today=date(2025, 11, 10)
+        )
+
+        assert sorted(extracted) == ['2025-11-07', '2025-11-08']
+        assert result['skipped'] == 1
+        assert result['processed'] == 2
+        assert [d['date'] for d in result['details'] if d.get('skipped')] == ['2025-11-09']
+
+    def test_end_date_snapped_to_day_boundary(self, monkeypatch):
+        from datetime import date
+
+        db = MagicMock()
+        db.get_statistics.return_value = {
+            'record_count': 30, 'min_date': '2025-10-15', 'max_date': '2025-11-10'
+        }
+        extractor = FakeExtractor()
+        extractor.get_dates_missing = lambda db, start, end: []
+        monkeypatch.setattr(backfill, 'get_extractor', lambda name: extractor)
+
+        results = [
+            backfill.incremental_backfill('fake', db=db, today=date(2025, 11, 10))
+            for _ in range(2)
+        ]
+
+        assert results[0]['date_range'] == {'start': '2025-10-15', 'end': '2025-11-08'}
+        assert results[1]['date_range'] == results[0]['date_range']
+
+
+class TestExtractionCache:
+    """Test per CachedExtractor con cache su file temporaneo."""
+
+    def test_consolidated_dates_survive_restart(self, tmp_path, monkeypatch):
+        from datetime import date, timedelta
+        from backend.ga4_extraction.extractors.cache import CachedExtractor
+
+        class CountingExtractor(CachedExtractor):
+            name = 'counting'
+            table_name = 'counting'
+
+            def __init__(self):
+                super().__init__()
+                self.calls = []
+
+            def fetch(self, client, date):
+                self.calls.append(date)
+                return [{'date': date, 'sessions': 10}]
+
+            def save(self, db, date, data):
+                return True
+
+        monkeypatch.setenv('GA4_EXTRACTION_CACHE_PATH', str(tmp_path / 'cache.db'))
+        recent = date.today().isoformat()
+        old = (date.today() - timedelta(days=10)).isoformat()
+
+        first = CountingExtractor()
+        first.extract(None, old)
+        first.extract(None, recent)
+        # Nuova istanza: simula il riavvio del processo
+        second = CountingExtractor()
+
+        assert second.extract(None, old) == [{'date': old, 'sessions': 10}]
+        second.extract(None, recent)
+        assert second.calls == [recent]
+
+    def test_empty_result_not_cached(self, tmp_path, monkeypatch):
+        from datetime import date, timedelta
+        from backend.ga4_extraction.extractors.cache import CachedExtractor
+
+        class EmptyExtractor(CachedExtractor):
+            name = 'empty'
+            table_name = 'empty'
+
+            def __init__(self):
+                super().__init__()
+                self.calls = 0
+
+            def fetch(self, client, date):
+                self.calls += 1
+                return []
+
+            def save(self, db, date, data):
+                return True
+
+        monkeypatch.setenv('GA4_EXTRACTION_CACHE_PATH', str(tmp_path / 'cache.db'))
+        old = (date.today() - timedelta(days=10)).isoformat()
+
+        extractor = EmptyExtractor()
+        extractor.extract(None, old)
+        extractor.extract(None, old)
+
+        assert extractor.calls == 2
+
+
+class TestQuotaExceeded:
+    """Test per lo stop del backfill su quota GA4 esaurita."""
+
+    def test_backfill_stops_on_quota(self, monkeypatch):
+        from google.api_core.exceptions import ResourceExhausted
+        from backend.ga4_extraction import extraction
+
+        extractor = FakeExtractor()
+
+        def exhausted(client, date):
+            raise ResourceExhausted('quota')
+
+        extractor.extract = exhausted
+        monkeypatch.setattr(backfill, 'get_extractor', lambda name: extractor)
+        monkeypatch.setattr(extraction, '_ga_client', MagicMock())
+
+        result = backfill.incremental_backfill(
+            'fake', db=MagicMock(), start_date='2025-11-01', end_date='2025-11-04', max_workers=1
+        )
+
+        assert result['quota_exceeded'] is True
+        assert (result['success'], result['processed'], result['failed']) == (False, 0, 4)
+
+    def test_requests_refused_during_backoff(self, monkeypatch):
+        import pytest
+        from google.api_core.exceptions import ResourceExhausted
+        from backend.ga4_extraction import extraction
+
+        calls = []
+
+        def exhausted(client, request):
+            calls.append(request)
+            raise ResourceExhausted('quota')
+
+        monkeypatch.setattr(extraction, '_run_ga4_request', exhausted)
+        monkeypatch.setattr(extraction, '_quota_exhausted_until', 0.0)
+
+        for _ in range(2):
+            with pytest.raises(ResourceExhausted):
+                extraction.giornaliero_swi(MagicMock(), '2025-11-01')
+
+        assert len(calls) == 1
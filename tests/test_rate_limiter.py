@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test per GA4RateLimiter con orologio finto.
+
+Fissa la sequenza degli slot prenotati da reserve() per n=1 e n>1,
+senza attese reali.
+"""
+
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from backend.ga4_extraction import rate_limiter
+from backend.ga4_extraction.rate_limiter import GA4RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Orologio monotonic controllato dal test (parte da 100.0)."""
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', lambda: now[0])
+    return now
+
+
+class TestReserve:
+    """Test per GA4RateLimiter.reserve."""
+
+    def test_single_slots(self, clock):
+        limiter = GA4RateLimiter(max_rps=3)
+
+        waits = [limiter.reserve() for _ in range(7)]
+
+        # 3 slot per finestra di 1s: i successivi scalano di una finestra
+        assert waits == [0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 2.0]
+
+    def test_slots_free_up_as_time_passes(self, clock):
+        limiter = GA4RateLimiter(max_rps=3)
+        for _ in range(3):
+            limiter.reserve()
+
+        clock[0] = 100.4
+        assert limiter.reserve() == pytest.approx(0.6)
+        clock[0] = 102.0
+        assert limiter.reserve() == 0.0
+
+    def test_block_reservations(self, clock):
+        limiter = GA4RateLimiter(max_rps=3)
+
+        # Ogni blocco occupa n slot e attende che ne restino n liberi
+        assert limiter.reserve(2) == 0.0
+        assert limiter.reserve(2) == 1.0
+        assert limiter.reserve(3) == 2.0
+        assert list(limiter.request_times) == [102.0, 102.0, 102.0]
+        assert limiter.get_stats()['total_requests'] == 7
+
+    def test_block_size_validated(self, clock):
+        limiter = GA4RateLimiter(max_rps=3)
+
+        with pytest.raises(ValueError):
+            limiter.reserve(0)
+        with pytest.raises(ValueError):
+            limiter.reserve(4)
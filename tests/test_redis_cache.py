@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Test per GA4RedisCache con client Redis finto in memoria.
+
+Verifica il round-trip dei formati salvati (Hash per metrica, blob JSON
+precedente, payload compressi) senza un server Redis.
+"""
+
+import sys
+import os
+import json
+import zlib
+
+import pytest
+import redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from backend.ga4_extraction import redis_cache
+from backend.ga4_extraction.redis_cache import GA4RedisCache
+
+
+class FakePipeline:
+    """Pipeline minimale: accoda i comandi e li esegue in execute()."""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+        return queue
+
+    def execute(self, raise_on_error=True):
+        results = []
+        for name, args, kwargs in self.commands:
+            try:
+                results.append(getattr(self.client, name)(*args, **kwargs))
+            except redis.ResponseError as e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+        self.commands = []
+        return results
+
+
+class FakeRedis:
+    """Sottoinsieme dei comandi Redis usati dalla cache, risposte in bytes."""
+
+    def __init__(self):
+        self.data = {}
+
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def _typed(self, key, kind):
+        value = self.data.get(key)
+        if value is not None and not isinstance(value, kind):
+            raise redis.ResponseError('WRONGTYPE Operation against a key holding the wrong kind of value')
+        return value
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def get(self, key):
+        return self._typed(key, bytes)
+
+    def mget(self, keys):
+        return [self.data.get(key) if isinstance(self.data.get(key), bytes) else None for key in keys]
+
+    def setex(self, key, ttl, value):
+        self.data[key] = self._bytes(value)
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def hset(self, key, mapping):
+        fields = self._typed(key, dict)
+        if fields is None:
+            fields = self.data[key] = {}
+        fields.update({field.encode(): self._bytes(value) for field, value in mapping.items()})
+
+    def hgetall(self, key):
+        return dict(self._typed(key, dict) or {})
+
+    def hget(self, key, field):
+        return (self._typed(key, dict) or {}).get(field.encode())
+
+    def expire(self, key, ttl):
+        return key in self.data
+
+    def dbsize(self):
+        return len(self.data)
+
+    def scan_iter(self, match=None, count=None):
+        prefix = match.rstrip('*')
+        return iter([key.encode() for key in list(self.data) if key.startswith(prefix)])
+
+    def unlink(self, *keys):
+        return self.delete(*(key.decode() for key in keys))
+
+
+METRICS = {
+    'date': '2025-11-01',
+    'sessioni_commodity': 150,
+    'cr_commodity': 133.33,
+    'note': None,
+}
+
+
+@pytest.fixture
+def cache():
+    cache = GA4RedisCache(lazy=True)
+    cache.client = FakeRedis()
+    cache._verified = True
+    return cache
+
+
+class TestRoundTrip:
+    """Scrittura e rilettura nei formati supportati."""
+
+    def test_hash_round_trip(self, cache):
+        cache.set_metrics('2025-11-01', METRICS)
+
+        assert isinstance(cache.client.data['ga4:metrics:2025-11-01'], dict)
+        assert cache.client.data['ga4:metrics:2025-11-01'][b'cr_commodity'] == b'133.33'
+        assert cache.get_metrics('2025-11-01') == METRICS
+        assert cache.get_metric_field('2025-11-01', 'cr_commodity') == 133.33
+
+    def test_legacy_json_key_read_from_hash_mode(self, cache):
+        # Chiave scritta dal formato precedente (un blob JSON): WRONGTYPE su HGETALL
+        cache.client.data['ga4:metrics:2025-11-01'] = json.dumps(METRICS).encode()
+
+        assert cache.get_metrics('2025-11-01') == METRICS
+        assert cache.get_metric_field('2025-11-01', 'sessioni_commodity') == 150
+
+    def test_write_replaces_legacy_json_key(self, cache):
+        cache.client.data['ga4:metrics:2025-11-01'] = json.dumps(METRICS).encode()
+
+        cache.set_metrics('2025-11-01', {**METRICS, 'sessioni_commodity': 10})
+
+        assert cache.get_metrics('2025-11-01')['sessioni_commodity'] == 10
+
+    def test_hash_fields_never_compressed(self, cache):
+        big = {**METRICS, 'products': ['x' * 50] * 40}
+        cache.set_metrics('2025-11-01', big)
+
+        fields = cache.client.data['ga4:metrics:2025-11-01']
+        assert not fields[b'products'].startswith(redis_cache._COMPRESSED_TAG)
+        assert cache.get_metrics('2025-11-01') == big
+
+    def test_compressed_and_plain_payloads(self, cache):
+        big = {**METRICS, 'products': ['x' * 50] * 40}
+        cache.hash_storage = False
+        cache.set_metrics('2025-11-01', METRICS)
+        cache.set_metrics('2025-11-02', big)
+
+        plain = cache.client.data['ga4:metrics:2025-11-01']
+        compressed = cache.client.data['ga4:metrics:2025-11-02']
+        assert not plain.startswith(redis_cache._COMPRESSED_TAG)
+        assert compressed.startswith(redis_cache._COMPRESSED_TAG)
+        assert len(compressed) < len(json.dumps(big))
+        assert cache.get_metrics('2025-11-01') == METRICS
+        assert cache.get_metrics('2025-11-02') == big
+
+    def test_get_many_mixed_formats(self, cache):
+        big = {**METRICS, 'products': ['x' * 50] * 40}
+        cache.set_metrics('2025-11-01', METRICS)
+        cache.set_metrics('2025-11-02', big)
+        cache.client.data['ga4:metrics:2025-11-03'] = json.dumps(METRICS).encode()
+        cache.client.data['ga4:metrics:2025-11-04'] = (
+            redis_cache._COMPRESSED_TAG + zlib.compress(json.dumps(big).encode())
+        )
+
+        result = cache.get_many(['2025-11-01', '2025-11-02', '2025-11-03', '2025-11-04', '2025-11-05'])
+
+        assert result == {
+            '2025-11-01': METRICS,
+            '2025-11-02': big,
+            '2025-11-03': METRICS,
+            '2025-11-04': big,
+        }
+
+
+class TestClearAll:
+    """clear_all con SCAN/UNLINK lato client."""
+
+    def test_removes_only_prefixed_keys(self, cache):
+        cache.set_metrics('2025-11-01', METRICS)
+        cache.set_metrics('2025-11-02', METRICS)
+        cache.client.data['other:key'] = b'1'
+
+        assert cache.clear_all() == 2
+        assert list(cache.client.data) == ['other:key']
+
+    def test_empty_database_skips_scan(self, cache):
+        cache.client.scan_iter = None  # non deve essere chiamato
+
+        assert cache.clear_all() == 0